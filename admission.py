@@ -0,0 +1,264 @@
+"""
+Admission Control Module
+Bounded concurrency with a short wait queue, and load shedding beyond it.
+
+Each AdmissionPool admits up to `max_in_flight` requests at once; up to
+`max_queue` more wait (at most `queue_timeout` seconds) for a slot in
+arrival order; anything else is rejected immediately with Overloaded,
+which the views turn into 503 + Retry-After. Under a dinner peak the
+accepted orders keep their normal latency instead of every order slowing
+down behind SQLite's single writer until clients time out.
+
+Pools:
+- orders: POST /orders, one write transaction per request
+- reports: the staff dashboard and the ranged report APIs, so a few heavy
+  reports cannot take every request thread
+
+With several serve.py workers the in-flight limits hold across all of
+them (share_admission_limits: one flock'd lock file per slot); the wait
+queues stay per worker.
+
+The menu and checkout pages are served from the catalog cache and are
+never queued behind either pool.
+"""
+
+from metrics import registry
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+import fcntl
+import math
+import os
+import threading
+import time
+
+ADMISSION_IN_FLIGHT = registry.gauge(
+    'kopernik_admission_in_flight', 'Requests being processed per admission pool', ['pool'])
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    'kopernik_admission_queue_depth', 'Requests waiting for a slot per admission pool', ['pool'])
+ADMISSION_SHED_TOTAL = registry.counter(
+    'kopernik_admission_shed_total', 'Requests rejected with 503 by pool and reason', ['pool', 'reason'])
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    'kopernik_admission_wait_seconds', 'Time admitted requests spent queued', ['pool'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; retry_after is in whole seconds."""
+
+    def __init__(self, pool: str, reason: str, retry_after: int):
+        super().__init__(f"{pool} is overloaded ({reason}), retry in {retry_after}s")
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class SharedSlots:
+    """
+    `count` slots shared by every process using the same directory: one
+    lock file per slot, held with flock while a request runs. The kernel
+    drops a process's flocks when it exits, so a worker that crashes or
+    is killed mid-request never leaks a slot.
+    """
+
+    def __init__(self, directory: str, name: str, count: int):
+        self.directory = directory
+        self.paths = [os.path.join(directory, f'{name}-{slot}.lock') for slot in range(count)]
+        self._pid = None
+        self._fds: List[int] = []
+        self._held = set()
+        self._lock = threading.Lock()
+
+    def _open(self) -> None:
+        # a flock belongs to the open file, which a forked child shares: every process opens its own
+        if self._pid != os.getpid():
+            for fd in self._fds:
+                os.close(fd)
+            self._fds = [os.open(path, os.O_RDWR | os.O_CREAT, 0o600) for path in self.paths]
+            self._held = set()
+            self._pid = os.getpid()
+
+    def try_acquire(self) -> Optional[int]:
+        """Lock a free slot without waiting; None if every slot is taken."""
+        with self._lock:
+            self._open()
+            for slot, fd in enumerate(self._fds):
+                if slot in self._held:
+                    continue
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self._held.add(slot)
+                return slot
+        return None
+
+    def acquire(self, timeout: float) -> Optional[int]:
+        """Lock a free slot, polling for up to `timeout` seconds; None if none freed up."""
+        deadline = time.monotonic() + timeout
+        delay = 0.001
+        while True:
+            slot = self.try_acquire()
+            remaining = deadline - time.monotonic()
+            if slot is not None or remaining <= 0:
+                return slot
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.02)
+
+    def release(self, slot: int) -> None:
+        with self._lock:
+            if self._pid == os.getpid() and slot in self._held:
+                fcntl.flock(self._fds[slot], fcntl.LOCK_UN)
+                self._held.discard(slot)
+
+
+class AdmissionPool:
+    """
+    A counting semaphore with a bounded FIFO wait queue. With `shared`
+    slots, an admitted request also needs one of them before it runs.
+    """
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+        self.shared: Optional[SharedSlots] = None
+        self._slot = threading.local()
+        # moving average of time spent holding a slot, for Retry-After
+        self._service_time = 0.05
+
+    def configure(self, max_in_flight: int, max_queue: int, queue_timeout: float) -> None:
+        with self._lock:
+            self.max_in_flight = max_in_flight
+            self.max_queue = max_queue
+            self.queue_timeout = queue_timeout
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained, at least 1."""
+        backlog = len(self._waiters) + self.in_flight + 1
+        return max(1, math.ceil(backlog * self._service_time / max(self.max_in_flight, 1)))
+
+    def _shed(self, reason: str) -> Overloaded:
+        self.shed += 1
+        ADMISSION_SHED_TOTAL.inc(pool=self.name, reason=reason)
+        return Overloaded(self.name, reason, self.retry_after())
+
+    def acquire(self) -> float:
+        """Take a slot, waiting in line if needed; returns seconds waited or raises Overloaded."""
+        started = time.perf_counter()
+        self._acquire_local()
+        if self.shared is not None:
+            slot = self.shared.acquire(self.queue_timeout - (time.perf_counter() - started))
+            if slot is None:
+                # every worker's slots are busy: give the local one back
+                self.release()
+                with self._lock:
+                    self.admitted -= 1
+                    raise self._shed('timeout')
+            self._slot.value = slot
+        return time.perf_counter() - started
+
+    def _acquire_local(self) -> None:
+        with self._lock:
+            if self.in_flight < self.max_in_flight and not self._waiters:
+                self.in_flight += 1
+                self.admitted += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                raise self._shed('queue_full')
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+
+        if waiter.wait(self.queue_timeout):
+            # release() handed its slot straight to this waiter
+            return
+        with self._lock:
+            if waiter.is_set():
+                # granted between the timeout and taking the lock: keep the slot
+                return
+            self._waiters.remove(waiter)
+            raise self._shed('timeout')
+
+    def release(self, held_for: Optional[float] = None) -> None:
+        slot = getattr(self._slot, 'value', None)
+        if slot is not None:
+            self._slot.value = None
+            self.shared.release(slot)
+        with self._lock:
+            if held_for is not None:
+                self._service_time = 0.9 * self._service_time + 0.1 * held_for
+            if self._waiters:
+                # the slot passes to the oldest waiter; in_flight is unchanged
+                self.admitted += 1
+                self._waiters.popleft().set()
+            else:
+                self.in_flight -= 1
+
+    @contextmanager
+    def admit(self):
+        """Hold a slot for the enclosed block; raises Overloaded when shed."""
+        waited = self.acquire()
+        ADMISSION_WAIT_SECONDS.observe(waited, pool=self.name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'queued': len(self._waiters),
+                'admitted': self.admitted,
+                'shed': self.shed,
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue
+            }
+
+
+order_admission = AdmissionPool('orders', max_in_flight=4, max_queue=16, queue_timeout=2.0)
+report_admission = AdmissionPool('reports', max_in_flight=2, max_queue=4, queue_timeout=5.0)
+POOLS = (order_admission, report_admission)
+
+
+def overloaded_response(e: Overloaded):
+    """(body, status, headers) for a shed request."""
+    return {
+        "success": False,
+        "error": "Server is busy, please retry shortly",
+        "error_type": "overloaded",
+        "retry_after": e.retry_after
+    }, 503, {'Retry-After': str(e.retry_after)}
+
+
+def share_admission_limits(directory: str) -> None:
+    """
+    Hold every pool's max_in_flight across the processes forked after
+    this call (serve.py workers); call once the limits are configured.
+    """
+    for pool in POOLS:
+        pool.shared = SharedSlots(directory, pool.name, pool.max_in_flight)
+
+
+def init_admission(app) -> None:
+    """Apply the ORDER_* / REPORT_* admission limits and expose pool gauges."""
+    config = app.config
+    config.setdefault('ORDER_MAX_IN_FLIGHT', 4)
+    config.setdefault('ORDER_MAX_QUEUE', 16)
+    config.setdefault('ORDER_QUEUE_TIMEOUT_MS', 2000)
+    config.setdefault('REPORT_MAX_IN_FLIGHT', 2)
+    config.setdefault('REPORT_MAX_QUEUE', 4)
+    config.setdefault('REPORT_QUEUE_TIMEOUT_MS', 5000)
+    order_admission.configure(config['ORDER_MAX_IN_FLIGHT'], config['ORDER_MAX_QUEUE'],
+                              config['ORDER_QUEUE_TIMEOUT_MS'] / 1000)
+    report_admission.configure(config['REPORT_MAX_IN_FLIGHT'], config['REPORT_MAX_QUEUE'],
+                               config['REPORT_QUEUE_TIMEOUT_MS'] / 1000)
+    ADMISSION_IN_FLIGHT.set_function(lambda: {(p.name,): p.in_flight for p in POOLS})
+    ADMISSION_QUEUE_DEPTH.set_function(lambda: {(p.name,): len(p._waiters) for p in POOLS})
@@ -0,0 +1,452 @@
+"""
+Columnar Analytics Module
+In-memory NumPy column store for multi-year order history.
+
+- Orders and order lines held as flat column arrays, loaded incrementally
+  (by order id watermark) or from a snapshot file (.npz)
+- Item keys, genders, age bands and postcodes are dictionary-encoded to
+  small integer codes, so group-bys are np.bincount calls
+- Large scans are split across a process pool and the partial group-bys
+  merged
+- Results have the same dict shapes as the SQL versions in staff_reports,
+  so the two can be cross-checked (see cross_check)
+
+Orders are treated as immutable once loaded (status changes do not
+affect these reports); customer attributes are re-read from dim_customer
+on every refresh. Order times have one second resolution.
+
+Requires numpy (optional dependency):
+
+    python analytics.py --snapshot analytics.npz           # refresh + save
+    python analytics.py --snapshot analytics.npz --check   # compare with SQL
+"""
+
+from extensions import db
+from sqlalchemy import text
+from dimensions import queued_demographics
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+import os
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+BATCH_SIZE = 50_000
+PARALLEL_MIN_ROWS = 1_000_000
+EPOCH = datetime(1970, 1, 1)
+
+# dim_customer columns that orders can be grouped by: dim column -> report key
+DIMENSIONS = {
+    'gender': 'gender',
+    'age_band': 'age_group',
+    'postcode': 'postal_code'
+}
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("analytics.py requires numpy (pip install numpy)")
+
+
+def _epoch_seconds(moment: Optional[datetime]) -> Optional[int]:
+    return None if moment is None else int((moment - EPOCH).total_seconds())
+
+
+class Dictionary:
+    """Dictionary encoding: value <-> dense integer code."""
+
+    def __init__(self, values: Iterable[Any] = ()):
+        self.values: List[Any] = []
+        self.codes: Dict[Any, int] = {}
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def encode_many(self, values: Iterable[Any]) -> 'np.ndarray':
+        return np.fromiter((self.encode(v) for v in values), dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def _group_partial(codes: 'np.ndarray', n_groups: int, customer_ids: 'np.ndarray',
+                   totals: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+    """Order counts, earnings and distinct (group, customer) keys for one chunk."""
+    orders = np.bincount(codes, minlength=n_groups)
+    earnings = np.bincount(codes, weights=totals, minlength=n_groups)
+    pairs = np.unique(codes.astype(np.int64) << 32 | customer_ids)
+    return orders, earnings, pairs
+
+
+def _group_chunk(args):
+    """Process pool entry point: partial group-bys for every dimension."""
+    dim_codes, dim_sizes, customer_ids, totals = args
+    return [_group_partial(codes, size, customer_ids, totals)
+            for codes, size in zip(dim_codes, dim_sizes)]
+
+
+class ColumnStore:
+    """Orders and order lines as NumPy columns, with vectorized reports."""
+
+    def __init__(self):
+        _require_numpy()
+        # orders, sorted by id
+        self.order_id = np.empty(0, dtype=np.int64)
+        self.order_ts = np.empty(0, dtype=np.int64)
+        self.order_customer = np.empty(0, dtype=np.int64)
+        self.order_total = np.empty(0, dtype=np.float64)
+        # order lines; line_order is the row index into the order columns
+        self.line_order = np.empty(0, dtype=np.int64)
+        self.line_item = np.empty(0, dtype=np.int32)
+        self.line_quantity = np.empty(0, dtype=np.int64)
+        self.items = Dictionary()            # 'pizza:3' style keys
+        self.item_names: Dict[str, str] = {}
+        # per-customer dimension codes, indexed by customer id (-1 = no dim row)
+        self.dims = {name: Dictionary() for name in DIMENSIONS}
+        self.customer_codes = {name: np.empty(0, dtype=np.int32) for name in DIMENSIONS}
+        self.order_watermark = 0
+
+    # -- loading ---------------------------------------------------------
+
+    def refresh(self) -> Dict[str, int]:
+        """Append orders (and their lines) newer than the watermark; reload dimensions."""
+        max_order = db.session.execute(text("SELECT COALESCE(MAX(id), 0) FROM orders")).scalar()
+        params = {'after': self.order_watermark, 'upto': max_order}
+
+        orders = db.session.execute(text("""
+            SELECT id, CAST(strftime('%s', order_date) AS INTEGER), customer_id, total
+            FROM orders
+            WHERE id > :after AND id <= :upto
+            ORDER BY id
+        """), params)
+        new_orders = 0
+        while True:
+            chunk = orders.fetchmany(BATCH_SIZE)
+            if not chunk:
+                break
+            ids, ts, customers, totals = zip(*chunk)
+            self.order_id = np.concatenate([self.order_id, np.array(ids, dtype=np.int64)])
+            self.order_ts = np.concatenate([self.order_ts, np.array(ts, dtype=np.int64)])
+            self.order_customer = np.concatenate([self.order_customer, np.array(customers, dtype=np.int64)])
+            self.order_total = np.concatenate([
+                self.order_total, np.array([np.nan if t is None else t for t in totals], dtype=np.float64)
+            ])
+            new_orders += len(chunk)
+
+        # Lines are committed together with their order, so the order watermark covers them
+        lines = db.session.execute(text("""
+            SELECT order_id, item_type, item_id, quantity
+            FROM order_items
+            WHERE order_id > :after AND order_id <= :upto
+            ORDER BY order_id, id
+        """), params)
+        new_lines = 0
+        while True:
+            chunk = lines.fetchmany(BATCH_SIZE)
+            if not chunk:
+                break
+            order_ids, item_types, item_ids, quantities = zip(*chunk)
+            self.line_order = np.concatenate([
+                self.line_order, np.searchsorted(self.order_id, np.array(order_ids, dtype=np.int64))
+            ])
+            self.line_item = np.concatenate([
+                self.line_item, self.items.encode_many(f"{t}:{i}" for t, i in zip(item_types, item_ids))
+            ])
+            self.line_quantity = np.concatenate([
+                self.line_quantity, np.array([q or 0 for q in quantities], dtype=np.int64)
+            ])
+            new_lines += len(chunk)
+
+        self.order_watermark = max_order
+        self._load_dimensions()
+        self._load_item_names()
+        return {'orders': new_orders, 'lines': new_lines}
+
+    def _load_dimensions(self) -> None:
+        # same sources as the SQL reports: current dim rows, queued customers by the same rules
+        rows = db.session.execute(text("""
+            SELECT d.customer_id, d.gender, d.age_band, d.postcode
+            FROM dim_customer d
+            WHERE NOT EXISTS (SELECT 1 FROM dim_customer_dirty q WHERE q.customer_id = d.customer_id)
+        """)).fetchall()
+        rows += [(customer_id, dims['gender'], dims['age_band'], dims['postcode'])
+                 for customer_id, dims in queued_demographics().items()]
+        size = max([row[0] for row in rows] + [int(self.order_customer.max()) if len(self.order_customer) else 0]) + 1
+        customer_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        for position, name in enumerate(DIMENSIONS, start=1):
+            codes = np.full(size, -1, dtype=np.int32)
+            codes[customer_ids] = self.dims[name].encode_many(row[position] for row in rows)
+            self.customer_codes[name] = codes
+
+    def _load_item_names(self) -> None:
+        names = {}
+        for item_type, table in (('pizza', 'pizzas'), ('drink', 'drinks'), ('dessert', 'desserts')):
+            for item_id, name in db.session.execute(text(f"SELECT id, name FROM {table}")):
+                names[f"{item_type}:{item_id}"] = name
+        self.item_names = names
+
+    # -- snapshots -------------------------------------------------------
+
+    def save(self, path: str) -> None:
+        """Write every column and dictionary to an .npz snapshot."""
+        arrays = {
+            'order_id': self.order_id, 'order_ts': self.order_ts,
+            'order_customer': self.order_customer, 'order_total': self.order_total,
+            'line_order': self.line_order, 'line_item': self.line_item,
+            'line_quantity': self.line_quantity,
+            'items': np.array(self.items.values, dtype=np.str_),
+            'item_name_keys': np.array(list(self.item_names), dtype=np.str_),
+            'item_name_values': np.array(list(self.item_names.values()), dtype=np.str_),
+            'order_watermark': np.array([self.order_watermark], dtype=np.int64)
+        }
+        for name in DIMENSIONS:
+            arrays[f'dim_{name}'] = np.array(self.dims[name].values, dtype=np.str_)
+            arrays[f'customer_{name}'] = self.customer_codes[name]
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'ColumnStore':
+        store = cls()
+        with np.load(path, allow_pickle=False) as data:
+            for column in ('order_id', 'order_ts', 'order_customer', 'order_total',
+                           'line_order', 'line_item', 'line_quantity'):
+                setattr(store, column, data[column])
+            store.items = Dictionary(data['items'].tolist())
+            store.item_names = dict(zip(data['item_name_keys'].tolist(), data['item_name_values'].tolist()))
+            store.order_watermark = int(data['order_watermark'][0])
+            for name in DIMENSIONS:
+                store.dims[name] = Dictionary(data[f'dim_{name}'].tolist())
+                store.customer_codes[name] = data[f'customer_{name}']
+        return store
+
+    # -- reports ---------------------------------------------------------
+
+    def _order_mask(self, start: Optional[datetime], end: Optional[datetime]) -> 'np.ndarray':
+        """Orders in [start, end) with a total, like the SQL reports."""
+        mask = ~np.isnan(self.order_total)
+        if start is not None:
+            mask &= self.order_ts >= _epoch_seconds(start)
+        if end is not None:
+            mask &= self.order_ts < _epoch_seconds(end)
+        return mask
+
+    def _customer_codes(self, name: str, customers: 'np.ndarray') -> 'np.ndarray':
+        codes = np.append(self.customer_codes[name], np.int32(-1))
+        # customers beyond the dimension array map to the trailing -1
+        return codes[np.minimum(customers, len(codes) - 1)]
+
+    def earnings_breakdowns(self, postal_code_limit: int = 10, start: Optional[datetime] = None,
+                            end: Optional[datetime] = None,
+                            workers: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Columnar get_earnings_breakdowns: same keys, rows and ordering.
+        Scans above PARALLEL_MIN_ROWS orders are split across `workers` processes.
+        """
+        mask = self._order_mask(start, end)
+        customers = self.order_customer[mask]
+        totals = self.order_total[mask]
+        dim_codes = [self._customer_codes(name, customers) for name in DIMENSIONS]
+
+        # orders of customers that no longer exist have no codes
+        has_dim = dim_codes[0] >= 0
+        customers, totals = customers[has_dim], totals[has_dim]
+        dim_codes = [codes[has_dim] for codes in dim_codes]
+        dim_sizes = [len(self.dims[name]) for name in DIMENSIONS]
+
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(totals) >= PARALLEL_MIN_ROWS:
+            bounds = np.linspace(0, len(totals), workers + 1).astype(int)
+            chunks = [([codes[a:b] for codes in dim_codes], dim_sizes, customers[a:b], totals[a:b])
+                      for a, b in zip(bounds[:-1], bounds[1:])]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                partials = list(pool.map(_group_chunk, chunks))
+        else:
+            partials = [_group_chunk((dim_codes, dim_sizes, customers, totals))]
+
+        result = {}
+        for position, (name, key) in enumerate(DIMENSIONS.items()):
+            orders = sum(p[position][0] for p in partials)
+            earnings = sum(p[position][1] for p in partials)
+            pairs = np.unique(np.concatenate([p[position][2] for p in partials]))
+            unique_customers = np.bincount((pairs >> 32).astype(np.int64), minlength=dim_sizes[position])
+
+            rows = []
+            for code in np.nonzero(orders)[0]:
+                row = {
+                    key: self.dims[name].values[code],
+                    'total_orders': int(orders[code]),
+                    'total_earnings': float(earnings[code]),
+                    'avg_order_value': float(earnings[code] / orders[code])
+                }
+                if name != 'gender':
+                    row['unique_customers'] = int(unique_customers[code])
+                rows.append(row)
+            rows.sort(key=lambda r: r['total_earnings'], reverse=True)
+            result[f'by_{key}'] = rows
+
+        result['by_postal_code'] = result['by_postal_code'][:postal_code_limit]
+        return result
+
+    def top_items(self, item_type: str = 'pizza', limit: int = 3, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Top items of a type by quantity sold in [start, end)."""
+        lines = np.ones(len(self.line_order), dtype=bool)
+        if start is not None:
+            lines &= self.order_ts[self.line_order] >= _epoch_seconds(start)
+        if end is not None:
+            lines &= self.order_ts[self.line_order] < _epoch_seconds(end)
+        of_type = np.array([key.startswith(item_type + ':') for key in self.items.values], dtype=bool)
+        if not len(of_type):
+            return []
+        lines &= of_type[self.line_item]
+
+        items = self.line_item[lines]
+        n_items = len(self.items)
+        sold = np.bincount(items, weights=self.line_quantity[lines], minlength=n_items)
+        line_count = np.bincount(items, minlength=n_items)
+        pairs = np.unique(items.astype(np.int64) << 32 | self.line_order[lines])
+        orders_count = np.bincount((pairs >> 32).astype(np.int64), minlength=n_items)
+
+        best = [code for code in np.argsort(-sold, kind='stable')[:limit] if line_count[code]]
+        return [{
+            'item_type': item_type,
+            'item_id': int(self.items.values[code].split(':')[1]),
+            'name': self.item_names.get(self.items.values[code], f"Unknown {item_type}"),
+            'total_sold': int(sold[code]),
+            'orders_count': int(orders_count[code]),
+            'avg_per_order': float(sold[code] / line_count[code])
+        } for code in best]
+
+    def top_pizzas(self, limit: int = 3, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Columnar get_top_pizzas_past_month (past 30 days by default)."""
+        if start is None and end is None:
+            start = datetime.utcnow() - timedelta(days=30)
+        return [{
+            'pizza_name': row['name'],
+            'total_sold': row['total_sold'],
+            'orders_count': row['orders_count'],
+            'avg_per_order': row['avg_per_order']
+        } for row in self.top_items('pizza', limit, start, end)]
+
+    def monthly_summary(self, start: Optional[datetime] = None,
+                        end: Optional[datetime] = None) -> Dict[str, Any]:
+        """Columnar get_monthly_summary (past 30 days by default)."""
+        from staff_reports import _period_label
+        if start is None and end is None:
+            start = datetime.utcnow() - timedelta(days=30)
+            period = 'Past 30 days'
+        else:
+            period = _period_label(start, end)
+
+        mask = self._order_mask(start, end)
+        totals = self.order_total[mask]
+        pizza_codes = np.array([key.startswith('pizza:') for key in self.items.values], dtype=bool)
+        pizza_lines = mask[self.line_order]
+        if len(pizza_codes):
+            pizza_lines &= pizza_codes[self.line_item]
+        return {
+            'period': period,
+            'total_orders': int(len(totals)),
+            'total_revenue': float(totals.sum()),
+            'avg_order_value': float(totals.mean()) if len(totals) else 0,
+            'unique_customers': int(len(np.unique(self.order_customer[mask]))),
+            'total_pizzas_sold': int(self.line_quantity[pizza_lines].sum())
+        }
+
+
+def load_or_build(snapshot_path: Optional[str] = None) -> ColumnStore:
+    """
+    Load the snapshot when there is one, bring it up to date incrementally
+    and write it back.
+    """
+    if snapshot_path and os.path.exists(snapshot_path):
+        store = ColumnStore.load(snapshot_path)
+    else:
+        store = ColumnStore()
+    store.refresh()
+    if snapshot_path:
+        store.save(snapshot_path)
+    return store
+
+
+def cross_check(store: ColumnStore, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                tolerance: float = 1e-6) -> List[str]:
+    """
+    Compare the columnar reports with the SQL versions in staff_reports.
+    Returns a list of mismatch descriptions (empty when they agree).
+    """
+    import staff_reports
+
+    def compare(label, ours, theirs):
+        if isinstance(ours, dict):
+            ours, theirs = [ours], [theirs]
+        if len(ours) != len(theirs):
+            problems.append(f"{label}: {len(ours)} rows vs {len(theirs)} in SQL")
+            return
+        for a, b in zip(sorted(ours, key=str), sorted(theirs, key=str)):
+            for key in b:
+                if isinstance(b[key], float) or isinstance(a.get(key), float):
+                    if abs((a.get(key) or 0) - (b[key] or 0)) > tolerance * max(1.0, abs(b[key] or 0)):
+                        problems.append(f"{label}: {key} {a.get(key)} != {b[key]}")
+                elif a.get(key) != b[key]:
+                    problems.append(f"{label}: {key} {a.get(key)!r} != {b[key]!r}")
+
+    def rounded(rows):
+        return [{k: round(v, 6) if isinstance(v, float) else v for k, v in row.items()} for row in rows]
+
+    problems: List[str] = []
+    ours = store.earnings_breakdowns(start=start, end=end)
+    theirs = staff_reports.get_earnings_breakdowns(start=start, end=end)
+    for key in theirs:
+        # compare whole groups; row order only differs on earnings ties
+        compare(key, rounded(ours[key]), rounded(theirs[key]))
+    compare('monthly_summary', store.monthly_summary(start, end), staff_reports.get_monthly_summary(start, end))
+    compare('top_pizzas', rounded(store.top_pizzas(3, start, end)),
+            rounded(staff_reports.get_top_pizzas_past_month(3, start, end)))
+    return problems
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from app import app
+    from dimensions import refresh_dim_customer
+
+    parser = argparse.ArgumentParser(description="Columnar analytics over the order history")
+    parser.add_argument('--snapshot', help='.npz snapshot to load from and save to')
+    parser.add_argument('--workers', type=int, default=None, help='processes for large scans')
+    parser.add_argument('--check', action='store_true', help='cross-check against the SQL reports')
+    args = parser.parse_args()
+
+    with app.app_context():
+        refresh_dim_customer()
+        started = time.perf_counter()
+        store = load_or_build(args.snapshot)
+        print(f"📦 Loaded {len(store.order_id)} orders / {len(store.line_order)} lines "
+              f"in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        breakdowns = store.earnings_breakdowns(workers=args.workers)
+        print(f"📊 Breakdowns in {(time.perf_counter() - started) * 1000:.1f} ms")
+        for row in breakdowns['by_age_group']:
+            print(f"   {row['age_group']}: {row['total_orders']} orders, ${row['total_earnings']:.2f}")
+
+        if args.check:
+            problems = cross_check(store)
+            if problems:
+                print("❌ Mismatches:")
+                for problem in problems:
+                    print(f"   {problem}")
+            else:
+                print("✅ Columnar reports match SQL")
@@ -1,31 +1,42 @@
 """
 Kopernik Pizza - Main Flask Application
+
+create_app() builds an application: customer pages and the order API
+are registered here, staff and admin pages come from blueprints.py and
+import their modules on first use. `from app import app` still works and
+builds the default application (KOPERNIK_CONFIG) on first access.
 """
 
-from flask import Flask, render_template, request, jsonify
-from config import Config
+import os
+import threading
+import time
+from typing import Dict
+
+from flask import Blueprint, Flask, render_template, request, jsonify, Response
 from extensions import db
-from models import Pizza, Customer, Order, OrderItem, DiscountCode, Drink, Dessert
-from utils import apply_discounts, assign_delivery_person_sql
-from staff_reports import (
-    get_undelivered_orders, get_top_pizzas_past_month, 
-    get_earnings_by_gender, get_earnings_by_age_group, 
-    get_earnings_by_postal_code, get_monthly_summary
-)
-from transactions import create_order_transaction, test_transaction_rollback
-from database_constraints import (
-    add_database_constraints, test_constraint_violations, 
-    get_constraint_status, validate_vegetarian_pizza_constraint
-)
-
-app = Flask(__name__)
-app.config.from_object(Config)
-
-db.init_app(app)
+from models import Customer, DiscountCode
+from transactions import create_order_transaction
+from events import broker, init_order_events
+from top_sellers import top_sellers, init_top_sellers
+from catalog import catalog_cache, init_catalog_cache
+from instrumentation import init_instrumentation
+from compression import init_compression
+from snapshots import init_snapshots
+from admission import order_admission, Overloaded, overloaded_response, init_admission
+from order_lifecycle import init_order_lifecycle
+from report_schema import init_report_schema
+from customers import find_customer, init_customers
+from structured_logging import init_logging
+from tracing import init_tracing
+from metrics import registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from blueprints import staff, admin
 
 import models
 
-@app.route("/")
+shop = Blueprint('shop', __name__)
+
+
+@shop.route("/")
 def hello():
     """
     Home page with navigation links.
@@ -58,49 +69,25 @@ def hello():
     </div>
     '''
 
-@app.route("/menu")
+@shop.route("/menu")
 def menu():
     """
     Display complete menu with pizzas, drinks and desserts.
     """
-    pizzas = Pizza.query.all()
-    drinks = Drink.query.all()
-    desserts = Dessert.query.all()
-    return render_template('menu.html', pizzas=pizzas, drinks=drinks, desserts=desserts)
+    catalog = catalog_cache.menu()
+    return render_template('menu.html', pizzas=catalog['pizzas'], drinks=catalog['drinks'],
+                           desserts=catalog['desserts'])
 
 
-@app.route("/checkout")
+@shop.route("/checkout")
 def checkout():
-    pizzas = Pizza.query.all()
-    drinks = Drink.query.all()
-    desserts = Dessert.query.all()
-
-    pizzas_data = []
-    for p in pizzas:
-        pizzas_data.append({
-            "id": p.id,
-            "name": p.name,
-            "price": round(p.calculate_price(), 2) if hasattr(p, "calculate_price") else float(p.base_price or 0),
-            "type": "pizza"
-        })
-
-    drinks_data = []
-    for d in drinks:
-        drinks_data.append({
-            "id": d.id,
-            "name": d.name,
-            "price": float(d.price),
-            "type": "drink"
-        })
-
-    desserts_data = []
-    for d in desserts:
-        desserts_data.append({
-            "id": d.id,
-            "name": d.name,
-            "price": float(d.price),
-            "type": "dessert"
-        })
+    catalog = catalog_cache.menu()
+    pizzas_data = [{"id": p["id"], "name": p["name"], "price": round(p["price"], 2), "type": "pizza"}
+                   for p in catalog['pizzas']]
+    drinks_data = [{"id": d["id"], "name": d["name"], "price": d["price"], "type": "drink"}
+                   for d in catalog['drinks']]
+    desserts_data = [{"id": d["id"], "name": d["name"], "price": d["price"], "type": "dessert"}
+                     for d in catalog['desserts']]
 
     # Combine all items for JavaScript access
     all_items = pizzas_data + drinks_data + desserts_data
@@ -109,7 +96,7 @@ def checkout():
 
 
 
-@app.route('/orders', methods=['POST'])
+@shop.route('/orders', methods=['POST'])
 def create_order():
     """
     Create an order with transaction handling.
@@ -123,8 +110,12 @@ def create_order():
     """
     data = request.get_json() or {}
     
-    # Use new transaction-safe order creation
-    result = create_order_transaction(data)
+    # Use new transaction-safe order creation, bounded by the order admission pool
+    try:
+        with order_admission.admit():
+            result = create_order_transaction(data)
+    except Overloaded as e:
+        return overloaded_response(e)
     
     if result['success']:
         return jsonify({
@@ -144,153 +135,91 @@ def create_order():
         }), 400
 
 
-@app.route('/staff')
-def staff_dashboard():
-    """
-    Staff dashboard with reports and analytics.
-    """
-    try:
-        # Get all required reports
-        undelivered = get_undelivered_orders()
-        top_pizzas = get_top_pizzas_past_month(3)
-        monthly_summary = get_monthly_summary()
-        gender_earnings = get_earnings_by_gender()
-        age_earnings = get_earnings_by_age_group()
-        postal_earnings = get_earnings_by_postal_code()
-        
-        return render_template('staff_dashboard.html', 
-                             undelivered_orders=undelivered,
-                             top_pizzas=top_pizzas,
-                             monthly_summary=monthly_summary,
-                             gender_earnings=gender_earnings,
-                             age_earnings=age_earnings,
-                             postal_earnings=postal_earnings)
-    except Exception as e:
-        return f"<h1>Staff Dashboard Error</h1><p>{str(e)}</p><a href='/'>← Back to Home</a>"
-
-
-@app.route('/staff/reports/undelivered')
-def undelivered_orders_report():
-    """API endpoint for undelivered orders report."""
-    try:
-        orders = get_undelivered_orders()
-        return jsonify({"undelivered_orders": orders})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+@shop.route('/metrics')
+def metrics():
+    """Order step latencies, order/rollback counts and report timings in Prometheus text format."""
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
 
 
-@app.route('/staff/reports/top-pizzas')
-def top_pizzas_report():
-    """API endpoint for top pizzas report."""
-    try:
-        pizzas = get_top_pizzas_past_month(3)
-        return jsonify({"top_pizzas": pizzas})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
-@app.route('/staff/reports/earnings')
-def earnings_report():
-    """API endpoint for earnings breakdown reports."""
-    try:
-        return jsonify({
-            "monthly_summary": get_monthly_summary(),
-            "by_gender": get_earnings_by_gender(),
-            "by_age_group": get_earnings_by_age_group(),
-            "by_postal_code": get_earnings_by_postal_code()
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
-@app.route('/staff/test-transactions')
-def test_transactions():
+def warm_up(app) -> Dict[str, float]:
     """
-    Test transaction rollback functionality.
+    Prime the catalog/pricing cache, compile the hot order-path SQL and the
+    customer templates, and warm-start top sellers before the first request.
+    Returns milliseconds per phase.
     """
-    try:
-        results = test_transaction_rollback()
-        
-        html = "<h1>🔄 Transaction Rollback Tests</h1>"
-        html += f"<p><strong>Results: {results['passed_tests']}/{results['total_tests']} tests passed</strong></p>"
-        html += "<div style='font-family: monospace; background: #f5f5f5; padding: 20px; margin: 20px 0;'>"
-        
-        for test in results['results']:
-            status = "✅ PASS" if test['passed'] else "❌ FAIL"
-            html += f"<p><strong>{status} {test['test']}</strong><br>"
-            html += f"Expected: {test['expected']}, Got: {test['actual']}<br>"
-            html += f"Message: {test['message']}</p>"
-        
-        html += "</div>"
-        html += "<a href='/staff'>← Back to Dashboard</a> | "
-        html += "<a href='/'>← Home</a>"
-        
-        return html
-    except Exception as e:
-        return f"<h1>Transaction Test Error</h1><p>{str(e)}</p><a href='/staff'>← Back to Dashboard</a>"
-
-
-@app.route('/staff/setup-constraints')
-def setup_constraints():
-    """
-    Set up database constraints for data integrity.
-    """
-    try:
-        results = add_database_constraints()
-        
-        html = "<h1>🛡️ Database Constraints Setup</h1>"
-        html += "<div style='font-family: monospace; background: #f5f5f5; padding: 20px; margin: 20px 0;'>"
-        
-        for result in results:
-            html += f"<p>{result}</p>"
-        
-        html += "</div>"
-        html += "<a href='/staff/test-constraints'>🧪 Test Constraints</a> | "
-        html += "<a href='/staff'>← Back to Dashboard</a>"
-        
-        return html
-    except Exception as e:
-        return f"<h1>Constraint Setup Error</h1><p>{str(e)}</p><a href='/staff'>← Back to Dashboard</a>"
-
-
-@app.route('/staff/test-constraints')
-def test_constraints():
+    timings = {}
+    started = time.perf_counter()
+    with app.app_context():
+        catalog_cache.menu()
+        timings['catalog'] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        # lookups run by create_order_transaction; ids that never match, so only compilation is paid
+        db.session.get(Customer, 0)
+        db.session.get(DiscountCode, '')
+        # the existing-customer lookup of _resolve_customer (raw, normalized and lower(email))
+        find_customer('', '')
+        top_sellers.ensure_warm()
+        db.session.remove()
+        timings['sql'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    client = app.test_client()
+    for path in ('/menu', '/checkout'):
+        client.get(path)
+    timings['templates'] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def create_app(config=None, warm: bool = None) -> Flask:
     """
-    Test database constraints.
+    Build the application. `config` is a config object or import path
+    (default: KOPERNIK_CONFIG, else config.Config); `warm` runs warm_up()
+    before returning (default: the WARM_UP config value).
     """
-    try:
-        test_results = test_constraint_violations()
-        status_info = get_constraint_status()
-        
-        html = "<h1>🧪 Database Constraint Tests</h1>"
-        
-        # Show constraint status
-        if 'error' not in status_info:
-            html += f"<p><strong>Status:</strong> {status_info['triggers_installed']} constraints installed, "
-            html += f"{status_info['current_violations']} violations found</p>"
-        
-        # Show test results
-        passed = sum(1 for test in test_results if test['passed'])
-        total = len(test_results)
-        html += f"<p><strong>Test Results: {passed}/{total} tests passed</strong></p>"
-        
-        html += "<div style='font-family: monospace; background: #f5f5f5; padding: 20px; margin: 20px 0;'>"
-        
-        for test in test_results:
-            status = "✅ PASS" if test['passed'] else "❌ FAIL"
-            html += f"<p><strong>{status} {test['test']}</strong><br>"
-            html += f"Expected: {test['expected']}, Got: {test['actual']}<br>"
-            html += f"Message: {test['message']}</p>"
-        
-        html += "</div>"
-        html += "<a href='/staff/setup-constraints'>🛡️ Setup Constraints</a> | "
-        html += "<a href='/staff'>← Back to Dashboard</a>"
-        
-        return html
-    except Exception as e:
-        return f"<h1>Constraint Test Error</h1><p>{str(e)}</p><a href='/staff'>← Back to Dashboard</a>"
+    app = Flask(__name__)
+    # KOPERNIK_CONFIG selects another config class, e.g. config.TestConfig
+    app.config.from_object(config or os.environ.get("KOPERNIK_CONFIG", "config.Config"))
+    init_logging(app.config)
+
+    db.init_app(app)
+    init_snapshots(app)
+    init_admission(app)
+    init_order_lifecycle(app)
+    init_customers(app)
+    init_report_schema(app)
+    init_instrumentation(app)
+    init_tracing(app)
+    # after_request hooks run in reverse order: compressing before the slow request log is written counts its cost
+    init_compression(app)
+    init_order_events()
+    init_top_sellers(broker)
+    init_catalog_cache(app.config.get('CATALOG_TTL_SECONDS'))
+
+    app.register_blueprint(shop)
+    app.register_blueprint(staff)
+    app.register_blueprint(admin)
+
+    if app.config.get('WARM_UP') if warm is None else warm:
+        warm_up(app)
+    return app
+
+
+_default_app = None
+_default_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # `from app import app`: the default application, built on first access
+    global _default_app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _default_app_lock:
+        if _default_app is None:
+            _default_app = create_app()
+    return _default_app
 
 
 if __name__ == "__main__":
     # Run on all interfaces so localhost and other hosts can reach it if necessary
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    create_app().run(debug=True, host="0.0.0.0", port=5000)
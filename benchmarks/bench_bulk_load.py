@@ -0,0 +1,101 @@
+"""
+Bulk Load Benchmark
+Insert throughput with the row-by-row constraint triggers installed versus
+inside database_constraints.bulk_load() (triggers suspended, set-based
+validation of the loaded rows at the end).
+
+Usage:
+    python benchmarks/bench_bulk_load.py [--rows 200000] [--runs 3]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+from extensions import db
+import models  # noqa: F401 - registers the tables
+from database_constraints import add_database_constraints, bulk_load
+
+TABLES = {
+    'ingredients': "INSERT INTO ingredients (name, cost_per_unit, is_vegetarian, is_vegan) "
+                   "VALUES (:name, :cost, 1, 0)",
+    'customers': "INSERT INTO customers (name, email, phone, address, birthday) "
+                 "VALUES (:name, :email, :phone, :address, :birthday)",
+    'order_items': "INSERT INTO order_items (order_id, item_type, item_id, pizza_id, quantity) "
+                   "VALUES (:order_id, 'pizza', :item_id, :item_id, :quantity)",
+    'discount_codes': "INSERT INTO discount_codes (code, percent_off, is_used) VALUES (:code, :percent_off, 0)"
+}
+
+
+def make_rows(table: str, count: int, offset: int, rng: random.Random):
+    today = date.today()
+    if table == 'ingredients':
+        return [{'name': f'Ingredient {offset + i}', 'cost': round(rng.uniform(0.1, 5), 2)} for i in range(count)]
+    if table == 'customers':
+        return [{
+            'name': f'Customer {offset + i}',
+            'email': f'c{offset + i}@example.com',
+            'phone': f'{offset + i:012d}',
+            'address': f'Street {i % 100}, {rng.randint(0, 99999):05d}',
+            'birthday': today - timedelta(days=rng.randint(18 * 365, 80 * 365))
+        } for i in range(count)]
+    if table == 'order_items':
+        return [{'order_id': offset + i // 3 + 1, 'item_id': rng.randint(1, 12),
+                 'quantity': rng.randint(1, 3)} for i in range(count)]
+    return [{'code': f'CODE{offset + i:09d}', 'percent_off': rng.choice([5, 10, 15])} for i in range(count)]
+
+
+def load(table: str, rows, use_bulk: bool) -> float:
+    start = time.perf_counter()
+    with (bulk_load([table]) if use_bulk else nullcontext()):
+        db.session.execute(text(TABLES[table]), rows)
+    if not use_bulk:
+        db.session.commit()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000, help='rows per table per run')
+    parser.add_argument('--runs', type=int, default=3, help='timed loads per mode')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            add_database_constraints()
+            rng = random.Random(42)
+            offset = 0
+
+            print(f"{'table':<16} {'mode':<10} {'median s':>9} {'rows/s':>12}")
+            for table in TABLES:
+                results = {}
+                for use_bulk in (False, True):
+                    timings = []
+                    for _ in range(args.runs):
+                        rows = make_rows(table, args.rows, offset, rng)
+                        offset += args.rows
+                        timings.append(load(table, rows, use_bulk))
+                    results[use_bulk] = statistics.median(timings)
+                    mode = 'bulk_load' if use_bulk else 'triggers'
+                    print(f"{table:<16} {mode:<10} {results[use_bulk]:>9.3f} {args.rows / results[use_bulk]:>12,.0f}")
+                print(f"{'':<16} speedup    {results[False] / results[True]:>9.2f}x\n")
+
+
+if __name__ == "__main__":
+    main()
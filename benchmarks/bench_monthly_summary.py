@@ -0,0 +1,113 @@
+"""
+Monthly Summary Benchmark
+Compares the legacy orders x order_items join against the pre-aggregated
+get_monthly_summary() on a generated database (default: 1M order lines).
+
+Usage:
+    python benchmarks/bench_monthly_summary.py [--lines 1000000] [--runs 5]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+from extensions import db
+import models  # noqa: F401 - registers the tables
+from models import ORDER_STATUS_CODES
+from staff_reports import get_monthly_summary
+
+LEGACY_SQL = text("""
+    SELECT
+        COUNT(DISTINCT o.id) as total_orders,
+        SUM(o.total) as total_revenue,
+        AVG(o.total) as avg_order_value,
+        COUNT(DISTINCT o.customer_id) as unique_customers,
+        SUM(oi.quantity) as total_pizzas_sold
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    WHERE o.order_date >= :month_ago
+      AND o.total IS NOT NULL
+""")
+
+
+def build_database(path: str, lines: int, seed: int = 42) -> int:
+    """Fill orders/order_items with `lines` order lines spread over a year."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    orders, items = [], []
+    order_id = 0
+    while len(items) < lines:
+        order_id += 1
+        order_date = now - timedelta(days=rng.random() * 365)
+        orders.append((order_id, rng.randint(1, 100000), order_date.isoformat(' '), ORDER_STATUS_CODES['pending'],
+                       round(rng.uniform(8, 60), 2)))
+        for _ in range(rng.randint(1, 5)):
+            item_type = rng.choice(['pizza', 'pizza', 'drink', 'dessert'])
+            item_id = rng.randint(1, 12)
+            items.append((order_id, item_type, item_id, item_id if item_type == 'pizza' else None, rng.randint(1, 3)))
+
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO orders (id, customer_id, order_date, status, total) VALUES (?, ?, ?, ?, ?)", orders)
+    conn.executemany(
+        "INSERT INTO order_items (order_id, item_type, item_id, pizza_id, quantity) VALUES (?, ?, ?, ?, ?)", items)
+    conn.commit()
+    conn.close()
+    return len(orders)
+
+
+def time_call(fn, runs: int):
+    timings = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=1_000_000, help='number of order lines to generate')
+    parser.add_argument('--runs', type=int, default=5, help='timed runs per query')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            print(f"Generating {args.lines:,} order lines...")
+            order_count = build_database(path, args.lines)
+            print(f"Generated {order_count:,} orders\n")
+
+            month_ago = datetime.utcnow() - timedelta(days=30)
+            legacy, legacy_times = time_call(
+                lambda: db.session.execute(LEGACY_SQL, {'month_ago': month_ago}).fetchone(), args.runs)
+            summary, new_times = time_call(get_monthly_summary, args.runs)
+
+            print(f"{'query':<12} {'median ms':>10} {'min ms':>10}")
+            for name, timings in (('legacy', legacy_times), ('new', new_times)):
+                print(f"{name:<12} {statistics.median(timings) * 1000:>10.1f} {min(timings) * 1000:>10.1f}")
+
+            print("\nLegacy revenue (inflated per line):  €{:,.2f}".format(legacy[1] or 0))
+            print("Pre-aggregated revenue:              €{:,.2f}".format(summary['total_revenue']))
+            print(f"Legacy pizzas sold (all item types): {legacy[4] or 0:,}")
+            print(f"Pizzas sold (pizza lines only):      {summary['total_pizzas_sold']:,}")
+
+
+if __name__ == "__main__":
+    main()
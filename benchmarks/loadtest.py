@@ -0,0 +1,420 @@
+"""
+HTTP Load Test
+Drives a mix of menu views, checkouts, order placements and dashboard
+polls from many concurrent clients and reports throughput, error rates
+and p50/p95/p99 latency per endpoint, plus a per-second time series.
+
+Orders mix returning customers, new customers, one-time discount codes
+and birthday customers (pizza + drink, both free). Client counts can be
+stepped (--clients 1,4,16,32) to find the saturation point.
+
+Server modes:
+    subprocess  (default) the app served by a threaded werkzeug server in
+                a child process, on a copy of --db
+    inprocess   same server on a thread of this process (shares the GIL
+                with the clients, so it saturates earlier)
+    url         an already running server (--url); --db is only read for ids
+
+Usage:
+    python benchmarks/loadtest.py --clients 1,4,16 --duration 20
+    python benchmarks/loadtest.py --mix menu=60,order=30,dashboard=10 --json load.json --timeseries load.csv
+    python benchmarks/loadtest.py --mode url --url http://127.0.0.1:5000 --db kopernikpizza.db
+"""
+
+import argparse
+import bisect
+import csv
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import date
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_MIX = 'menu=45,checkout=15,order=30,dashboard=10'
+# Order flavours, as shares of all orders
+NEW_CUSTOMER_SHARE = 0.25
+BIRTHDAY_SHARE = 0.05
+DISCOUNT_SHARE = 0.10
+DISCOUNT_CODES = 2000
+# Latency histogram bucket upper bounds, ms
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf')]
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Workload:
+    """Ids read from the database and the request generator built on them."""
+
+    def __init__(self, db_path: str, mix: dict, seed: int = 42):
+        conn = sqlite3.connect(db_path)
+        try:
+            self.customer_ids = [r[0] for r in conn.execute("SELECT id FROM customers")]
+            self.pizza_ids = [r[0] for r in conn.execute("SELECT id FROM pizzas")]
+            self.drink_ids = [r[0] for r in conn.execute("SELECT id FROM drinks")]
+            self.dessert_ids = [r[0] for r in conn.execute("SELECT id FROM desserts")]
+            self.codes = [r[0] for r in conn.execute("SELECT code FROM discount_codes WHERE is_used = 0")]
+        finally:
+            conn.close()
+        if not self.pizza_ids or not self.drink_ids:
+            raise SystemExit("The database has no pizzas/drinks - run seed.py first")
+
+        self.names = list(mix)
+        self.cum_weights = []
+        total = 0
+        for name in self.names:
+            total += mix[name]
+            self.cum_weights.append(total)
+        self.seed = seed
+        self._codes_lock = threading.Lock()
+
+    def pick(self, rng: random.Random) -> str:
+        return self.names[bisect.bisect(self.cum_weights, rng.random() * self.cum_weights[-1])]
+
+    def request(self, name: str, rng: random.Random):
+        """(endpoint label, method, path, json body) for one request of kind `name`."""
+        if name == 'menu':
+            return 'GET /menu', 'GET', '/menu', None
+        if name == 'checkout':
+            return 'GET /checkout', 'GET', '/checkout', None
+        if name == 'dashboard':
+            return 'GET /staff', 'GET', '/staff', None
+        return self._order(rng)
+
+    def _order(self, rng: random.Random):
+        items = [{'item_type': 'pizza', 'item_id': rng.choice(self.pizza_ids), 'quantity': rng.randint(1, 2)}]
+        if rng.random() < 0.6:
+            items.append({'item_type': 'drink', 'item_id': rng.choice(self.drink_ids), 'quantity': 1})
+        if self.dessert_ids and rng.random() < 0.25:
+            items.append({'item_type': 'dessert', 'item_id': rng.choice(self.dessert_ids), 'quantity': 1})
+
+        roll = rng.random()
+        if roll < BIRTHDAY_SHARE:
+            label = 'POST /orders (birthday)'
+            body = {'customer': self._new_customer(birthday=date.today().isoformat())}
+            if len(items) == 1:
+                items.append({'item_type': 'drink', 'item_id': rng.choice(self.drink_ids), 'quantity': 1})
+        elif roll < BIRTHDAY_SHARE + NEW_CUSTOMER_SHARE or not self.customer_ids:
+            label = 'POST /orders (new customer)'
+            body = {'customer': self._new_customer(birthday=None)}
+        else:
+            label = 'POST /orders'
+            body = {'customer_id': rng.choice(self.customer_ids)}
+
+        if rng.random() < DISCOUNT_SHARE:
+            with self._codes_lock:
+                code = self.codes.pop() if self.codes else None
+            if code:
+                body['discount_code'] = code
+                label += ' +code'
+        body['items'] = items
+        return label, 'POST', '/orders', body
+
+    @staticmethod
+    def _new_customer(birthday):
+        token = uuid.uuid4().hex[:12]
+        customer = {
+            'name': f'Load {token}',
+            'email': f'load-{token}@example.com',
+            'phone': f'+1{int(token, 16) % 10**12:012d}',
+            'address': f'Via Roma 1, 00{random.randint(1, 3)}00 Rome'
+        }
+        if birthday:
+            customer['birthday'] = birthday
+        return customer
+
+
+class Recorder:
+    """Thread-safe latency samples per endpoint and per wall-clock second."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)     # endpoint -> [ms]
+        self.errors = defaultdict(int)       # endpoint -> count
+        self.error_examples = {}
+        self.per_second = defaultdict(lambda: {'requests': 0, 'errors': 0, 'latencies': []})
+
+    def record(self, endpoint: str, started: float, elapsed_ms: float, ok: bool, error: str = None,
+               stage: int = 0) -> None:
+        with self.lock:
+            self.samples[endpoint].append(elapsed_ms)
+            second = self.per_second[(stage, int(started))]
+            second['requests'] += 1
+            second['latencies'].append(elapsed_ms)
+            if not ok:
+                self.errors[endpoint] += 1
+                second['errors'] += 1
+                self.error_examples.setdefault(endpoint, error)
+
+
+def client_loop(base_url: str, workload: Workload, recorder: Recorder, stop: threading.Event,
+                seed: int, stage: int, honour_retry_after: bool = True) -> None:
+    rng = random.Random(seed)
+    target = urlparse(base_url)
+    conn = None
+    while not stop.is_set():
+        endpoint, method, path, body = workload.request(workload.pick(rng), rng)
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        started = time.time()
+        start = time.perf_counter()
+        ok, error, retry_after = False, None, None
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+            conn.request(method, path, body=payload, headers=headers)
+            resp = conn.getresponse()
+            content = resp.read()
+            ok = 200 <= resp.status < 300
+            if not ok:
+                error = f"{resp.status}: {content[:200].decode(errors='replace')}"
+                retry_after = resp.getheader('Retry-After')
+        except (OSError, http.client.HTTPException) as e:
+            error = f"{type(e).__name__}: {e}"
+            if conn is not None:
+                conn.close()
+            conn = None
+        recorder.record(endpoint, started, (time.perf_counter() - start) * 1000, ok, error, stage)
+        if retry_after and honour_retry_after:
+            # back off like a well-behaved client instead of hammering a shedding server
+            stop.wait(float(retry_after))
+    if conn is not None:
+        conn.close()
+
+
+def run_stage(base_url: str, workload: Workload, recorder: Recorder, clients: int, duration: float,
+              stage: int, honour_retry_after: bool = True) -> float:
+    stop = threading.Event()
+    threads = [threading.Thread(target=client_loop, daemon=True,
+                                args=(base_url, workload, recorder, stop, workload.seed + stage * 1000 + i, stage,
+                                      honour_retry_after))
+               for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join(timeout=60)
+    return time.perf_counter() - started
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        histogram = [0] * len(BUCKETS_MS)
+        for ms in ordered:
+            histogram[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        endpoints[endpoint] = {
+            'requests': len(ordered),
+            'errors': recorder.errors.get(endpoint, 0),
+            'error_rate': recorder.errors.get(endpoint, 0) / len(ordered),
+            'throughput_rps': len(ordered) / elapsed,
+            'mean_ms': statistics.fmean(ordered),
+            'p50_ms': percentile(ordered, 0.50),
+            'p95_ms': percentile(ordered, 0.95),
+            'p99_ms': percentile(ordered, 0.99),
+            'max_ms': ordered[-1],
+            'histogram': {('inf' if b == float('inf') else f'{b:g}'): n for b, n in zip(BUCKETS_MS, histogram)},
+            'example_error': recorder.error_examples.get(endpoint)
+        }
+    total = sum(e['requests'] for e in endpoints.values())
+    errors = sum(e['errors'] for e in endpoints.values())
+    orders = sum(e['requests'] - e['errors'] for name, e in endpoints.items() if name.startswith('POST /orders'))
+    return {
+        'elapsed_s': elapsed,
+        'requests': total,
+        'errors': errors,
+        'error_rate': errors / total if total else 0,
+        'throughput_rps': total / elapsed if elapsed else 0,
+        'orders_per_second': orders / elapsed if elapsed else 0,
+        'endpoints': endpoints
+    }
+
+
+def timeseries(recorder: Recorder, clients_by_stage: dict) -> list:
+    rows = []
+    first = {}
+    for (stage, second) in sorted(recorder.per_second):
+        first.setdefault(stage, second)
+        bucket = recorder.per_second[(stage, second)]
+        ordered = sorted(bucket['latencies'])
+        rows.append({
+            'stage': stage,
+            'clients': clients_by_stage[stage],
+            'second': second - first[stage],
+            'requests': bucket['requests'],
+            'errors': bucket['errors'],
+            'p50_ms': round(percentile(ordered, 0.50), 2),
+            'p95_ms': round(percentile(ordered, 0.95), 2),
+            'p99_ms': round(percentile(ordered, 0.99), 2)
+        })
+    return rows
+
+
+def print_summary(clients: int, summary: dict) -> None:
+    print(f"\n👥 {clients} clients: {summary['throughput_rps']:.1f} req/s, "
+          f"{summary['orders_per_second']:.1f} orders/s, {summary['error_rate']:.2%} errors")
+    print(f"{'endpoint':<38} {'req':>7} {'err%':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, e in summary['endpoints'].items():
+        print(f"{name:<38} {e['requests']:>7} {e['error_rate'] * 100:>5.1f}% {e['throughput_rps']:>7.1f} "
+              f"{e['p50_ms']:>8.1f} {e['p95_ms']:>8.1f} {e['p99_ms']:>8.1f}")
+    for name, e in summary['endpoints'].items():
+        if e['example_error']:
+            print(f"   ⚠️  {name}: {e['example_error']}")
+
+
+# -- servers --------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve(port: int) -> None:
+    """Child process / thread target: the app on a threaded werkzeug server."""
+    import logging
+    from werkzeug.serving import make_server
+    from app import app
+
+    # per-request access and order-step logging would dominate the output
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    logging.getLogger('transactions').setLevel(logging.ERROR)
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def wait_until_up(base_url: str, timeout: float = 30) -> None:
+    target = urlparse(base_url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(target.hostname, target.port, timeout=2)
+            conn.request('GET', '/menu')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"Server at {base_url} did not come up")
+
+
+def prepare_database(source: str, workdir: str) -> str:
+    """Copy the database and add one-time discount codes for the order mix."""
+    path = os.path.join(workdir, 'loadtest.db')
+    shutil.copyfile(source, path)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT OR IGNORE INTO discount_codes (code, percent_off, is_used) VALUES (?, ?, 0)",
+                     [(f'LOAD{i:05d}', 10.0) for i in range(DISCOUNT_CODES)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['subprocess', 'inprocess', 'url'], default='subprocess')
+    parser.add_argument('--url', help='base URL of a running server (--mode url)')
+    parser.add_argument('--db', default=os.path.join(ROOT, 'kopernikpizza.db'),
+                        help='database to copy (or only read ids from, in url mode)')
+    parser.add_argument('--clients', default='8', help='concurrent clients; comma-separated for stepped stages')
+    parser.add_argument('--duration', type=float, default=15, help='seconds per stage')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'request mix weights (default {DEFAULT_MIX})')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--ignore-retry-after', action='store_true',
+                        help='retry 503s immediately instead of waiting for Retry-After')
+    parser.add_argument('--json', help='write the summary (with histograms) as JSON')
+    parser.add_argument('--timeseries', help='write the per-second series as CSV')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    mix = {}
+    for part in args.mix.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('menu', 'checkout', 'order', 'dashboard'):
+            parser.error(f"Unknown mix entry '{name}'")
+        mix[name] = float(weight)
+    stages = [int(c) for c in args.clients.split(',')]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = None
+        if args.mode == 'url':
+            if not args.url:
+                parser.error('--mode url needs --url')
+            base_url, db_path = args.url.rstrip('/'), args.db
+        else:
+            db_path = prepare_database(args.db, tmp)
+            port = free_port()
+            base_url = f'http://127.0.0.1:{port}'
+            os.environ['KOPERNIK_DATABASE_URI'] = 'sqlite:///' + db_path
+            if args.mode == 'subprocess':
+                server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', str(port)],
+                                          cwd=ROOT, env=os.environ.copy(), stdout=subprocess.DEVNULL)
+            else:
+                threading.Thread(target=serve, args=(port,), daemon=True).start()
+
+        try:
+            wait_until_up(base_url)
+            workload = Workload(db_path, mix, args.seed)
+            report = {'mode': args.mode, 'mix': mix, 'duration_s': args.duration, 'stages': []}
+            recorder_all = Recorder()
+            for stage, clients in enumerate(stages):
+                recorder = Recorder()
+                elapsed = run_stage(base_url, workload, recorder, clients, args.duration, stage,
+                                    not args.ignore_retry_after)
+                summary = summarize(recorder, elapsed)
+                print_summary(clients, summary)
+                report['stages'].append({'clients': clients, **summary})
+                recorder_all.per_second.update(recorder.per_second)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+
+    if len(stages) > 1:
+        print("\n📈 Saturation")
+        print(f"{'clients':>8} {'req/s':>8} {'orders/s':>9} {'p99 order ms':>13} {'errors':>7}")
+        for stage in report['stages']:
+            order_p99 = max((e['p99_ms'] for n, e in stage['endpoints'].items() if n.startswith('POST')), default=0)
+            print(f"{stage['clients']:>8} {stage['throughput_rps']:>8.1f} {stage['orders_per_second']:>9.1f} "
+                  f"{order_p99:>13.1f} {stage['error_rate']:>7.2%}")
+
+    series = timeseries(recorder_all, dict(enumerate(stages)))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({**report, 'timeseries': series}, f, indent=2)
+        print(f"\n💾 Summary written to {args.json}")
+    if args.timeseries:
+        with open(args.timeseries, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(series[0]) if series else ['stage'])
+            writer.writeheader()
+            writer.writerows(series)
+        print(f"💾 Time series written to {args.timeseries}")
+
+
+if __name__ == "__main__":
+    main()
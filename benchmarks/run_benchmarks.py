@@ -0,0 +1,299 @@
+"""
+Benchmark Suite
+Times the hot paths against generated databases at several scales and
+records wall time together with the number of SQL queries per call.
+
+- Pages: GET /menu, GET /checkout, POST /orders, GET /staff (dashboard)
+- Business logic: apply_discounts, assign_delivery_person_sql
+- Every staff_reports function (plus the dim_customer refresh)
+
+Databases are generated once per scale with generate_data.py and cached
+in benchmarks/data/; each run works on a copy, in a subprocess pointed at
+it through KOPERNIK_DATABASE_URI.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scales 1k,100k,1M              # writes benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import runpy
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+DEFAULT_SCALES = '1k,100k,1M'
+LINES_PER_ORDER = 2.31  # mean basket size in generate_data
+HISTORY_DAYS = 730
+SEED = 42
+
+
+def parse_scale(value: str) -> int:
+    """'1k' -> 1000, '1M' -> 1000000."""
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    value = value.strip()
+    if value[-1].lower() in multipliers:
+        return int(float(value[:-1]) * multipliers[value[-1].lower()])
+    return int(value)
+
+
+def database_path(orders: int) -> str:
+    return os.path.join(DATA_DIR, f'bench_{orders}.db')
+
+
+def _run_child(args, db_path: str, quiet: bool = False) -> None:
+    env = dict(os.environ, KOPERNIK_DATABASE_URI='sqlite:///' + db_path)
+    subprocess.run([sys.executable, os.path.abspath(__file__)] + args, env=env, check=True, cwd=ROOT,
+                   stdout=subprocess.DEVNULL if quiet else None)
+
+
+# -- child processes (app bound to the benchmark database) -----------------
+
+def build_database(orders: int) -> None:
+    """Schema, seed.py catalog and generated history for `orders` orders."""
+    from app import app
+    from extensions import db
+    from database_constraints import add_database_constraints
+    from generate_data import generate
+
+    with app.app_context():
+        db.create_all()
+        add_database_constraints()
+    runpy.run_path(os.path.join(ROOT, 'seed.py'))
+    with app.app_context():
+        result = generate(customers=max(100, orders // 10), lines=int(orders * LINES_PER_ORDER),
+                          days=HISTORY_DAYS, seed=SEED, progress=print)
+    print(f"✅ Built {result['orders']:,} orders / {result['order_lines']:,} lines")
+
+
+def measure(fn, runs: int, counter: dict, setup=None) -> dict:
+    """Median/min/max wall time and median query count of fn over `runs` calls (after a warm-up)."""
+    if setup:
+        setup()
+    fn()
+    timings, queries = [], []
+    for _ in range(runs):
+        if setup:
+            setup()
+        before = counter['queries']
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+        queries.append(counter['queries'] - before)
+    return {
+        'runs': runs,
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'max_ms': round(max(timings) * 1000, 3),
+        'queries': statistics.median(queries)
+    }
+
+
+def run_suite(runs: int, result_path: str) -> None:
+    """Run every benchmark against the configured database; write JSON to result_path."""
+    from sqlalchemy import event, text
+    from app import app
+    from extensions import db
+    from models import Order, Pizza, Drink
+    from utils import apply_discounts, assign_delivery_person_sql
+    from dimensions import refresh_dim_customer
+    import staff_reports
+
+    # order placement logs every step at INFO
+    logging.getLogger('transactions').setLevel(logging.WARNING)
+    counter = {'queries': 0}
+    rng = random.Random(SEED)
+    results = {}
+
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_query(conn, cursor, statement, parameters, context, executemany):
+            counter['queries'] += 1
+
+        refresh_dim_customer()
+        stats = db.session.execute(text(
+            "SELECT (SELECT COUNT(*) FROM orders), (SELECT COUNT(*) FROM order_items)")).fetchone()
+        customer_ids = [row[0] for row in db.session.execute(text("SELECT id FROM customers"))]
+        pizza_ids = [p.id for p in Pizza.query.all()]
+        drink_ids = [d.id for d in Drink.query.all()]
+        order_id = db.session.execute(text("SELECT MAX(id) FROM orders WHERE total IS NOT NULL")).scalar()
+
+        reports = {
+            'report.undelivered_orders': staff_reports.get_undelivered_orders,
+            'report.top_pizzas': lambda: staff_reports.get_top_pizzas_past_month(3),
+            'report.monthly_summary': staff_reports.get_monthly_summary,
+            'report.earnings_by_gender': staff_reports.get_earnings_by_gender,
+            'report.earnings_by_age_group': staff_reports.get_earnings_by_age_group,
+            'report.earnings_by_postal_code': staff_reports.get_earnings_by_postal_code,
+            'report.earnings_breakdowns': staff_reports.get_earnings_breakdowns,
+            'report.earnings_timeseries': lambda: staff_reports.get_earnings_timeseries(granularity='month'),
+            'report.refresh_dim_customer': refresh_dim_customer,
+        }
+        for name, fn in reports.items():
+            results[name] = measure(fn, runs, counter)
+
+        def discount():
+            db.session.expire_all()
+            apply_discounts(db.session.get(Order, order_id))
+
+        def reset_couriers():
+            db.session.execute(text("UPDATE delivery_persons SET last_delivery_time = NULL"))
+            db.session.commit()
+
+        results['logic.apply_discounts'] = measure(discount, runs, counter)
+        results['logic.assign_delivery_person'] = measure(
+            lambda: assign_delivery_person_sql(db.session.get(Order, order_id)), runs, counter, reset_couriers)
+
+    # Requests run outside any app context, like real ones
+    client = app.test_client()
+
+    def get(path):
+        def call():
+            resp = client.get(path)
+            assert resp.status_code == 200, f"{path}: {resp.status_code}"
+        return call
+
+    def place_order():
+        payload = {
+            'customer_id': rng.choice(customer_ids),
+            'items': [
+                {'item_type': 'pizza', 'item_id': rng.choice(pizza_ids), 'quantity': rng.randint(1, 2)},
+                {'item_type': 'drink', 'item_id': rng.choice(drink_ids), 'quantity': 1}
+            ]
+        }
+        resp = client.post('/orders', json=payload)
+        assert resp.status_code == 201, f"POST /orders: {resp.get_json()}"
+
+    results['http.menu'] = measure(get('/menu'), runs, counter)
+    results['http.checkout'] = measure(get('/checkout'), runs, counter)
+    results['http.place_order'] = measure(place_order, runs, counter)
+    results['http.staff_dashboard'] = measure(get('/staff'), runs, counter)
+
+    with open(result_path, 'w') as f:
+        json.dump({'orders': stats[0], 'order_lines': stats[1], 'benchmarks': results}, f)
+
+
+# -- parent process -------------------------------------------------------
+
+def run_scales(scales, runs: int, rebuild: bool) -> dict:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    report = {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'runs': runs,
+        'scales': {}
+    }
+    for orders in scales:
+        path = database_path(orders)
+        if rebuild or not os.path.exists(path):
+            if os.path.exists(path):
+                os.remove(path)
+            print(f"🏗️  Generating database with ~{orders:,} orders...")
+            _run_child(['--build', str(orders)], path)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            work = os.path.join(tmp, 'work.db')
+            shutil.copyfile(path, work)
+            result_path = os.path.join(tmp, 'result.json')
+            print(f"⏱️  Running benchmarks at {orders:,} orders...")
+            _run_child(['--worker', '--runs', str(runs), '--result', result_path], work, quiet=True)
+            with open(result_path) as f:
+                report['scales'][str(orders)] = json.load(f)
+    return report
+
+
+def print_report(report: dict) -> None:
+    for scale, result in report['scales'].items():
+        print(f"\n📊 {int(scale):,} orders ({result['orders']:,} orders, {result['order_lines']:,} lines)")
+        print(f"{'benchmark':<34} {'median ms':>10} {'min ms':>10} {'queries':>8}")
+        for name, bench in result['benchmarks'].items():
+            print(f"{name:<34} {bench['median_ms']:>10.2f} {bench['min_ms']:>10.2f} {bench['queries']:>8g}")
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_delta_ms: float = 1.0) -> list:
+    """
+    Benchmarks slower than baseline by more than `threshold` (fraction) and
+    `min_delta_ms`, or issuing more queries. Returns a list of descriptions.
+    """
+    regressions = []
+    for scale, result in current['scales'].items():
+        base_result = baseline.get('scales', {}).get(scale)
+        if not base_result:
+            continue
+        for name, bench in result['benchmarks'].items():
+            base = base_result['benchmarks'].get(name)
+            if not base:
+                continue
+            slower = bench['median_ms'] - base['median_ms']
+            if slower > min_delta_ms and bench['median_ms'] > base['median_ms'] * (1 + threshold):
+                regressions.append(f"{scale} {name}: {base['median_ms']:.2f} -> {bench['median_ms']:.2f} ms "
+                                   f"(+{slower / base['median_ms'] * 100:.0f}%)")
+            if bench['queries'] > base['queries']:
+                regressions.append(f"{scale} {name}: {base['queries']:g} -> {bench['queries']:g} queries")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help='comma-separated order counts (k/M suffixes)')
+    parser.add_argument('--runs', type=int, default=5, help='timed runs per benchmark')
+    parser.add_argument('--rebuild', action='store_true', help='regenerate cached databases')
+    parser.add_argument('--output', help=f'results JSON (default {os.path.relpath(DEFAULT_BASELINE, ROOT)} '
+                                         'unless comparing)')
+    parser.add_argument('--compare', metavar='BASELINE', help='flag regressions against a baseline JSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown fraction (default 0.2)')
+    # internal: child process modes
+    parser.add_argument('--build', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build is not None:
+        build_database(args.build)
+        return
+    if args.worker:
+        run_suite(args.runs, args.result)
+        return
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    report = run_scales([parse_scale(s) for s in args.scales.split(',')], args.runs, args.rebuild)
+    print_report(report)
+
+    output = args.output or (None if baseline else DEFAULT_BASELINE)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results written to {os.path.relpath(output)}")
+
+    if baseline:
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions (threshold {args.threshold:.0%}):")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.compare} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Blueprints Module
+Staff and admin URL rules with lazily imported views.
+
+The rules are registered with the app up front, but each view is a
+LazyView naming `module.function`: the module (staff_views, admin_views)
+and everything it imports are only loaded when one of its URLs is first
+requested. Customer-facing pages and scripts never pay for the reporting
+stack or the admin test helpers.
+"""
+
+from flask import Blueprint
+from werkzeug.utils import cached_property, import_string
+
+
+class LazyView:
+    """A view function imported from its dotted name on first call."""
+
+    def __init__(self, import_name: str):
+        self.import_name = import_name
+        self.__module__, self.__name__ = import_name.rsplit('.', 1)
+
+    @cached_property
+    def view(self):
+        return import_string(self.import_name)
+
+    def __call__(self, *args, **kwargs):
+        return self.view(*args, **kwargs)
+
+
+def _add_lazy_rules(blueprint: Blueprint, module: str, rules) -> Blueprint:
+    """rules: (rule, function) or (rule, function, methods) tuples."""
+    for rule, function, *methods in rules:
+        blueprint.add_url_rule(rule, view_func=LazyView(f'{module}.{function}'),
+                               methods=methods[0] if methods else None)
+    return blueprint
+
+
+staff = _add_lazy_rules(Blueprint('staff', __name__), 'staff_views', [
+    ('/staff', 'staff_dashboard'),
+    ('/staff/events', 'staff_events'),
+    ('/staff/reports/undelivered', 'undelivered_orders_report'),
+    ('/staff/reports/top-pizzas', 'top_pizzas_report'),
+    ('/staff/reports/top-sellers', 'top_sellers_report'),
+    ('/staff/reports/earnings', 'earnings_report'),
+    ('/staff/reports/timeseries', 'earnings_timeseries_report'),
+    ('/staff/export/<dataset>.<fmt>', 'export_data'),
+    ('/staff/constraints/status', 'constraint_status'),
+    ('/staff/orders/status', 'transition_orders_bulk', ['POST']),
+    ('/staff/orders/<int:order_id>/status', 'transition_order', ['POST']),
+])
+
+admin = _add_lazy_rules(Blueprint('admin', __name__), 'admin_views', [
+    ('/staff/test-transactions', 'test_transactions'),
+    ('/staff/setup-constraints', 'setup_constraints'),
+    ('/staff/test-constraints', 'test_constraints'),
+    ('/staff/customers/import', 'import_customers', ['POST']),
+])
@@ -0,0 +1,129 @@
+"""
+Catalog Cache Module
+Menu rows and item prices computed once and served from memory.
+
+Pizza prices come from ingredient costs (Pizza.calculate_price), which
+costs a query per pizza when rendered straight from the ORM. The cache
+builds the whole catalog with eager loads in a few queries and keeps it
+until a commit touches a catalog table: the session hooks publish
+catalog_changed, which the other serve.py workers receive through the
+event relay (events.py). Changes made by scripts outside the server
+show up once the TTL runs out.
+"""
+
+from extensions import db
+from models import Pizza, Ingredient, PizzaIngredient, Drink, Dessert
+from events import broker
+from metrics import registry
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload
+from typing import Dict, Any, Optional, Tuple
+import threading
+import time
+
+CATALOG_MODELS = (Pizza, Ingredient, PizzaIngredient, Drink, Dessert)
+_CHANGED_KEY = 'catalog_changed'
+
+
+class CatalogCache:
+    """
+    The menu as plain dicts plus a (item_type, item_id) -> price map.
+    Thread-safe; rebuilt lazily after invalidate() or ttl_seconds.
+    """
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self._menu: Optional[Dict[str, Any]] = None
+        self._prices: Dict[Tuple[str, int], float] = {}
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def menu(self) -> Dict[str, Any]:
+        """{'pizzas': [...], 'drinks': [...], 'desserts': [...]}, each a list of dicts."""
+        with self._lock:
+            if self._menu is not None and time.monotonic() - self._built_at < self.ttl_seconds:
+                self.hits += 1
+                return self._menu
+            self.misses += 1
+            self._menu, self._prices = self._build()
+            self._built_at = time.monotonic()
+            return self._menu
+
+    def price(self, item_type: str, item_id: int) -> Optional[float]:
+        self.menu()
+        return self._prices.get((item_type, item_id))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._menu = None
+
+    def on_event(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Broker listener: a catalog commit in this or another worker."""
+        if event_type == 'catalog_changed':
+            self.invalidate()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'cached': self._menu is not None, 'hits': self.hits, 'misses': self.misses}
+
+    @staticmethod
+    def _build():
+        pizzas = Pizza.query.options(
+            selectinload(Pizza.pizza_ingredients).selectinload(PizzaIngredient.ingredient)
+        ).order_by(Pizza.id).all()
+        menu = {'pizzas': [], 'drinks': [], 'desserts': []}
+        prices = {}
+        for p in pizzas:
+            price = p.calculate_price()
+            prices[('pizza', p.id)] = price
+            menu['pizzas'].append({
+                'id': p.id,
+                'name': p.name,
+                'description': p.description,
+                'price': price,
+                'is_vegan': p.is_vegan(),
+                'is_vegetarian': p.is_vegetarian(),
+                'ingredients': [{'name': pi.ingredient.name, 'quantity': pi.quantity} for pi in p.pizza_ingredients]
+            })
+        for d in Drink.query.order_by(Drink.id).all():
+            prices[('drink', d.id)] = float(d.price)
+            menu['drinks'].append({'id': d.id, 'name': d.name, 'size': d.size, 'price': float(d.price)})
+        for d in Dessert.query.order_by(Dessert.id).all():
+            prices[('dessert', d.id)] = float(d.price)
+            menu['desserts'].append({'id': d.id, 'name': d.name, 'description': d.description,
+                                     'price': float(d.price)})
+        return menu, prices
+
+
+catalog_cache = CatalogCache()
+
+
+def _after_flush(session, flush_context):
+    if any(isinstance(obj, CATALOG_MODELS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_CHANGED_KEY] = True
+
+
+def _after_commit(session):
+    if session.info.pop(_CHANGED_KEY, False):
+        broker.publish('catalog_changed', {})
+
+
+def _after_rollback(session):
+    session.info.pop(_CHANGED_KEY, None)
+
+
+def init_catalog_cache(ttl_seconds: Optional[float] = None) -> None:
+    """Invalidate the cache on commits that change catalog rows; expose its hit counts."""
+    if ttl_seconds is not None:
+        catalog_cache.ttl_seconds = ttl_seconds
+    registry.counter('kopernik_catalog_cache_requests_total', 'Catalog cache lookups by result',
+                     ['result']).set_function(
+        lambda: {('hit',): catalog_cache.hits, ('miss',): catalog_cache.misses})
+    broker.add_listener(catalog_cache.on_event)
+    if event.contains(db.session, 'after_flush', _after_flush):
+        return
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_rollback', _after_rollback)
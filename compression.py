@@ -0,0 +1,223 @@
+"""
+Compression Module
+gzip (and brotli, when the codec is installed) for HTML, JSON, CSS and
+JavaScript responses.
+
+- The encoding is negotiated from Accept-Encoding (brotli preferred)
+- Small bodies (COMPRESS_MIN_SIZE), streamed responses, file responses
+  and bodies that already carry a Content-Encoding are left alone
+- Compressed bodies are cached by content hash, so an unchanged menu
+  page or cached report is compressed once, not on every request
+- Static files are precompressed next to the originals (`order.js.gz`,
+  `order.js.br`) at startup or with `python compression.py`, and served
+  as-is to clients that accept them
+
+Brotli is an optional dependency (pip install brotli).
+"""
+
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+from metrics import registry
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml'
+}
+STATIC_EXTENSIONS = ('.html', '.css', '.js', '.json', '.svg', '.txt')
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+COMPRESSED_RESPONSES = registry.counter(
+    'kopernik_compressed_responses_total', 'Compressed responses by encoding and cache result',
+    ['encoding', 'cache'])
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Supported encodings in order of preference."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(body: bytes, encoding: str, level: int = 6) -> bytes:
+    """Compress with a gzip-style level (1-9); brotli quality is scaled from it."""
+    if encoding == 'gzip':
+        # mtime=0 keeps the output (and its cache key downstream) deterministic
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=min(11, level + 1))
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class CompressionCache:
+    """LRU of compressed bodies keyed by (encoding, level, content hash)."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, int, bytes], bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, body: bytes, encoding: str, level: int) -> Tuple[bytes, bool]:
+        """(compressed body, whether it came from the cache)"""
+        key = (encoding, level, hashlib.blake2b(body, digest_size=16).digest())
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                return compressed, True
+        compressed = compress(body, encoding, level)
+        with self._lock:
+            self._entries[key] = compressed
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed, False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+compression_cache = CompressionCache()
+
+
+def _after_request(response):
+    config = current_app.config
+    if (not config['COMPRESS_ENABLED'] or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+            or request.method == 'HEAD'):
+        return response
+    encoding = request.accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < config['COMPRESS_MIN_SIZE']:
+        return response
+    compressed, hit = compression_cache.get(body, encoding, config['COMPRESS_LEVEL'])
+    COMPRESSED_RESPONSES.inc(encoding=encoding, cache='hit' if hit else 'miss')
+    if len(compressed) >= len(body):
+        return response
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# -- static files ---------------------------------------------------------
+
+def precompress_static(folder: str, level: int = 9, min_size: int = 0) -> Dict[str, Any]:
+    """
+    Write `<file>.gz` (and `<file>.br`) next to each compressible static
+    file whose compressed copy is missing or older than the original.
+    """
+    written, fresh, original_bytes, compressed_bytes = 0, 0, 0, 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if not name.endswith(STATIC_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            if os.path.getsize(path) < min_size:
+                continue
+            with open(path, 'rb') as f:
+                body = f.read()
+            for encoding in available_encodings():
+                target = path + SUFFIXES[encoding]
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    fresh += 1
+                    continue
+                compressed = compress(body, encoding, level)
+                # several workers may start at once: write to a temporary file and rename
+                tmp = f"{target}.{os.getpid()}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp, target)
+                written += 1
+                original_bytes += len(body)
+                compressed_bytes += len(compressed)
+    return {
+        'written': written,
+        'up_to_date': fresh,
+        'original_bytes': original_bytes,
+        'compressed_bytes': compressed_bytes
+    }
+
+
+def _precompressed(folder: str, filename: str, encoding: str) -> Optional[str]:
+    source = safe_join(folder, filename)
+    if source is None or not os.path.isfile(source):
+        return None
+    target = source + SUFFIXES[encoding]
+    if os.path.isfile(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+        return filename + SUFFIXES[encoding]
+    return None
+
+
+def _static_view(app, original):
+    def static(filename):
+        if app.config['COMPRESS_ENABLED']:
+            for encoding in available_encodings():
+                if request.accept_encodings[encoding] <= 0:
+                    continue
+                compressed = _precompressed(app.static_folder, filename, encoding)
+                if compressed:
+                    response = send_from_directory(
+                        app.static_folder, compressed,
+                        mimetype=mimetypes.guess_type(filename)[0],
+                        max_age=app.get_send_file_max_age(filename))
+                    response.headers['Content-Encoding'] = encoding
+                    response.vary.add('Accept-Encoding')
+                    return response
+        response = original(filename=filename)
+        if filename.endswith(STATIC_EXTENSIONS):
+            response.vary.add('Accept-Encoding')
+        return response
+    return static
+
+
+def init_compression(app) -> None:
+    """Compress dynamic responses; precompress and serve compressed static files."""
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_CACHE_SIZE', 256)
+    app.config.setdefault('COMPRESS_STATIC_AT_STARTUP', True)
+    compression_cache.max_entries = app.config['COMPRESS_CACHE_SIZE']
+    app.after_request(_after_request)
+
+    if app.has_static_folder and 'static' in app.view_functions:
+        app.view_functions['static'] = _static_view(app, app.view_functions['static'])
+        if app.config['COMPRESS_ENABLED'] and app.config['COMPRESS_STATIC_AT_STARTUP']:
+            try:
+                precompress_static(app.static_folder)
+            except OSError as e:
+                # read-only deployments precompress at build time instead
+                app.logger.warning(f"Could not precompress static files: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompress static files (run at build time)")
+    parser.add_argument('--static', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    parser.add_argument('--level', type=int, default=9)
+    args = parser.parse_args()
+
+    print(f"🗜️  Precompressing {args.static} ({', '.join(available_encodings())})...")
+    stats = precompress_static(args.static, level=args.level)
+    print(f"✅ {stats['written']} files written, {stats['up_to_date']} up to date")
+    if stats['original_bytes']:
+        print(f"   {stats['original_bytes']:,} -> {stats['compressed_bytes']:,} bytes")
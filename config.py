@@ -3,5 +3,60 @@ import os
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
-    SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "kopernikpizza.db")
+    # KOPERNIK_DATABASE_URI points the app at another database (benchmarks, load tests)
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        "KOPERNIK_DATABASE_URI", "sqlite:///" + os.path.join(BASE_DIR, "kopernikpizza.db")
+    )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # instrumentation.py: X-DB-* headers (always on in debug mode) and the slow request log
+    SQL_DEBUG_HEADERS = False
+    SLOW_REQUEST_MS = int(os.environ.get("KOPERNIK_SLOW_REQUEST_MS", 500))
+    SLOW_REQUEST_LOG = os.path.join(BASE_DIR, "logs", "slow_requests.log")
+    N_PLUS_ONE_THRESHOLD = 5
+
+    # snapshots.py: WAL mode; dashboard reports run in parallel on one read snapshot
+    SQLITE_WAL = True
+    PARALLEL_REPORTS = True
+    REPORT_WORKERS = int(os.environ.get("KOPERNIK_REPORT_WORKERS", 4))
+
+    # admission.py: in-flight limits (shared by serve.py workers) and per-worker queues; beyond them, 503 + Retry-After
+    ORDER_MAX_IN_FLIGHT = int(os.environ.get("KOPERNIK_ORDER_MAX_IN_FLIGHT", 4))
+    ORDER_MAX_QUEUE = int(os.environ.get("KOPERNIK_ORDER_MAX_QUEUE", 16))
+    ORDER_QUEUE_TIMEOUT_MS = 2000
+    REPORT_MAX_IN_FLIGHT = 2
+    REPORT_MAX_QUEUE = 4
+    REPORT_QUEUE_TIMEOUT_MS = 5000
+
+    # compression.py: gzip/brotli for text responses; static files precompressed at startup
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 6
+    COMPRESS_CACHE_SIZE = 256
+    COMPRESS_STATIC_AT_STARTUP = True
+
+    # app.create_app: prime caches and compile hot SQL/templates before serving
+    WARM_UP = os.environ.get("KOPERNIK_WARM_UP", "0") == "1"
+    CATALOG_TTL_SECONDS = 300
+
+    # structured_logging.py: JSON lines on stderr from a background thread
+    LOG_LEVEL = os.environ.get("KOPERNIK_LOG_LEVEL", "INFO")
+    LOG_LEVELS = {}  # per-logger overrides, e.g. {"transactions": "WARNING"}
+    LOG_FORMAT = os.environ.get("KOPERNIK_LOG_FORMAT", "json")
+    # share of orders whose individual steps are logged (summaries are always logged)
+    ORDER_LOG_SAMPLE_RATE = float(os.environ.get("KOPERNIK_ORDER_LOG_SAMPLE_RATE", 0.1))
+
+    # tracing.py: requests are traced; sampled and slow ones are written as Chrome trace files
+    TRACE_ENABLED = os.environ.get("KOPERNIK_TRACE", "1") == "1"
+    TRACE_SAMPLE_RATE = float(os.environ.get("KOPERNIK_TRACE_SAMPLE_RATE", 0.0))
+    TRACE_SLOW_MS = int(os.environ.get("KOPERNIK_TRACE_SLOW_MS", 1000))
+    TRACE_DIR = os.path.join(BASE_DIR, "logs", "traces")
+
+
+class TestConfig(Config):
+    # a private in-memory database per process (Flask-SQLAlchemy gives it a StaticPool)
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    TESTING = True
+    SLOW_REQUEST_LOG = None
+    TRACE_ENABLED = False
+    COMPRESS_STATIC_AT_STARTUP = False
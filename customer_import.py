@@ -0,0 +1,249 @@
+"""
+Customer Import Module
+Bulk import of customer records from CSV or NDJSON, streamed.
+
+- Rows are read one at a time from the file or request body; only the
+  current batch and the emails/phones already seen are kept in memory
+- Emails and phones are normalized as in customers.py, the same rules
+  the order path uses, so imported customers are found by their orders
+- Each batch is matched against existing customers with one query, then
+  written with one executemany of INSERT ... ON CONFLICT(email) /
+  ON CONFLICT(phone) DO UPDATE, and committed: orders keep flowing
+  between batches
+- Invalid rows and conflicts (email and phone belonging to two different
+  customers, a second row for an email or phone already in the file)
+  are skipped and reported with their line numbers; they never abort
+  the load
+
+    python customer_import.py customers.csv
+    python customer_import.py customers.ndjson --conflicts conflicts.csv
+"""
+
+from extensions import db
+from customers import normalize_email, normalize_phone
+from sqlalchemy import text, bindparam
+from sqlalchemy.exc import IntegrityError
+from datetime import date
+from typing import Dict, Any, List, Optional, Iterator, Iterable, IO, Tuple
+import csv
+import json
+import time
+
+FORMATS = ('csv', 'ndjson')
+DEFAULT_BATCH_SIZE = 2000
+MAX_REPORTED_PROBLEMS = 1000
+
+MATCH_SQL = text("""
+    SELECT id, email, phone FROM customers
+    WHERE email IN :emails OR phone IN :phones
+""").bindparams(bindparam('emails', expanding=True), bindparam('phones', expanding=True))
+
+# both unique keys are handled; a birthday missing from the file keeps the stored one
+UPSERT_SQL = text("""
+    INSERT INTO customers (name, email, phone, address, birthday)
+    VALUES (:name, :email, :phone, :address, :birthday)
+    ON CONFLICT(email) DO UPDATE SET
+        name = excluded.name, phone = excluded.phone, address = excluded.address,
+        birthday = COALESCE(excluded.birthday, customers.birthday)
+    ON CONFLICT(phone) DO UPDATE SET
+        name = excluded.name, email = excluded.email, address = excluded.address,
+        birthday = COALESCE(excluded.birthday, customers.birthday)
+""")
+
+
+class CustomerImportError(Exception):
+    """Raised for unreadable input (unknown format, malformed file)."""
+    pass
+
+
+def _birthday(value: Any, today: date) -> Tuple[Optional[date], Optional[str]]:
+    """(birthday, error) with the same bounds as the check_customer_birthday trigger."""
+    if value in (None, ''):
+        return None, None
+    try:
+        birthday = date.fromisoformat(str(value).strip())
+    except ValueError:
+        return None, 'invalid birthday (use YYYY-MM-DD)'
+    if birthday > today or birthday < today.replace(year=today.year - 120):
+        return None, 'birthday out of range'
+    return birthday, None
+
+
+def clean_record(record: Dict[str, Any], today: Optional[date] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """(normalized row, None) or (None, reason)."""
+    today = today or date.today()
+    name = (record.get('name') or '').strip()
+    address = (record.get('address') or '').strip()
+    if not name or not address:
+        return None, 'name and address are required'
+    email = normalize_email(record.get('email'))
+    if email is None:
+        return None, 'invalid email'
+    phone = normalize_phone(record.get('phone'))
+    if phone is None:
+        return None, 'invalid phone'
+    if len(name) > 100 or len(email) > 100 or len(address) > 200:
+        return None, 'field too long'
+    birthday, error = _birthday(record.get('birthday'), today)
+    if error:
+        return None, error
+    return {'name': name, 'email': email, 'phone': phone, 'address': address, 'birthday': birthday}, None
+
+
+def iter_records(stream: IO[str], fmt: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(line number, record) pairs from a text stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        if reader.fieldnames is None or not {'name', 'email', 'phone', 'address'} <= set(reader.fieldnames):
+            raise CustomerImportError("CSV header must include name, email, phone and address")
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'ndjson':
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_number, record if isinstance(record, dict) else {}
+    else:
+        raise CustomerImportError(f"Unknown format: {fmt} (expected one of {', '.join(FORMATS)})")
+
+
+def format_for(filename: str) -> str:
+    return 'ndjson' if filename.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+class _Report:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.problems: List[Dict[str, Any]] = []
+        self.problem_count = 0
+
+    def problem(self, line: int, reason: str, record: Dict[str, Any]) -> None:
+        self.problem_count += 1
+        if len(self.problems) < MAX_REPORTED_PROBLEMS:
+            self.problems.append({'line': line, 'reason': reason,
+                                  'email': record.get('email'), 'phone': record.get('phone')})
+
+
+def _write_batch(batch: List[Tuple[int, Dict[str, Any]]], report: _Report) -> None:
+    """Match the batch against existing customers, upsert the safe rows, commit."""
+    existing = db.session.execute(MATCH_SQL, {
+        'emails': [row['email'] for _, row in batch],
+        'phones': [row['phone'] for _, row in batch]
+    }).fetchall()
+    by_email = {email: customer_id for customer_id, email, _ in existing}
+    by_phone = {phone: customer_id for customer_id, _, phone in existing}
+
+    rows = []  # (line, row, existing customer?)
+    for line, row in batch:
+        matches = {by_email.get(row['email']), by_phone.get(row['phone'])} - {None}
+        if len(matches) > 1:
+            report.problem(line, 'email and phone belong to different customers', row)
+            continue
+        rows.append((line, row, bool(matches)))
+    if not rows:
+        return
+
+    try:
+        db.session.execute(UPSERT_SQL, [row for _, row, _ in rows])
+        db.session.commit()
+    except IntegrityError:
+        # a concurrent order created a clashing customer: retry row by row, reporting the clashes
+        db.session.rollback()
+        written = []
+        for line, row, existing in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(UPSERT_SQL, row)
+                written.append((line, row, existing))
+            except IntegrityError as e:
+                report.problem(line, f'conflict: {e.orig}', row)
+        db.session.commit()
+        rows = written
+    updated = sum(1 for _, _, existing in rows if existing)
+    report.updated += updated
+    report.inserted += len(rows) - updated
+
+
+def import_customers(records: Iterable[Tuple[int, Dict[str, Any]]],
+                     batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Upsert (line, record) pairs in batches. Returns counts, throughput and
+    the first MAX_REPORTED_PROBLEMS skipped rows with their reasons.
+    """
+    started = time.perf_counter()
+    today = date.today()
+    report = _Report()
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    emails, phones = set(), set()  # across the whole file
+
+    for line, record in records:
+        report.rows += 1
+        row, error = clean_record(record, today)
+        if error:
+            report.problem(line, error, record)
+            continue
+        if row['email'] in emails or row['phone'] in phones:
+            # the first row wins; later ones would silently overwrite it
+            report.problem(line, 'duplicate email or phone in file', row)
+            continue
+        emails.add(row['email'])
+        phones.add(row['phone'])
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            _write_batch(batch, report)
+            batch = []
+    if batch:
+        _write_batch(batch, report)
+
+    seconds = time.perf_counter() - started
+    return {
+        'rows': report.rows,
+        'inserted': report.inserted,
+        'updated': report.updated,
+        'skipped': report.problem_count,
+        'problems': report.problems,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(report.rows / seconds) if seconds else None
+    }
+
+
+def import_file(path: str, fmt: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, Any]:
+    with open(path, newline='', encoding='utf-8') as f:
+        return import_customers(iter_records(f, fmt or format_for(path)), batch_size)
+
+
+if __name__ == "__main__":
+    import argparse
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Bulk import / upsert customers from CSV or NDJSON")
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=FORMATS, help='default: from the file extension')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--conflicts', help='write skipped rows (line, reason, email, phone) to this CSV')
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f"📥 Importing customers from {args.path}...")
+        try:
+            result = import_file(args.path, args.format, args.batch_size)
+        except CustomerImportError as e:
+            print(f"❌ {e}")
+            raise SystemExit(1)
+
+    print(f"✅ {result['rows']:,} rows in {result['seconds']}s ({result['rows_per_second']:,} rows/s): "
+          f"{result['inserted']:,} inserted, {result['updated']:,} updated, {result['skipped']:,} skipped")
+    if result['updated']:
+        print("   Changed customers are queued for dim_customer: run `python dimensions.py` to sync them now")
+    if args.conflicts and result['problems']:
+        with open(args.conflicts, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['line', 'reason', 'email', 'phone'])
+            writer.writeheader()
+            writer.writerows(result['problems'])
+        print(f"⚠️  {len(result['problems']):,} skipped rows written to {args.conflicts}")
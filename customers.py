@@ -0,0 +1,73 @@
+"""
+Customers Module
+Customer identity shared by the order path and the bulk import.
+
+- Emails are trimmed and lower-cased, phones reduced to digits (and a
+  leading +), the same way for orders (transactions._resolve_customer)
+  and imports (customer_import), so either finds the other's customers
+- find_customer() also matches the raw values and lower(email), so
+  customers stored before normalization are still found; the
+  ix_customers_email_lower expression index keeps that lookup on indexes
+"""
+
+from extensions import db
+from models import Customer
+from sqlalchemy import text, func
+from typing import Optional
+import re
+
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+PHONE_STRIP_RE = re.compile(r'[\s\-().\/]')
+
+# created by create_all for new databases (models.Customer) and at startup for existing ones
+CUSTOMER_INDEXES = {
+    'ix_customers_email_lower': 'customers (lower(email))'
+}
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    if email is None:
+        return None
+    email = email.strip().lower()
+    return email if EMAIL_RE.match(email) else None
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Digits only, keeping a leading + (00 prefixes become +); None if implausible."""
+    if phone is None:
+        return None
+    phone = PHONE_STRIP_RE.sub('', str(phone).strip())
+    if phone.startswith('00'):
+        phone = '+' + phone[2:]
+    digits = phone[1:] if phone.startswith('+') else phone
+    if not digits.isdigit() or not 6 <= len(phone) <= 15:
+        return None
+    return phone
+
+
+def find_customer(email: Optional[str], phone: Optional[str]) -> Optional[Customer]:
+    """
+    The customer owning this email or phone, given as entered. Matches the
+    normalized values, the raw ones and lower(email); the oldest match wins.
+    """
+    emails = {value.strip() for value in (normalize_email(email), email) if isinstance(value, str)}
+    phones = {str(value).strip() for value in (normalize_phone(phone), phone) if value is not None}
+    return Customer.query.filter(
+        Customer.email.in_(emails) |
+        func.lower(Customer.email).in_({value.lower() for value in emails}) |
+        Customer.phone.in_(phones)
+    ).order_by(Customer.id).first()
+
+
+def ensure_customer_indexes() -> None:
+    """Add the customer lookup indexes to a database created before them."""
+    if db.session.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customers'")).first():
+        for name, target in CUSTOMER_INDEXES.items():
+            db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+        db.session.commit()
+
+
+def init_customers(app) -> None:
+    with app.app_context():
+        ensure_customer_indexes()
+        db.session.remove()
@@ -5,94 +5,355 @@ Adds advanced constraints and validation rules to ensure data integrity.
 
 from extensions import db
 from sqlalchemy import text, event, CheckConstraint
-from models import Pizza, Ingredient, PizzaIngredient, Customer, Order
-from typing import Dict, Any, List
+from models import (
+    Pizza, Ingredient, PizzaIngredient, Customer, Order,
+    EtlWatermark, ConstraintViolation, ConstraintDirtyRow
+)
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterator
 
 
-def add_database_constraints():
+# Row-level constraint triggers, by trigger name
+CONSTRAINT_TRIGGERS = {
+    # Ensure ingredient costs are positive
+    'check_ingredient_cost': """
+    CREATE TRIGGER IF NOT EXISTS check_ingredient_cost
+    BEFORE INSERT ON ingredients
+    WHEN NEW.cost_per_unit <= 0
+    BEGIN
+        SELECT RAISE(ABORT, 'Ingredient cost must be greater than 0');
+    END;
+    """,
+
+    # Ensure ingredient costs are positive on update
+    'check_ingredient_cost_update': """
+    CREATE TRIGGER IF NOT EXISTS check_ingredient_cost_update
+    BEFORE UPDATE ON ingredients
+    WHEN NEW.cost_per_unit <= 0
+    BEGIN
+        SELECT RAISE(ABORT, 'Ingredient cost must be greater than 0');
+    END;
+    """,
+
+    # Ensure valid birth dates (not in future, not too old)
+    'check_customer_birthday': """
+    CREATE TRIGGER IF NOT EXISTS check_customer_birthday
+    BEFORE INSERT ON customers
+    WHEN NEW.birthday IS NOT NULL AND (
+        NEW.birthday > date('now') OR 
+        NEW.birthday < date('now', '-120 years')
+    )
+    BEGIN
+        SELECT RAISE(ABORT, 'Invalid birth date: must be between 120 years ago and today');
+    END;
+    """,
+
+    # Ensure valid birth dates on update
+    'check_customer_birthday_update': """
+    CREATE TRIGGER IF NOT EXISTS check_customer_birthday_update
+    BEFORE UPDATE ON customers  
+    WHEN NEW.birthday IS NOT NULL AND (
+        NEW.birthday > date('now') OR 
+        NEW.birthday < date('now', '-120 years')
+    )
+    BEGIN
+        SELECT RAISE(ABORT, 'Invalid birth date: must be between 120 years ago and today');
+    END;
+    """,
+
+    # Ensure order quantities are positive
+    'check_order_item_quantity': """
+    CREATE TRIGGER IF NOT EXISTS check_order_item_quantity
+    BEFORE INSERT ON order_items
+    WHEN NEW.quantity <= 0
+    BEGIN
+        SELECT RAISE(ABORT, 'Order item quantity must be greater than 0');
+    END;
+    """,
+
+    # Ensure pizza ingredient quantities are positive
+    'check_pizza_ingredient_quantity': """
+    CREATE TRIGGER IF NOT EXISTS check_pizza_ingredient_quantity
+    BEFORE INSERT ON pizza_ingredients
+    WHEN NEW.quantity <= 0
+    BEGIN
+        SELECT RAISE(ABORT, 'Pizza ingredient quantity must be greater than 0');
+    END;
+    """,
+
+    # Prevent duplicate discount codes
+    'check_duplicate_discount_codes': """
+    CREATE TRIGGER IF NOT EXISTS check_duplicate_discount_codes
+    BEFORE INSERT ON discount_codes
+    WHEN EXISTS (SELECT 1 FROM discount_codes WHERE code = NEW.code)
+    BEGIN
+        SELECT RAISE(ABORT, 'Discount code already exists');
+    END;
     """
-    Add advanced database constraints for data integrity.
+}
+
+# Set-based versions of the row checks, shared by the constraint scanner and
+# bulk_load. `insert_trigger` is the trigger a bulk load may suspend (and
+# names the check), `watch` the column whose updates can break the check;
+# the discount code trigger only repeats the primary key, so it needs no check.
+CONSTRAINT_CHECKS = [
+    {
+        'table': 'ingredients',
+        'watch': 'cost_per_unit',
+        'insert_trigger': 'check_ingredient_cost',
+        'columns': 'name, cost_per_unit',
+        'condition': "cost_per_unit <= 0",
+        'message': "Ingredient '{0}' has invalid cost: {1}"
+    },
+    {
+        'table': 'customers',
+        'watch': 'birthday',
+        'insert_trigger': 'check_customer_birthday',
+        'columns': 'name, birthday',
+        'condition': "birthday IS NOT NULL AND (birthday > date('now') OR birthday < date('now', '-120 years'))",
+        'message': "Customer '{0}' has invalid birthday: {1}"
+    },
+    {
+        'table': 'order_items',
+        'watch': 'quantity',
+        'insert_trigger': 'check_order_item_quantity',
+        'columns': 'id, quantity',
+        'condition': "quantity <= 0",
+        'message': "Order item {0} has invalid quantity: {1}"
+    },
+    {
+        'table': 'pizza_ingredients',
+        'watch': 'quantity',
+        'insert_trigger': 'check_pizza_ingredient_quantity',
+        'columns': 'pizza_id, ingredient_id, quantity',
+        'condition': "quantity <= 0",
+        'message': "Pizza {0} ingredient {1} has invalid quantity: {2}"
+    },
+    {
+        'table': 'discount_codes',
+        'watch': None,
+        'insert_trigger': 'check_duplicate_discount_codes',
+        'columns': None,
+        'condition': None,
+        'message': None
+    }
+]
+
+
+class BulkLoadError(Exception):
+    """Raised (after rolling back) when a bulk load leaves constraint violations."""
+
+    def __init__(self, violations: List[str]):
+        self.violations = violations
+        super().__init__(f"Bulk load rolled back: {len(violations)} constraint violations")
+
+
+def find_violations(tables: Optional[List[str]] = None,
+                    after_rowids: Optional[Dict[str, int]] = None) -> List[str]:
     """
-    constraints_sql = [
-        # Ensure ingredient costs are positive
-        """
-        CREATE TRIGGER IF NOT EXISTS check_ingredient_cost
-        BEFORE INSERT ON ingredients
-        WHEN NEW.cost_per_unit <= 0
-        BEGIN
-            SELECT RAISE(ABORT, 'Ingredient cost must be greater than 0');
-        END;
-        """,
-        
-        # Ensure ingredient costs are positive on update
-        """
-        CREATE TRIGGER IF NOT EXISTS check_ingredient_cost_update
-        BEFORE UPDATE ON ingredients
-        WHEN NEW.cost_per_unit <= 0
-        BEGIN
-            SELECT RAISE(ABORT, 'Ingredient cost must be greater than 0');
-        END;
-        """,
-        
-        # Ensure valid birth dates (not in future, not too old)
-        """
-        CREATE TRIGGER IF NOT EXISTS check_customer_birthday
-        BEFORE INSERT ON customers
-        WHEN NEW.birthday IS NOT NULL AND (
-            NEW.birthday > date('now') OR 
-            NEW.birthday < date('now', '-120 years')
-        )
-        BEGIN
-            SELECT RAISE(ABORT, 'Invalid birth date: must be between 120 years ago and today');
-        END;
-        """,
-        
-        # Ensure valid birth dates on update
-        """
-        CREATE TRIGGER IF NOT EXISTS check_customer_birthday_update
-        BEFORE UPDATE ON customers  
-        WHEN NEW.birthday IS NOT NULL AND (
-            NEW.birthday > date('now') OR 
-            NEW.birthday < date('now', '-120 years')
-        )
-        BEGIN
-            SELECT RAISE(ABORT, 'Invalid birth date: must be between 120 years ago and today');
-        END;
-        """,
-        
-        # Ensure order quantities are positive
-        """
-        CREATE TRIGGER IF NOT EXISTS check_order_item_quantity
-        BEFORE INSERT ON order_items
-        WHEN NEW.quantity <= 0
-        BEGIN
-            SELECT RAISE(ABORT, 'Order item quantity must be greater than 0');
-        END;
-        """,
-        
-        # Ensure pizza ingredient quantities are positive
-        """
-        CREATE TRIGGER IF NOT EXISTS check_pizza_ingredient_quantity
-        BEFORE INSERT ON pizza_ingredients
-        WHEN NEW.quantity <= 0
-        BEGIN
-            SELECT RAISE(ABORT, 'Pizza ingredient quantity must be greater than 0');
-        END;
+    Run the set-based constraint checks, optionally only for some tables
+    and only for rows past a rowid (the rows added by a load).
+    """
+    violations = []
+    for check in CONSTRAINT_CHECKS:
+        if check['condition'] is None or (tables is not None and check['table'] not in tables):
+            continue
+        extra, params = "", {}
+        if after_rowids is not None:
+            extra = " AND rowid > :after"
+            params['after'] = after_rowids.get(check['table'], 0)
+        for row in _violating_rows(check, extra, params):
+            violations.append(check['message'].format(*row[1:]))
+    return violations
+
+
+def _violating_rows(check: Dict[str, Any], extra: str = "", params: Optional[Dict[str, Any]] = None):
+    """(rowid, *message columns) of rows failing a check, narrowed by extra SQL."""
+    sql = f"SELECT rowid, {check['columns']} FROM {check['table']} WHERE ({check['condition']}){extra}"
+    return db.session.execute(text(sql), params or {}).fetchall()
+
+
+def _begin_immediate() -> None:
+    """Open a write transaction now; pysqlite would otherwise run DDL outside any transaction."""
+    if not db.session.connection().connection.driver_connection.in_transaction:
+        db.session.execute(text("BEGIN IMMEDIATE"))
+
+
+@contextmanager
+def bulk_load(tables: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Suspend the row-by-row INSERT triggers for a bulk load into `tables`
+    (default: every constrained table).
+
+        with bulk_load(['customers', 'order_items']) as load:
+            ...inserts through db.session...
+
+    Everything runs in one transaction: the triggers are dropped inside it,
+    the rows added past each table's starting rowid are validated with the
+    set-based checks when the block ends, and the load is rolled back
+    (triggers included) with BulkLoadError if any check fails. Otherwise
+    the triggers are re-created and the load committed. Other connections
+    never see the triggers missing. UPDATE triggers stay active, and rows
+    inserted with explicit ids below a table's starting rowid are not
+    re-checked.
+    """
+    checks = [c for c in CONSTRAINT_CHECKS if tables is None or c['table'] in tables]
+    load_tables = [c['table'] for c in checks]
+
+    _begin_immediate()
+
+    installed = {row[0] for row in db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'check_%'"
+    ))}
+    suspended = [c['insert_trigger'] for c in checks if c['insert_trigger'] in installed]
+    start_rowids = {
+        table: db.session.execute(text(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}")).scalar()
+        for table in load_tables
+    }
+    load = {'tables': load_tables, 'suspended_triggers': suspended, 'start_rowids': start_rowids}
+
+    try:
+        for name in suspended:
+            db.session.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        yield load
+
+        db.session.flush()
+        violations = find_violations(load_tables, start_rowids)
+        if violations:
+            raise BulkLoadError(violations)
+        for name in suspended:
+            db.session.execute(text(CONSTRAINT_TRIGGERS[name]))
+        db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        raise
+
+
+def _tracking_triggers(check: Dict[str, Any]) -> Dict[str, str]:
+    """AFTER UPDATE/DELETE triggers queueing touched rows for the next scan."""
+    table = check['table']
+
+    def mark(row: str) -> str:
+        # not INSERT OR IGNORE: an outer UPSERT's conflict policy would override it
+        return (f"INSERT INTO constraint_dirty_rows (table_name, row_id) SELECT '{table}', {row} "
+                f"WHERE NOT EXISTS (SELECT 1 FROM constraint_dirty_rows "
+                f"WHERE table_name = '{table}' AND row_id = {row});")
+
+    return {
+        f'track_{table}_update': f"""
+            CREATE TRIGGER IF NOT EXISTS track_{table}_update
+            AFTER UPDATE OF {check['watch']} ON {table}
+            BEGIN
+                {mark('OLD.rowid')}
+                {mark('NEW.rowid')}
+            END;
         """,
-        
-        # Prevent duplicate discount codes
+        f'track_{table}_delete': f"""
+            CREATE TRIGGER IF NOT EXISTS track_{table}_delete
+            AFTER DELETE ON {table}
+            BEGIN
+                {mark('OLD.rowid')}
+            END;
         """
-        CREATE TRIGGER IF NOT EXISTS check_duplicate_discount_codes
-        BEFORE INSERT ON discount_codes
-        WHEN EXISTS (SELECT 1 FROM discount_codes WHERE code = NEW.code)
-        BEGIN
-            SELECT RAISE(ABORT, 'Discount code already exists');
-        END;
-        """
-    ]
-    
+    }
+
+
+def _ensure_scanner_tables() -> None:
+    """Create the scanner tables on databases built before they existed."""
+    for table in (EtlWatermark.__table__, ConstraintViolation.__table__, ConstraintDirtyRow.__table__):
+        table.create(db.engine, checkfirst=True)
+
+
+def scan_constraints(full: bool = False) -> Dict[str, Any]:
+    """
+    Incrementally re-check constraints and update constraint_violations.
+
+    Only rows past each table's rowid watermark (new rows) and rows queued
+    by the tracking triggers (updated / deleted rows) are checked; `full`
+    clears the persisted list and rescans every row. Runs in one write
+    transaction and commits.
+    """
+    _ensure_scanner_tables()
+    _begin_immediate()
+    triggers_sql = dict(db.session.execute(text(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'track_%'"
+    )).fetchall())
+    installed = set(triggers_sql)
+    # older tracking triggers used INSERT OR IGNORE, which aborts UPSERTs on already queued rows
+    outdated = {name for name, sql in triggers_sql.items() if 'INSERT OR IGNORE' in sql}
+    for name in outdated:
+        db.session.execute(text(f"DROP TRIGGER {name}"))
+
+    now = datetime.utcnow()
+    summary = {'full': full, 'tables': {}}
+    for check in CONSTRAINT_CHECKS:
+        if check['condition'] is None:
+            continue
+        table, check_name = check['table'], check['insert_trigger']
+        params = {'table': table}
+
+        # Rows changed before tracking existed are unknown: fall back to a full pass
+        triggers = _tracking_triggers(check)
+        table_full = full or not set(triggers) <= installed
+        for name, sql in triggers.items():
+            if name not in installed or name in outdated:
+                db.session.execute(text(sql))
+
+        watermark = f'constraints.{table}'
+        mark = 0 if table_full else EtlWatermark.get(watermark)
+        max_rowid = db.session.execute(text(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}")).scalar()
+
+        if table_full:
+            db.session.execute(text("DELETE FROM constraint_violations WHERE table_name = :table"), params)
+            changed = 0
+            rows = _violating_rows(check, " AND rowid <= :max_rowid", {'max_rowid': max_rowid})
+        else:
+            changed = db.session.execute(text(
+                "SELECT COUNT(*) FROM constraint_dirty_rows WHERE table_name = :table"), params).scalar()
+            rows = _violating_rows(check, " AND rowid > :mark AND rowid <= :max_rowid",
+                                   {'mark': mark, 'max_rowid': max_rowid})
+            if changed:
+                db.session.execute(text("""
+                    DELETE FROM constraint_violations
+                    WHERE table_name = :table
+                      AND row_id IN (SELECT row_id FROM constraint_dirty_rows WHERE table_name = :table)
+                """), params)
+                rows += _violating_rows(check, """
+                    AND rowid IN (SELECT row_id FROM constraint_dirty_rows WHERE table_name = :table)
+                    AND rowid <= :mark""", {'table': table, 'mark': mark})
+        db.session.execute(text("DELETE FROM constraint_dirty_rows WHERE table_name = :table"), params)
+
+        if rows:
+            db.session.execute(text("""
+                INSERT OR REPLACE INTO constraint_violations (table_name, row_id, check_name, message, detected_at)
+                VALUES (:table_name, :row_id, :check_name, :message, :detected_at)
+            """), [{
+                'table_name': table,
+                'row_id': row[0],
+                'check_name': check_name,
+                'message': check['message'].format(*row[1:]),
+                'detected_at': now
+            } for row in rows])
+
+        EtlWatermark.set(watermark, max_rowid)
+        summary['tables'][table] = {
+            'full': table_full,
+            'new_rows': max_rowid - mark,
+            'changed_rows': changed,
+            'violations_found': len(rows)
+        }
+
+    db.session.commit()
+    return summary
+
+
+def add_database_constraints():
+    """
+    Add advanced database constraints for data integrity.
+    """
     results = []
-    for i, sql in enumerate(constraints_sql, 1):
+    for i, sql in enumerate(CONSTRAINT_TRIGGERS.values(), 1):
         try:
             db.session.execute(text(sql))
             db.session.commit()
@@ -240,8 +501,50 @@ def test_constraint_violations() -> List[Dict[str, Any]]:
     return test_results
 
 
-def get_constraint_status() -> Dict[str, Any]:
-    """Get current status of all database constraints."""
+def _scan_lag() -> Dict[str, Any]:
+    """Rows each table's scan has not covered yet: new rows past the watermark plus queued changes."""
+    tables = {row[0] for row in db.session.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+    if not {'etl_watermarks', 'constraint_dirty_rows'} <= tables:
+        return {'last_scan_at': None, 'pending_rows': None}
+    marks = {mark.name: (mark.value, mark.updated_at)
+             for mark in EtlWatermark.query.filter(EtlWatermark.name.like('constraints.%'))}
+    dirty = dict(db.session.execute(text(
+        "SELECT table_name, COUNT(*) FROM constraint_dirty_rows GROUP BY table_name")).fetchall())
+    pending = {}
+    for check in CONSTRAINT_CHECKS:
+        table = check['table']
+        if check['condition'] is None or table not in tables:
+            continue
+        mark = marks.get(f'constraints.{table}', (0, None))[0]
+        new_rows = db.session.execute(text(f"SELECT COUNT(*) FROM {table} WHERE rowid > :mark"),
+                                      {'mark': mark}).scalar()
+        pending[table] = new_rows + dirty.get(table, 0)
+    scanned = [updated_at for _, updated_at in marks.values() if updated_at]
+    return {'last_scan_at': max(scanned) if scanned else None, 'pending_rows': pending}
+
+
+def _health(violation_count: int, lag: Dict[str, Any]) -> str:
+    """
+    'violations_found' if the last scan left any, 'not_scanned' if no scan
+    has run, 'stale' if rows changed since the last scan, else 'healthy'.
+    """
+    if violation_count:
+        return 'violations_found'
+    if lag['last_scan_at'] is None:
+        return 'not_scanned'
+    if any(lag['pending_rows'].values()):
+        return 'stale'
+    return 'healthy'
+
+
+def get_constraint_status(full: bool = False, list_limit: int = 100) -> Dict[str, Any]:
+    """
+    Get current status of all database constraints.
+    Read-only: reports the violations persisted by the last scan and how
+    many rows the scan has not covered yet. The scan itself runs from
+    `python database_constraints.py --scan` (cron); `full` rescans every
+    row first and takes the write lock.
+    """
     try:
         # Check if triggers exist
         trigger_sql = text("""
@@ -254,33 +557,27 @@ def get_constraint_status() -> Dict[str, Any]:
         triggers = db.session.execute(trigger_sql).fetchall()
         trigger_names = [row[0] for row in triggers]
         
-        # Check constraint violations in current data
-        violations = []
-        
-        # Check for negative ingredient costs
-        neg_cost_sql = text("SELECT name, cost_per_unit FROM ingredients WHERE cost_per_unit <= 0")
-        neg_costs = db.session.execute(neg_cost_sql).fetchall()
-        for row in neg_costs:
-            violations.append(f"Ingredient '{row[0]}' has invalid cost: {row[1]}")
-        
-        # Check for future birthdays
-        future_bday_sql = text("SELECT name, birthday FROM customers WHERE birthday > date('now')")
-        future_bdays = db.session.execute(future_bday_sql).fetchall()
-        for row in future_bdays:
-            violations.append(f"Customer '{row[0]}' has future birthday: {row[1]}")
-        
-        # Check for zero quantities
-        zero_qty_sql = text("SELECT id, quantity FROM order_items WHERE quantity <= 0")
-        zero_qtys = db.session.execute(zero_qty_sql).fetchall()
-        for row in zero_qtys:
-            violations.append(f"Order item {row[0]} has invalid quantity: {row[1]}")
+        scan = scan_constraints(full=True) if full else None
+        lag = _scan_lag()
+        if lag['pending_rows'] is None:
+            violation_count, violations = 0, []
+            health = 'not_scanned'
+        else:
+            violation_count = ConstraintViolation.query.count()
+            violations = [v.message for v in ConstraintViolation.query.order_by(
+                ConstraintViolation.table_name, ConstraintViolation.row_id
+            ).limit(list_limit)]
+            health = _health(violation_count, lag)
         
         return {
             'triggers_installed': len(trigger_names),
             'trigger_names': trigger_names,
-            'current_violations': len(violations),
+            'current_violations': violation_count,
             'violations': violations,
-            'status': 'healthy' if len(violations) == 0 else 'violations_found'
+            'last_scan_at': lag['last_scan_at'].isoformat() if lag['last_scan_at'] else None,
+            'pending_rows': lag['pending_rows'],
+            'last_scan': scan,
+            'status': health
         }
         
     except Exception as e:
@@ -288,8 +585,22 @@ def get_constraint_status() -> Dict[str, Any]:
 
 
 if __name__ == "__main__":
+    import argparse
     from app import app
-    
+
+    parser = argparse.ArgumentParser(description="Install and test constraints, or run the violation scan")
+    parser.add_argument('--scan', action='store_true', help='only run the incremental violation scan (for cron)')
+    parser.add_argument('--full', action='store_true', help='with --scan: rescan every row')
+    args = parser.parse_args()
+
+    if args.scan:
+        with app.app_context():
+            scan = scan_constraints(full=args.full)
+            found = sum(t['violations_found'] for t in scan['tables'].values())
+            print(f"✅ Scanned {len(scan['tables'])} tables: {found} new violations, "
+                  f"{ConstraintViolation.query.count()} current")
+        raise SystemExit(0)
+
     with app.app_context():
         print("🛡️  Database Constraints Setup and Testing\n")
         
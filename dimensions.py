@@ -0,0 +1,260 @@
+"""
+Analytics Dimensions Module
+Maintains the dim_customer table used by the demographic reports.
+
+- Triggers on customers and orders (installed by report_schema.py) queue
+  every customer whose row goes stale (new or edited customer, order
+  added, moved or deleted) in dim_customer_dirty, whatever path wrote
+  the change
+- Order and customer commits through the ORM re-sync their own customers
+  in the same transaction (report_schema's session hook calls
+  sync_dim_customers), so the dashboard never waits for a refresh and
+  GET requests never write
+- Writes that bypass the ORM (bulk imports, raw SQL) stay queued until the
+  scheduled refresh; reports group on the current dim_customer rows and
+  add queued customers with the same rules applied to their customers
+  row (queued_demographics), so nobody drops out or changes group meanwhile
+- Age bands and segments drift with the calendar, so they are recomputed
+  for every row once per day. Run from cron, e.g. every 15 minutes:
+
+    python dimensions.py          # drain the queue (+ daily pass)
+    python dimensions.py --full   # rebuild every row
+"""
+
+from extensions import db
+from models import EtlWatermark
+from report_schema import create_dimension_tables
+from sqlalchemy import text, bindparam
+from datetime import datetime, date
+from typing import Dict, Any, Optional, Iterable
+import re
+
+DAILY_WATERMARK = 'dim_customer.daily_refresh'
+
+LAPSED_AFTER_DAYS = 90
+BATCH_SIZE = 1000
+
+_POSTCODE_RE = re.compile(r"(\d{5})")
+_tables_ready = False
+
+
+def age_band(birthday: Any, today: Optional[date] = None) -> str:
+    """Age band label used by the earnings reports."""
+    if not birthday:
+        return 'Unknown'
+    if isinstance(birthday, str):
+        birthday = date.fromisoformat(birthday[:10])
+    today = today or datetime.utcnow().date()
+    age = today.year - birthday.year - ((today.month, today.day) < (birthday.month, birthday.day))
+    if age < 25:
+        return '18-25'
+    if age < 35:
+        return '26-35'
+    if age < 45:
+        return '36-45'
+    if age < 55:
+        return '46-55'
+    return '55+'
+
+
+def postcode_of(address: Optional[str]) -> str:
+    """Five digit postcode from an address, same rule as delivery assignment."""
+    m = _POSTCODE_RE.search(address or '')
+    return m.group(1) if m else 'Unknown'
+
+
+def segment_of(order_count: int, last_order_date: Any, today: Optional[date] = None) -> str:
+    """Customer segment from order history."""
+    if not order_count:
+        return 'prospect'
+    today = today or datetime.utcnow().date()
+    if isinstance(last_order_date, str):
+        last_order_date = datetime.fromisoformat(last_order_date)
+    if last_order_date and (today - last_order_date.date()).days > LAPSED_AFTER_DAYS:
+        return 'lapsed'
+    if order_count >= 10:
+        return 'loyal'
+    if order_count >= 2:
+        return 'regular'
+    return 'new'
+
+
+def demographics(customer_id: int, birthday: Any, address: Optional[str], today: date) -> Dict[str, str]:
+    """gender, age_band, postcode and postcode_prefix of a customer: the dim_customer rules."""
+    postcode = postcode_of(address)
+    return {
+        # Mock gender, see get_earnings_by_gender
+        'gender': 'Female' if customer_id % 2 == 0 else 'Male',
+        'age_band': age_band(birthday, today),
+        'postcode': postcode,
+        'postcode_prefix': postcode[:3] if postcode != 'Unknown' else 'Unknown'
+    }
+
+
+def _dim_row(customer_id, birthday, address, order_count, first_order, last_order,
+             today: date, now: datetime) -> Dict[str, Any]:
+    return {
+        'customer_id': customer_id,
+        **demographics(customer_id, birthday, address, today),
+        'segment': segment_of(order_count, last_order, today),
+        'order_count': order_count or 0,
+        'first_order_date': first_order,
+        'last_order_date': last_order,
+        'refreshed_at': now
+    }
+
+
+UPSERT_SQL = text("""
+    INSERT INTO dim_customer (
+        customer_id, gender, age_band, postcode, postcode_prefix, segment,
+        order_count, first_order_date, last_order_date, refreshed_at
+    ) VALUES (
+        :customer_id, :gender, :age_band, :postcode, :postcode_prefix, :segment,
+        :order_count, :first_order_date, :last_order_date, :refreshed_at
+    )
+    ON CONFLICT(customer_id) DO UPDATE SET
+        gender = excluded.gender,
+        age_band = excluded.age_band,
+        postcode = excluded.postcode,
+        postcode_prefix = excluded.postcode_prefix,
+        segment = excluded.segment,
+        order_count = excluded.order_count,
+        first_order_date = excluded.first_order_date,
+        last_order_date = excluded.last_order_date,
+        refreshed_at = excluded.refreshed_at
+""")
+
+
+CUSTOMER_STATS_SQL = text("""
+    SELECT
+        c.id,
+        c.birthday,
+        c.address,
+        COUNT(o.id) as order_count,
+        MIN(o.order_date) as first_order_date,
+        MAX(o.order_date) as last_order_date
+    FROM customers c
+    LEFT JOIN orders o ON o.customer_id = c.id
+    WHERE c.id IN :ids
+    GROUP BY c.id
+""").bindparams(bindparam('ids', expanding=True))
+DELETE_DIM_SQL = text("DELETE FROM dim_customer WHERE customer_id IN :ids") \
+    .bindparams(bindparam('ids', expanding=True))
+DEQUEUE_SQL = text("DELETE FROM dim_customer_dirty WHERE customer_id IN :ids") \
+    .bindparams(bindparam('ids', expanding=True))
+
+
+def sync_dim_customers(customer_ids: Iterable[int], connection=None) -> int:
+    """
+    Recompute the dim rows of these customers (deleting rows of customers
+    that no longer exist) and take them off the dirty queue. Does not
+    commit. Returns the number of rows upserted.
+    """
+    execute = (connection or db.session).execute
+    ids = sorted(set(customer_ids))
+    today = datetime.utcnow().date()
+    now = datetime.utcnow()
+    upserted = 0
+    for i in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[i:i + BATCH_SIZE]
+        rows = [_dim_row(*row, today=today, now=now) for row in execute(CUSTOMER_STATS_SQL, {'ids': chunk})]
+        if rows:
+            execute(UPSERT_SQL, rows)
+        gone = set(chunk) - {row['customer_id'] for row in rows}
+        if gone:
+            execute(DELETE_DIM_SQL, {'ids': sorted(gone)})
+        execute(DEQUEUE_SQL, {'ids': chunk})
+        upserted += len(rows)
+    return upserted
+
+
+def refresh_dim_customer(full: bool = False) -> Dict[str, Any]:
+    """
+    Re-sync every queued customer (every customer with full=True), run the
+    daily age band/segment pass when due, and commit.
+    Returns counts of upserted rows and whether the daily pass ran.
+    """
+    _ensure_tables()
+    today = datetime.utcnow().date()
+
+    if full:
+        ids = [row[0] for row in db.session.execute(text(
+            "SELECT id FROM customers UNION SELECT customer_id FROM dim_customer"))]
+    else:
+        ids = [row[0] for row in db.session.execute(text("SELECT customer_id FROM dim_customer_dirty"))]
+    upserted = sync_dim_customers(ids)
+
+    daily = full or EtlWatermark.get(DAILY_WATERMARK) < today.toordinal()
+    if daily:
+        _refresh_calendar_columns(today)
+        EtlWatermark.set(DAILY_WATERMARK, today.toordinal())
+    db.session.commit()
+
+    return {'upserted': upserted, 'daily_refresh': daily}
+
+
+def dim_join_sql(customer_id: str) -> str:
+    """
+    JOIN to the dim_customer rows that are current (alias d): reports group
+    on plain d columns. Customers still queued are left out here; add them
+    with queued_demographics().
+    """
+    return (f"JOIN dim_customer d ON d.customer_id = {customer_id}\n"
+            f"            AND NOT EXISTS (SELECT 1 FROM dim_customer_dirty q WHERE q.customer_id = {customer_id})")
+
+
+QUEUED_CUSTOMERS_SQL = text("""
+    SELECT q.customer_id, c.birthday, c.address
+    FROM dim_customer_dirty q
+    LEFT JOIN customers c ON c.id = q.customer_id
+""")
+
+
+def queued_demographics() -> Dict[int, Dict[str, str]]:
+    """
+    demographics() of every customer still queued, read from the customers
+    row, so reports count them under the same groups a sync would give them.
+    """
+    today = datetime.utcnow().date()
+    return {customer_id: demographics(customer_id, birthday, address, today)
+            for customer_id, birthday, address in db.session.execute(QUEUED_CUSTOMERS_SQL)}
+
+
+def _ensure_tables() -> None:
+    global _tables_ready
+    if not _tables_ready:
+        create_dimension_tables()
+        _tables_ready = True
+
+
+def _refresh_calendar_columns(today: date) -> None:
+    """Recompute age bands and segments, which change with the date alone."""
+    sql = text("""
+        SELECT d.customer_id, c.birthday, d.order_count, d.last_order_date, d.age_band, d.segment
+        FROM dim_customer d
+        JOIN customers c ON c.id = d.customer_id
+    """)
+    changes = []
+    for customer_id, birthday, order_count, last_order, old_band, old_segment in db.session.execute(sql):
+        band = age_band(birthday, today)
+        segment = segment_of(order_count, last_order, today)
+        if band != old_band or segment != old_segment:
+            changes.append({'customer_id': customer_id, 'age_band': band, 'segment': segment})
+
+    update = text("UPDATE dim_customer SET age_band = :age_band, segment = :segment WHERE customer_id = :customer_id")
+    for i in range(0, len(changes), BATCH_SIZE):
+        db.session.execute(update, changes[i:i + BATCH_SIZE])
+
+
+if __name__ == "__main__":
+    import argparse
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Refresh the dim_customer analytics table")
+    parser.add_argument('--full', action='store_true', help='rebuild every row instead of refreshing incrementally')
+    args = parser.parse_args()
+
+    with app.app_context():
+        result = refresh_dim_customer(full=args.full)
+        print(f"✅ dim_customer refreshed: {result['upserted']} rows upserted"
+              f"{', daily age band/segment pass done' if result['daily_refresh'] else ''}")
@@ -0,0 +1,451 @@
+"""
+Order Events Module
+In-process publish/subscribe broker for live staff updates.
+
+Events are produced from committed order changes (SQLAlchemy session
+hooks), never from polling queries:
+- order_created: a new order was committed
+- order_status: an order changed status
+- courier_assigned: a delivery person was assigned to an order
+- kpis: incremental KPI deltas for the dashboard summary
+- catalog_changed: a commit touched the menu (catalog.py)
+
+With several worker processes (serve.py --workers), an EventRelay copies
+every published event into the event_log table and polls it for the
+events of the other workers, so each worker's dashboards, top sellers
+and caches see every commit, a poll interval later.
+"""
+
+from extensions import db
+from models import Order, OrderItem, DeliveryPerson, EventLog
+from sqlalchemy import event, inspect, text
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Callable, Optional
+import itertools
+import json
+import logging
+import queue
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# session.info keys holding order snapshots collected between flush and commit
+_PENDING_KEY = 'pending_order_events'
+
+# the dashboard's unique-customers KPI counts customers with an order in this window
+KPI_WINDOW = timedelta(days=30)
+RETURNING_CUSTOMER_SQL = text("""
+    SELECT 1 FROM orders
+    WHERE customer_id = :customer_id AND id != :order_id
+      AND total IS NOT NULL AND order_date >= :since
+    LIMIT 1
+""")
+
+
+class EventBroker:
+    """
+    Thread-safe fan-out of events to SSE subscribers and in-process listeners.
+
+    Subscribers get a bounded queue each; a subscriber that falls too far
+    behind is dropped instead of slowing down the committing request.
+    """
+
+    def __init__(self, max_queue_size: int = 256):
+        self.max_queue_size = max_queue_size
+        self._subscribers: List[queue.Queue] = []
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._closed = threading.Event()
+        # set by a running EventRelay: also hands every published event to the other workers
+        self.forward: Optional[Callable[[str, Dict[str, Any]], None]] = None
+
+    def subscribe(self) -> queue.Queue:
+        """Register a new subscriber and return its event queue."""
+        q = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def add_listener(self, callback: Callable[[str, Dict[str, Any]], None]) -> None:
+        """Register a synchronous callback(event_type, data) run on every publish (once)."""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, Dict[str, Any]], None]) -> None:
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    def close(self) -> None:
+        """End every open stream (worker shutdown); later streams end at once."""
+        self._closed.set()
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for q in subscribers:
+            try:
+                q.put_nowait(None)
+            except queue.Full:
+                pass  # the stream sees the flag at its next keepalive
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> int:
+        """Publish an event to all subscribers (and other workers, when relayed). Returns the event id."""
+        event_id = self.deliver(event_type, data)
+        forward = self.forward
+        if forward is not None:
+            forward(event_type, data)
+        return event_id
+
+    def deliver(self, event_type: str, data: Dict[str, Any]) -> int:
+        """Fan an event out to this process's listeners and subscribers only. Returns the event id."""
+        event_id = next(self._ids)
+        message = (event_id, event_type, data)
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+            listeners = list(self._listeners)
+
+        for callback in listeners:
+            try:
+                callback(event_type, data)
+            except Exception as e:
+                logger.error(f"Event listener failed for {event_type}: {e}")
+
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # Slow consumer - drop it, the browser will reconnect and resync
+                self.unsubscribe(q)
+
+        return event_id
+
+
+broker = EventBroker()
+
+# event fields that are datetimes in-process (top_sellers buckets order_date) and ISO strings in event_log
+DATETIME_FIELDS = ('order_date',)
+
+INSERT_EVENT_SQL = text("""
+    INSERT INTO event_log (origin, event_type, payload, created_at)
+    VALUES (:origin, :event_type, :payload, :created_at)
+""")
+NEW_EVENTS_SQL = text("""
+    SELECT id, origin, event_type, payload FROM event_log
+    WHERE id > :last_id ORDER BY id LIMIT :limit
+""")
+PRUNE_EVENTS_SQL = text("DELETE FROM event_log WHERE created_at < :before")
+
+
+class EventRelay:
+    """
+    Shares a broker's events with the brokers of other processes through
+    the event_log table.
+
+    - Published events are queued and written in batches by a writer
+      thread, off the committing request
+    - A poller thread reads the rows added since its last poll and
+      delivers the other processes' events to the local broker, without
+      publishing them again
+    - Rows older than `retention` are pruned; a process that starts
+      later only reads events published after it started
+    """
+
+    def __init__(self, target: EventBroker, engine, poll_interval: float = 0.25,
+                 retention: timedelta = timedelta(minutes=5), batch_size: int = 500,
+                 max_backlog: int = 10000):
+        self.broker = target
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.batch_size = batch_size
+        self.origin = uuid.uuid4().hex
+        self.last_id = 0
+        self.relayed = 0
+        self.received = 0
+        self._outbox: queue.Queue = queue.Queue(maxsize=max_backlog)
+        self._unsent: List[Dict[str, Any]] = []
+        self._pruned_at = datetime.min
+        self._write_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def send(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Queue an event for the other processes (the broker's forward hook)."""
+        row = {
+            'origin': self.origin,
+            'event_type': event_type,
+            'payload': json.dumps(data, default=_json_default),
+            'created_at': datetime.utcnow()
+        }
+        try:
+            self._outbox.put_nowait(row)
+        except queue.Full:
+            logger.warning(f"Event relay backlog full, {event_type} not shared with other workers")
+
+    def flush(self) -> int:
+        """Write the queued events to event_log. Returns how many were written."""
+        with self._write_lock:
+            while len(self._unsent) < self.batch_size:
+                try:
+                    self._unsent.append(self._outbox.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._unsent:
+                return 0
+            with self.engine.begin() as conn:
+                conn.execute(INSERT_EVENT_SQL, self._unsent)
+                now = datetime.utcnow()
+                if now - self._pruned_at > self.retention / 5:
+                    conn.execute(PRUNE_EVENTS_SQL, {'before': now - self.retention})
+                    self._pruned_at = now
+            written, self._unsent = len(self._unsent), []
+            self.relayed += written
+            return written
+
+    def poll(self) -> int:
+        """Deliver the events other processes wrote since the last poll. Returns how many."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(NEW_EVENTS_SQL, {'last_id': self.last_id, 'limit': self.batch_size}).all()
+        delivered = 0
+        for row in rows:
+            self.last_id = row.id
+            if row.origin == self.origin:
+                continue
+            self.broker.deliver(row.event_type, _decode(json.loads(row.payload)))
+            delivered += 1
+        self.received += delivered
+        return delivered
+
+    def start(self) -> None:
+        """Start relaying from the current end of event_log (call in the serving process, after fork)."""
+        with self.engine.connect() as conn:
+            self.last_id = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM event_log")).scalar()
+        self._threads = [
+            threading.Thread(target=self._run, args=(self.flush,), name='event-relay-writer', daemon=True),
+            threading.Thread(target=self._run, args=(self.poll,), name='event-relay-poller', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        self.broker.forward = self.send
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop relaying; events already published are still written for the other workers."""
+        if self.broker.forward == self.send:
+            self.broker.forward = None
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        try:
+            while self.flush():
+                pass
+        except Exception as e:
+            logger.warning(f"Event relay stopped with {len(self._unsent) + self._outbox.qsize()} events unsent: {e}")
+
+    def _run(self, step: Callable[[], int]) -> None:
+        while not self._stopping.wait(self.poll_interval):
+            try:
+                # keep going while a step finds a full batch
+                while step() >= self.batch_size and not self._stopping.is_set():
+                    pass
+            except Exception as e:
+                # e.g. the database stayed locked past the busy timeout: retry next interval
+                logger.warning(f"Event relay {step.__name__} failed: {e}")
+
+
+relay: Optional[EventRelay] = None
+
+
+def _decode(data: Dict[str, Any]) -> Dict[str, Any]:
+    for key in DATETIME_FIELDS:
+        if isinstance(data.get(key), str):
+            data[key] = datetime.fromisoformat(data[key])
+    return data
+
+
+def init_event_relay(app) -> None:
+    """Create the event_log table on databases that predate it (once, before workers start)."""
+    with app.app_context():
+        EventLog.__table__.create(db.engine, checkfirst=True)
+
+
+def start_event_relay(app, poll_interval: float = 0.25) -> EventRelay:
+    """Share this worker's events with the other workers and receive theirs."""
+    global relay
+    with app.app_context():
+        engine = db.engine
+    relay = EventRelay(broker, engine, poll_interval)
+    relay.start()
+    return relay
+
+
+def stop_event_relay() -> None:
+    global relay
+    if relay is not None:
+        relay.stop()
+        relay = None
+
+
+def format_sse(event_id: int, event_type: str, data: Dict[str, Any]) -> str:
+    """Format a single Server-Sent Events message."""
+    payload = json.dumps(data, default=_json_default)
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+def stream_events(q: queue.Queue, keepalive_seconds: float = 15.0):
+    """
+    Generator yielding SSE messages from a subscriber queue.
+    Sends a comment line as keepalive so proxies don't close the stream,
+    and returns once the broker is closed so shutdown is not held up.
+    """
+    try:
+        yield "retry: 3000\n\n"
+        while not broker.closed:
+            try:
+                message = q.get(timeout=keepalive_seconds)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if message is None:
+                break
+            yield format_sse(*message)
+    finally:
+        broker.unsubscribe(q)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _loaded(obj, attr: str):
+    """Return an already-loaded attribute without triggering a lazy load."""
+    return obj.__dict__.get(attr)
+
+
+def _snapshot(session, order_id: int) -> Dict[str, Any]:
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    return pending.setdefault(order_id, {
+        'created': False,
+        'previous_status': None,
+        'status_changed': False,
+        'courier_changed': False,
+        'pizzas': 0,
+        'first_in_window': False,
+        'fields': {}
+    })
+
+
+def _after_flush(session, flush_context):
+    """Collect order changes while attribute values are still in memory."""
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Order) and obj.id is not None:
+            snap = _snapshot(session, obj.id)
+            state = inspect(obj)
+
+            if obj in session.new:
+                snap['created'] = True
+                # counted once if the customer had no other order in the KPI window
+                snap['first_in_window'] = session.connection().execute(RETURNING_CUSTOMER_SQL, {
+                    'customer_id': obj.customer_id,
+                    'order_id': obj.id,
+                    'since': datetime.utcnow() - KPI_WINDOW
+                }).first() is None
+            else:
+                status_history = state.attrs.status.history
+                if status_history.has_changes():
+                    if snap['previous_status'] is None and status_history.deleted:
+                        snap['previous_status'] = status_history.deleted[0]
+                    snap['status_changed'] = True
+                if state.attrs.delivery_person_id.history.has_changes():
+                    snap['courier_changed'] = True
+
+            fields = snap['fields']
+            fields['order_id'] = obj.id
+            fields['order_date'] = obj.order_date
+            fields['status'] = obj.status
+            fields['total'] = obj.total
+            fields['customer_id'] = obj.customer_id
+            customer = _loaded(obj, 'customer')
+            if customer is not None:
+                fields['customer_name'] = customer.name
+                fields['customer_phone'] = customer.phone
+                fields['customer_address'] = customer.address
+            if obj.delivery_person_id is not None:
+                # identity map lookup only - the courier is loaded by assignment
+                dp = session.identity_map.get(
+                    session.identity_key(DeliveryPerson, obj.delivery_person_id)
+                )
+                fields['delivery_person'] = dp.name if dp is not None else fields.get('delivery_person')
+            fields['delivery_person_id'] = obj.delivery_person_id
+
+        elif isinstance(obj, OrderItem) and obj in session.new and obj.order_id is not None:
+            if obj.item_type == 'pizza':
+                _snapshot(session, obj.order_id)['pizzas'] += obj.quantity or 0
+            items = _snapshot(session, obj.order_id)['fields'].setdefault('items', [])
+            items.append({
+                'item_type': obj.item_type,
+                'item_id': obj.item_id,
+                'quantity': obj.quantity
+            })
+
+
+def _after_commit(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    for order_id, snap in pending.items():
+        fields = snap['fields']
+        if snap['created']:
+            broker.publish('order_created', fields)
+            broker.publish('kpis', {
+                'orders': 1,
+                'revenue': fields.get('total') or 0,
+                'pizzas': snap['pizzas'],
+                'customers': 1 if snap['first_in_window'] else 0
+            })
+            continue
+
+        if snap['status_changed']:
+            broker.publish('order_status', {
+                'order_id': order_id,
+                'status': fields.get('status'),
+                'previous_status': snap['previous_status']
+            })
+        if snap['courier_changed'] and fields.get('delivery_person_id') is not None:
+            broker.publish('courier_assigned', {
+                'order_id': order_id,
+                'delivery_person_id': fields.get('delivery_person_id'),
+                'delivery_person': fields.get('delivery_person')
+            })
+
+
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_order_events(session_factory=None) -> None:
+    """Attach the commit hooks that turn order changes into events."""
+    target = session_factory if session_factory is not None else db.session
+    if event.contains(target, 'after_flush', _after_flush):
+        return
+    event.listen(target, 'after_flush', _after_flush)
+    event.listen(target, 'after_commit', _after_commit)
+    event.listen(target, 'after_rollback', _after_rollback)
@@ -0,0 +1,261 @@
+"""
+Data Export Module
+Streaming CSV / NDJSON export of orders, order items and staff reports.
+
+Rows are pulled from the database in chunks (fetchmany) and serialized
+one chunk at a time, so memory stays flat regardless of export size.
+
+Usage:
+    python exports.py orders --format csv --from 2025-01-01 --to 2025-01-31 -o orders.csv
+    python exports.py order-items --format ndjson
+    python exports.py monthly-summary
+"""
+
+from extensions import db
+from sqlalchemy import text
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, List, Optional, Iterator, Iterable, Callable, Tuple
+import csv
+import io
+import json
+import staff_reports
+from order_lifecycle import status_name_sql
+
+DEFAULT_CHUNK_SIZE = 1000
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+ORDER_COLUMNS = [
+    'order_id', 'order_date', 'status', 'total', 'customer_id',
+    'customer_name', 'customer_email', 'delivery_person_id'
+]
+
+ORDER_ITEM_COLUMNS = [
+    'order_item_id', 'order_id', 'order_date', 'item_type', 'item_id',
+    'item_name', 'quantity'
+]
+
+
+class ExportError(Exception):
+    """Raised for invalid export requests (unknown dataset, bad dates)."""
+    pass
+
+
+def parse_date_range(date_from: Optional[str], date_to: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Parse inclusive YYYY-MM-DD bounds into a half-open [start, end) datetime range.
+    """
+    try:
+        start = datetime.fromisoformat(date_from) if date_from else None
+        end = datetime.fromisoformat(date_to) if date_to else None
+    except ValueError:
+        raise ExportError("Invalid date format. Use YYYY-MM-DD")
+
+    if end is not None and len(date_to) == 10:
+        # a bare date includes the whole day
+        end = end + timedelta(days=1)
+    if start and end and start >= end:
+        raise ExportError("'from' must be before 'to'")
+    return start, end
+
+
+def _stream_rows(sql, params: Dict[str, Any], columns: List[str],
+                 chunk_size: int) -> Iterator[Dict[str, Any]]:
+    result = db.session.execute(sql, params)
+    try:
+        while True:
+            chunk = result.fetchmany(chunk_size)
+            if not chunk:
+                break
+            for row in chunk:
+                yield dict(zip(columns, row))
+    finally:
+        result.close()
+
+
+def _date_filter(start: Optional[datetime], end: Optional[datetime]) -> Tuple[str, Dict[str, Any]]:
+    clauses, params = [], {}
+    if start is not None:
+        clauses.append("o.order_date >= :start")
+        params['start'] = start
+    if end is not None:
+        clauses.append("o.order_date < :end")
+        params['end'] = end
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def iter_orders(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Stream orders (with customer name/email) in order id order."""
+    where, params = _date_filter(start, end)
+    sql = text(f"""
+        SELECT
+            o.id as order_id,
+            o.order_date,
+            {status_name_sql('o.status')} as status,
+            o.total,
+            o.customer_id,
+            c.name as customer_name,
+            c.email as customer_email,
+            o.delivery_person_id
+        FROM orders o
+        JOIN customers c ON c.id = o.customer_id
+        {where}
+        ORDER BY o.id
+    """)
+    return _stream_rows(sql, params, ORDER_COLUMNS, chunk_size)
+
+
+def iter_order_items(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Stream order lines with their order date and item name."""
+    where, params = _date_filter(start, end)
+    sql = text(f"""
+        SELECT
+            oi.id as order_item_id,
+            oi.order_id,
+            o.order_date,
+            oi.item_type,
+            oi.item_id,
+            CASE oi.item_type
+                WHEN 'pizza' THEN p.name
+                WHEN 'drink' THEN d.name
+                WHEN 'dessert' THEN ds.name
+            END as item_name,
+            oi.quantity
+        FROM order_items oi
+        JOIN orders o ON o.id = oi.order_id
+        LEFT JOIN pizzas p ON oi.item_type = 'pizza' AND p.id = oi.item_id
+        LEFT JOIN drinks d ON oi.item_type = 'drink' AND d.id = oi.item_id
+        LEFT JOIN desserts ds ON oi.item_type = 'dessert' AND ds.id = oi.item_id
+        {where}
+        ORDER BY oi.order_id, oi.id
+    """)
+    return _stream_rows(sql, params, ORDER_ITEM_COLUMNS, chunk_size)
+
+
+def _report(fn: Callable[..., Any], ranged: bool = True) -> Callable[..., Iterator[Dict[str, Any]]]:
+    """Adapt a staff_reports function (list or single dict) to a row iterator."""
+    def rows(start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        result = fn(start=start, end=end) if ranged else fn()
+        return iter(result if isinstance(result, list) else [result])
+    return rows
+
+
+# Exportable datasets: name -> row iterator factory
+DATASETS: Dict[str, Callable[..., Iterator[Dict[str, Any]]]] = {
+    'orders': iter_orders,
+    'order-items': iter_order_items,
+    'undelivered-orders': _report(staff_reports.get_undelivered_orders, ranged=False),
+    'top-pizzas': _report(staff_reports.get_top_pizzas_past_month),
+    'monthly-summary': _report(staff_reports.get_monthly_summary),
+    'earnings-timeseries': _report(staff_reports.get_earnings_timeseries),
+    'earnings-by-gender': _report(staff_reports.get_earnings_by_gender),
+    'earnings-by-age-group': _report(staff_reports.get_earnings_by_age_group),
+    'earnings-by-postal-code': _report(staff_reports.get_earnings_by_postal_code),
+}
+
+# Datasets that honour the from/to filter
+DATE_FILTERED = {
+    'orders', 'order-items', 'top-pizzas', 'monthly-summary', 'earnings-timeseries',
+    'earnings-by-gender', 'earnings-by-age-group', 'earnings-by-postal-code'
+}
+
+# Known column lists, so empty CSV exports still get a header
+DATASET_COLUMNS = {'orders': ORDER_COLUMNS, 'order-items': ORDER_ITEM_COLUMNS}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def to_csv(rows: Iterable[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+           columns: Optional[List[str]] = None) -> Iterator[str]:
+    """Serialize rows as CSV text chunks; without columns the header comes from the first row."""
+    buffer = io.StringIO()
+    writer = None
+    if columns:
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        writer.writeheader()
+    pending = 0
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row.keys()))
+            writer.writeheader()
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def to_ndjson(rows: Iterable[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+              columns: Optional[List[str]] = None) -> Iterator[str]:
+    """Serialize rows as newline-delimited JSON text chunks."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, default=_json_default))
+        if len(lines) >= chunk_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+SERIALIZERS = {'csv': to_csv, 'ndjson': to_ndjson}
+
+
+def export_dataset(dataset: str, fmt: str = 'csv', date_from: Optional[str] = None,
+                   date_to: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Build a lazy text stream for a dataset export.
+    Validation happens up front so errors surface before streaming starts.
+    """
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset '{dataset}'. Available: {', '.join(sorted(DATASETS))}")
+    if fmt not in SERIALIZERS:
+        raise ExportError(f"Unknown format '{fmt}'. Use csv or ndjson")
+    if (date_from or date_to) and dataset not in DATE_FILTERED:
+        raise ExportError(f"Dataset '{dataset}' does not support date filters")
+
+    start, end = parse_date_range(date_from, date_to)
+    rows = DATASETS[dataset](start=start, end=end, chunk_size=chunk_size)
+    return SERIALIZERS[fmt](rows, chunk_size, DATASET_COLUMNS.get(dataset))
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Export Kopernik Pizza data as CSV or NDJSON")
+    parser.add_argument('dataset', choices=sorted(DATASETS))
+    parser.add_argument('--format', dest='fmt', choices=sorted(SERIALIZERS), default='csv')
+    parser.add_argument('--from', dest='date_from', help='first day (YYYY-MM-DD), not for undelivered-orders')
+    parser.add_argument('--to', dest='date_to', help='last day, inclusive (YYYY-MM-DD)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        try:
+            stream = export_dataset(args.dataset, args.fmt, args.date_from, args.date_to, args.chunk_size)
+        except ExportError as e:
+            parser.error(str(e))
+
+        out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+        try:
+            for chunk in stream:
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
@@ -0,0 +1,259 @@
+"""
+Synthetic Data Generator
+Deterministic, seedable customers and order history at production-like
+volumes, on top of the catalog created by seed.py.
+
+- Customers: adult age distribution for birthdays, postcodes inside the
+  DeliveryZone prefixes (a few outside), skewed order frequency
+- Orders: weekday and lunch/dinner peaks, mild growth over the period,
+  ids increasing with order date, delivered except for the last hours
+- Order lines: basket sizes 1-6, Zipf-like item popularity per type,
+  every order contains a pizza
+
+Rows are written with executemany on the raw sqlite3 cursor, in large
+transactions wrapped in database_constraints.bulk_load (row triggers
+suspended, loaded rows validated set-based per transaction).
+
+Usage:
+    python seed.py
+    python generate_data.py --customers 100000 --lines 10000000 --days 730 --seed 42
+"""
+
+from extensions import db
+from models import Pizza, Drink, Dessert, DeliveryZone, ORDER_STATUS_CODES
+from database_constraints import bulk_load
+from sqlalchemy import text
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, List, Optional, Tuple, Callable
+import bisect
+import itertools
+import random
+
+BATCH_SIZE = 50_000
+TRANSACTION_LINES = 1_000_000
+
+FIRST_NAMES = ['Mario', 'Luigi', 'Anna', 'Sofia', 'Marco', 'Giulia', 'Alessandro', 'Francesca',
+               'Davide', 'Chiara', 'Luca', 'Sara', 'Matteo', 'Elena', 'Paolo', 'Martina']
+LAST_NAMES = ['Rossi', 'Verde', 'Bianchi', 'Russo', 'Ferrari', 'Romano', 'Costa', 'Ricci',
+              'Bruno', 'Greco', 'Conti', 'Gallo', 'Marino', 'Lombardi', 'Moretti', 'Fontana']
+STREETS = ['Via Roma', 'Via Milano', 'Via Napoli', 'Via Torino', 'Corso Italia', 'Via Garibaldi']
+FALLBACK_PREFIXES = ['001', '002', '003', '201', '202', '203', '801', '901', '701']
+
+# Share of order lines per item type (the first line of every order is a pizza)
+ITEM_TYPE_WEIGHTS = {'pizza': 0.55, 'drink': 0.30, 'dessert': 0.15}
+BASKET_SIZE_WEIGHTS = {1: 0.34, 2: 0.30, 3: 0.18, 4: 0.10, 5: 0.05, 6: 0.03}
+QUANTITY_WEIGHTS = {1: 0.78, 2: 0.18, 3: 0.04}
+# Mon..Sun
+WEEKDAY_WEIGHTS = [0.8, 0.8, 0.9, 1.0, 1.4, 1.6, 1.2]
+# Orders per hour of day: lunch and dinner peaks, quiet nights
+HOUR_WEIGHTS = [0.3, 0.1, 0.05, 0.02, 0.02, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 1.2,
+                2.5, 2.2, 0.9, 0.5, 0.6, 1.2, 2.8, 3.4, 3.0, 1.8, 1.0, 0.6]
+ZIPF_EXPONENT = 1.1
+OUTSIDE_ZONE_SHARE = 0.05
+NO_BIRTHDAY_SHARE = 0.05
+DISCOUNTED_SHARE = 0.08
+DELIVERY_HOURS = 2
+
+
+def _cumulative(weights: List[float]) -> List[float]:
+    return list(itertools.accumulate(weights))
+
+
+def _pick(rng: random.Random, values: List[Any], cum_weights: List[float]) -> Any:
+    return values[bisect.bisect(cum_weights, rng.random() * cum_weights[-1])]
+
+
+def load_catalog() -> Dict[str, Any]:
+    """Items with prices (Zipf-weighted by id order) and delivery zones from the database."""
+    items = {
+        'pizza': [(p.id, p.calculate_price()) for p in Pizza.query.order_by(Pizza.id)],
+        'drink': [(d.id, float(d.price)) for d in Drink.query.order_by(Drink.id)],
+        'dessert': [(d.id, float(d.price)) for d in Dessert.query.order_by(Dessert.id)]
+    }
+    if not items['pizza']:
+        raise RuntimeError("No pizzas found - run seed.py first")
+
+    zones = {z.postcode_prefix: z.delivery_person_id for z in DeliveryZone.query}
+    return {
+        'items': {t: rows for t, rows in items.items() if rows},
+        'zones': zones,
+        'prefixes': sorted(zones) or FALLBACK_PREFIXES
+    }
+
+
+def _birthday(rng: random.Random, today: date) -> Optional[str]:
+    if rng.random() < NO_BIRTHDAY_SHARE:
+        return None
+    age = min(85.0, max(18.0, rng.gauss(36, 12)))
+    return (today - timedelta(days=int(age * 365.25) + rng.randint(0, 364))).isoformat()
+
+
+def _postcode(rng: random.Random, prefixes: List[str]) -> str:
+    if rng.random() < OUTSIDE_ZONE_SHARE:
+        return f"{rng.randint(10000, 99999):05d}"
+    return f"{rng.choice(prefixes)}{rng.randint(0, 99):02d}"
+
+
+def customer_rows(rng: random.Random, first_id: int, count: int, prefixes: List[str],
+                  today: date) -> List[Tuple]:
+    """(id, name, email, phone, address, birthday) tuples."""
+    rows = []
+    for customer_id in range(first_id, first_id + count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        address = f"{rng.choice(STREETS)} {rng.randint(1, 200)}, {_postcode(rng, prefixes)}"
+        rows.append((customer_id, name, f"gen{customer_id}@example.com", f"+39{customer_id:010d}",
+                     address, _birthday(rng, today)))
+    return rows
+
+
+def _raw_cursor():
+    """sqlite3 cursor on the connection of the session's current transaction."""
+    return db.session.connection().connection.driver_connection.cursor()
+
+
+def _day_weights(days: int, start: date) -> List[float]:
+    """Relative order volume per day: weekday pattern plus 50% growth over the period."""
+    return [WEEKDAY_WEIGHTS[(start + timedelta(days=i)).weekday()] * (1 + 0.5 * i / max(days - 1, 1))
+            for i in range(days)]
+
+
+def generate(customers: int, lines: int, days: int = 365, seed: int = 42,
+             end: Optional[datetime] = None, batch_size: int = BATCH_SIZE,
+             transaction_lines: int = TRANSACTION_LINES,
+             progress: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+    """
+    Append `customers` customers and about `lines` order lines spread over
+    the `days` days before `end` (default: today's midnight UTC).
+    The same seed, volumes and end always produce the same data.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = (end - timedelta(days=days)).date()
+    now = datetime.utcnow()
+    catalog = load_catalog()
+    log = progress or (lambda message: None)
+
+    first_customer = db.session.execute(text("SELECT COALESCE(MAX(id), 0) FROM customers")).scalar() + 1
+    next_order = db.session.execute(text("SELECT COALESCE(MAX(id), 0) FROM orders")).scalar() + 1
+    db.session.commit()
+
+    postcodes = {}
+    with bulk_load(['customers']):
+        cursor = _raw_cursor()
+        for offset in range(0, customers, batch_size):
+            count = min(batch_size, customers - offset)
+            rows = customer_rows(rng, first_customer + offset, count, catalog['prefixes'], end.date())
+            cursor.executemany(
+                "INSERT INTO customers (id, name, email, phone, address, birthday) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            postcodes.update((row[0], row[4][-5:]) for row in rows)
+    log(f"👥 {customers:,} customers")
+
+    # Each customer gets a skewed (Pareto) share of the orders
+    customer_ids = list(range(first_customer, first_customer + customers))
+    customer_cum = _cumulative([rng.paretovariate(1.5) for _ in customer_ids])
+
+    types = list(ITEM_TYPE_WEIGHTS)
+    type_cum = _cumulative([ITEM_TYPE_WEIGHTS[t] if t in catalog['items'] else 0 for t in types])
+    item_cum = {t: _cumulative([1 / (rank ** ZIPF_EXPONENT) for rank in range(1, len(rows) + 1)])
+                for t, rows in catalog['items'].items()}
+    baskets, basket_cum = list(BASKET_SIZE_WEIGHTS), _cumulative(list(BASKET_SIZE_WEIGHTS.values()))
+    quantities, quantity_cum = list(QUANTITY_WEIGHTS), _cumulative(list(QUANTITY_WEIGHTS.values()))
+    hours, hour_cum = list(range(24)), _cumulative(HOUR_WEIGHTS)
+
+    mean_basket = sum(size * weight for size, weight in BASKET_SIZE_WEIGHTS.items()) / sum(BASKET_SIZE_WEIGHTS.values())
+    day_weights = _day_weights(days, start)
+    total_orders = lines / mean_basket
+    scale = total_orders / sum(day_weights)
+
+    orders_batch: List[Tuple] = []
+    lines_batch: List[Tuple] = []
+    written_orders = written_lines = 0
+    pending_lines = 0
+
+    def flush(cursor):
+        nonlocal orders_batch, lines_batch
+        cursor.executemany(
+            "INSERT INTO orders (id, customer_id, order_date, status, total, delivery_person_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)", orders_batch)
+        cursor.executemany(
+            "INSERT INTO order_items (order_id, item_type, item_id, pizza_id, quantity) VALUES (?, ?, ?, ?, ?)",
+            lines_batch)
+        orders_batch, lines_batch = [], []
+
+    day = 0
+    carry = 0.0
+    while day < days and written_lines < lines:
+        with bulk_load(['order_items']):
+            cursor = _raw_cursor()
+            pending_lines = 0
+            while day < days and written_lines < lines and pending_lines < transaction_lines:
+                day_start = datetime.combine(start + timedelta(days=day), datetime.min.time())
+                carry += day_weights[day] * scale
+                count, carry = int(carry), carry - int(carry)
+                moments = sorted(
+                    day_start + timedelta(hours=_pick(rng, hours, hour_cum), seconds=rng.randrange(3600))
+                    for _ in range(count))
+                for moment in moments:
+                    if written_lines >= lines:
+                        break
+                    customer_id = _pick(rng, customer_ids, customer_cum)
+                    order_id = next_order
+                    next_order += 1
+
+                    total = 0.0
+                    size = min(_pick(rng, baskets, basket_cum), lines - written_lines)
+                    for position in range(size):
+                        item_type = 'pizza' if position == 0 else _pick(rng, types, type_cum)
+                        item_id, price = _pick(rng, catalog['items'][item_type], item_cum[item_type])
+                        quantity = _pick(rng, quantities, quantity_cum)
+                        total += price * quantity
+                        lines_batch.append((order_id, item_type, item_id,
+                                            item_id if item_type == 'pizza' else None, quantity))
+                    if rng.random() < DISCOUNTED_SHARE:
+                        total *= 0.9
+
+                    # drawn for every order so the sequence does not depend on the clock
+                    open_status = rng.choice(['pending', 'preparing'])
+                    delivered = moment < now - timedelta(hours=DELIVERY_HOURS)
+                    courier = catalog['zones'].get(postcodes[customer_id][:3]) if delivered else None
+                    orders_batch.append((order_id, customer_id, moment.isoformat(' '),
+                                         ORDER_STATUS_CODES['delivered' if delivered else open_status],
+                                         round(total, 2), courier))
+                    written_orders += 1
+                    written_lines += size
+                    pending_lines += size
+                    if len(lines_batch) >= batch_size:
+                        flush(cursor)
+                day += 1
+            if orders_batch:
+                flush(cursor)
+        log(f"🍕 {written_orders:,} orders / {written_lines:,} lines (up to {start + timedelta(days=day - 1)})")
+
+    return {'customers': customers, 'orders': written_orders, 'order_lines': written_lines}
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Generate synthetic customers and order history")
+    parser.add_argument('--customers', type=int, default=100_000)
+    parser.add_argument('--lines', type=int, default=1_000_000, help='approximate number of order lines')
+    parser.add_argument('--days', type=int, default=365, help='length of the order history')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--end', help='history end date (YYYY-MM-DD, default today)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='rows per executemany')
+    parser.add_argument('--transaction-lines', type=int, default=TRANSACTION_LINES,
+                        help='order lines per transaction')
+    args = parser.parse_args()
+
+    with app.app_context():
+        started = time.perf_counter()
+        result = generate(
+            args.customers, args.lines, args.days, args.seed,
+            end=datetime.fromisoformat(args.end) if args.end else None,
+            batch_size=args.batch_size, transaction_lines=args.transaction_lines,
+            progress=print)
+        print(f"✅ Generated {result['customers']:,} customers, {result['orders']:,} orders and "
+              f"{result['order_lines']:,} order lines in {time.perf_counter() - started:.1f}s")
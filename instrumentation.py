@@ -0,0 +1,164 @@
+"""
+SQL Instrumentation Module
+Per-request query accounting using SQLAlchemy engine events.
+
+For every request it records the number of queries, the total time
+spent in the database and the slowest statements. The stats live in a
+context variable, so report threads started with a copy of the request's
+context (snapshots.run_reports) count toward the request that ran them. Statements repeated
+many times with different parameters (the usual N+1 shape, e.g. lazy
+loads from Pizza.calculate_price() in a template loop) are flagged.
+
+- Debug mode (or SQL_DEBUG_HEADERS): X-DB-* response headers
+- SLOW_REQUEST_LOG: requests slower than SLOW_REQUEST_MS are appended
+  as JSON lines to a rotating log file
+"""
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import defaultdict
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Any, List, Optional
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+slow_logger = logging.getLogger('instrumentation.slow_requests')
+
+SLOWEST_KEPT = 5
+# Literals inlined into SQL text, collapsed so repeated statements group together
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r'\s+')
+
+_stats: ContextVar[Optional['RequestQueryStats']] = ContextVar('sql_stats', default=None)
+
+
+def normalize_statement(statement: str) -> str:
+    """Statement shape with literals replaced by '?' and whitespace collapsed."""
+    return _WHITESPACE.sub(' ', _LITERALS.sub('?', statement)).strip()
+
+
+class RequestQueryStats:
+    """Queries issued while handling one request, possibly from several threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest: List[tuple] = []  # (seconds, statement), longest first
+        self.by_shape: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+
+    def record(self, statement: str, elapsed: float) -> None:
+        shape_key = normalize_statement(statement)
+        with self._lock:
+            self.queries += 1
+            self.db_time += elapsed
+            shape = self.by_shape[shape_key]
+            shape[0] += 1
+            shape[1] += elapsed
+            if len(self.slowest) < SLOWEST_KEPT or elapsed > self.slowest[-1][0]:
+                self.slowest.append((elapsed, statement))
+                self.slowest.sort(key=lambda item: item[0], reverse=True)
+                del self.slowest[SLOWEST_KEPT:]
+
+    def suspected_n_plus_one(self, threshold: int) -> List[Dict[str, Any]]:
+        """Statement shapes executed at least `threshold` times, most frequent first."""
+        suspects = [
+            {'statement': shape, 'count': count, 'total_ms': round(total * 1000, 2)}
+            for shape, (count, total) in self.by_shape.items() if count >= threshold
+        ]
+        return sorted(suspects, key=lambda s: s['count'], reverse=True)
+
+    def summary(self, threshold: int) -> Dict[str, Any]:
+        return {
+            'duration_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'queries': self.queries,
+            'db_time_ms': round(self.db_time * 1000, 2),
+            'slowest': [{'statement': _WHITESPACE.sub(' ', s).strip(), 'ms': round(t * 1000, 2)}
+                        for t, s in self.slowest],
+            'n_plus_one': self.suspected_n_plus_one(threshold)
+        }
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    stats = _stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    # failed statements never reach after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_started'):
+        conn.info['query_started'].pop()
+
+
+def _before_request():
+    g.sql_stats_token = _stats.set(RequestQueryStats())
+
+
+def _after_request(response):
+    stats = _stats.get()
+    if stats is None:
+        return response
+    config = current_app.config
+    summary = stats.summary(config['N_PLUS_ONE_THRESHOLD'])
+
+    if current_app.debug or config['SQL_DEBUG_HEADERS']:
+        response.headers['X-DB-Queries'] = str(summary['queries'])
+        response.headers['X-DB-Time-Ms'] = f"{summary['db_time_ms']:.2f}"
+        if summary['slowest']:
+            response.headers['X-DB-Slowest-Ms'] = f"{summary['slowest'][0]['ms']:.2f}"
+        response.headers['X-DB-N-Plus-One'] = str(len(summary['n_plus_one']))
+        if summary['n_plus_one']:
+            worst = summary['n_plus_one'][0]
+            response.headers['X-DB-N-Plus-One-Statement'] = f"{worst['count']}x {worst['statement'][:200]}"
+
+    if summary['duration_ms'] >= config['SLOW_REQUEST_MS']:
+        slow_logger.warning(json.dumps({
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            **summary
+        }))
+    return response
+
+
+def _teardown_request(exc):
+    # request threads are reused (thread pools): never leave the stats behind
+    token = g.pop('sql_stats_token', None)
+    if token is not None:
+        _stats.reset(token)
+
+
+def init_instrumentation(app) -> None:
+    """Register the per-request hooks and, if configured, the slow request log file."""
+    app.config.setdefault('SQL_DEBUG_HEADERS', False)
+    app.config.setdefault('SLOW_REQUEST_MS', 500)
+    app.config.setdefault('SLOW_REQUEST_LOG', None)
+    app.config.setdefault('N_PLUS_ONE_THRESHOLD', 5)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    path = app.config['SLOW_REQUEST_LOG']
+    if path and not any(getattr(h, 'baseFilename', None) == os.path.abspath(path) for h in slow_logger.handlers):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=5 * 1024 * 1024, backupCount=5)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_logger.addHandler(handler)
+        slow_logger.propagate = False
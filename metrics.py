@@ -0,0 +1,253 @@
+"""
+Metrics Module
+In-process metrics registry (counters, gauges, fixed-bucket histograms)
+rendered in the Prometheus text exposition format at /metrics.
+
+- Order placement: duration of each create_order_transaction step,
+  committed orders, rollbacks by error_type, couriers not found
+- Reports: computation time per report and report cache hit/miss counts
+"""
+
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+import math
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STEP_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+REPORT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Metric:
+    """Shared label handling: one value (or bucket array) per label combination."""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        self._function: Optional[Callable[[], Any]] = None
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def set_function(self, fn: Callable[[], Any]) -> None:
+        """Read the value(s) from fn() at scrape time: a number, or {label tuple: number}."""
+        self._function = fn
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(suffix, label string, value) for every exposed series."""
+        if self._function is not None:
+            values = self._function()
+            if not isinstance(values, dict):
+                values = {(): values}
+            return [('', _format_labels(self.labelnames, key), value) for key, value in values.items()]
+        with self._lock:
+            return [('', _format_labels(self.labelnames, key), value) for key, value in sorted(self._values.items())]
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for suffix, labels, value in self.samples():
+            lines.append(f'{self.name}{suffix}{labels} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = STEP_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self, **labels) -> Dict[str, Any]:
+        with self._lock:
+            series = self._values.get(self._key(labels))
+            return {'counts': list(series['counts']), 'sum': series['sum'], 'count': series['count']} \
+                if series else {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        out = []
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    out.append(('_bucket', _format_labels(self.labelnames, key, le), cumulative))
+                labels = _format_labels(self.labelnames, key)
+                out.append(('_sum', labels, series['sum']))
+                out.append(('_count', labels, series['count']))
+        return out
+
+
+class MetricsRegistry:
+    """Named metrics, rendered together in registration order."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered with another type or labels")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = STEP_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(m.render() for m in metrics) + '\n'
+
+
+registry = MetricsRegistry()
+
+ORDER_STEP_SECONDS = registry.histogram(
+    'kopernik_order_step_seconds', 'Time spent in each create_order_transaction step', ['step'])
+ORDER_SECONDS = registry.histogram(
+    'kopernik_order_seconds', 'Total create_order_transaction time by outcome', ['outcome'])
+ORDERS_TOTAL = registry.counter('kopernik_orders_total', 'Orders committed')
+ORDER_ROLLBACKS_TOTAL = registry.counter(
+    'kopernik_order_rollbacks_total', 'Order transactions rolled back', ['error_type'])
+COURIER_NOT_FOUND_TOTAL = registry.counter(
+    'kopernik_courier_not_found_total', 'Orders committed without an available delivery person')
+REPORT_SECONDS = registry.histogram(
+    'kopernik_report_seconds', 'Report computation time (cache misses only)', ['report'], REPORT_BUCKETS)
+REPORT_CACHE_REQUESTS = registry.counter(
+    'kopernik_report_cache_requests_total', 'Report cache lookups by result', ['result'])
+REPORT_CACHE_ENTRIES = registry.gauge(
+    'kopernik_report_cache_entries', 'Cached report results by range kind', ['kind'])
+
+
+class StepTimer:
+    """
+    Laps through the steps of one operation, observing each step's duration
+    into a histogram labelled by step name.
+    """
+
+    def __init__(self, histogram: Histogram = ORDER_STEP_SECONDS):
+        self.histogram = histogram
+        self.started = self._last = time.perf_counter()
+        self.laps: Dict[str, float] = {}
+
+    def lap(self, step: str) -> float:
+        """Record the time since the previous lap (or start) as `step`."""
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.laps[step] = elapsed
+        self.histogram.observe(elapsed, step=step)
+        return elapsed
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+
+def init_report_cache_metrics(cache) -> None:
+    """Expose a ReportCache's hit/miss counters and sizes, read at scrape time."""
+    def lookups():
+        stats = cache.stats()
+        return {('hit',): stats['hits'], ('miss',): stats['misses']}
+
+    def entries():
+        stats = cache.stats()
+        return {('closed',): stats['closed_entries'], ('open',): stats['entries'] - stats['closed_entries']}
+
+    REPORT_CACHE_REQUESTS.set_function(lookups)
+    REPORT_CACHE_ENTRIES.set_function(entries)
@@ -1,4 +1,31 @@
 from extensions import db
+from datetime import datetime
+from sqlalchemy.types import TypeDecorator
+
+# Order lifecycle states, stored as their index (see OrderStatusType and order_lifecycle.py)
+ORDER_STATUSES = ('pending', 'preparing', 'out_for_delivery', 'delivered', 'cancelled')
+ORDER_STATUS_CODES = {name: code for code, name in enumerate(ORDER_STATUSES)}
+ACTIVE_ORDER_STATUSES = ('pending', 'preparing', 'out_for_delivery')
+# names written before the state machine existed
+LEGACY_ORDER_STATUSES = {'confirmed': 'pending', 'complete': 'delivered', 'completed': 'delivered'}
+
+
+class OrderStatusType(TypeDecorator):
+    """Order status as a SMALLINT code in the database, its name in Python."""
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        name = LEGACY_ORDER_STATUSES.get(value, value)
+        if name not in ORDER_STATUS_CODES:
+            raise ValueError(f"Unknown order status: {value}")
+        return ORDER_STATUS_CODES[name]
+
+    def process_result_value(self, value, dialect):
+        return ORDER_STATUSES[value] if value is not None else None
+
 
 # Customer file
 class Customer(db.Model):
@@ -14,6 +41,11 @@ class Customer(db.Model):
     address = db.Column(db.String(200), nullable=False)
     birthday = db.Column(db.Date, nullable=True)
 
+    __table_args__ = (
+        # case-insensitive lookup of customers stored before email normalization
+        db.Index('ix_customers_email_lower', db.func.lower(email)),
+    )
+
     # relationships one customer can have many orders 
     orders = db.relationship('Order', back_populates='customer', lazy=True)
 
@@ -79,11 +111,21 @@ class Pizza(db.Model):
 class Order(db.Model):
     __tablename__ = 'orders'
     id = db.Column(db.Integer, primary_key=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
-    order_date = db.Column(db.DateTime, nullable=False)
-    status = db.Column(db.String(50), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False, index=True)
+    order_date = db.Column(db.DateTime, nullable=False, index=True)
+    status = db.Column(OrderStatusType, nullable=False, default='pending')
     total = db.Column(db.Float, nullable=True)
     delivery_person_id = db.Column(db.Integer, db.ForeignKey('delivery_persons.id'), nullable=True)
+    # set by order_lifecycle.transition_orders when the order enters each state
+    preparing_at = db.Column(db.DateTime, nullable=True)
+    out_for_delivery_at = db.Column(db.DateTime, nullable=True)
+    delivered_at = db.Column(db.DateTime, nullable=True)
+    cancelled_at = db.Column(db.DateTime, nullable=True)
+
+    # active-order queues filter on status and sort by date
+    __table_args__ = (
+        db.Index('ix_orders_status_order_date', 'status', 'order_date'),
+    )
 
     # relationships one order belongs to one customer
     customer = db.relationship('Customer', back_populates='orders', lazy=True)
@@ -97,7 +139,7 @@ class OrderItem(db.Model):
     __tablename__ = "order_items"
 
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"))
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), index=True)
     
     # Item type and ID - supports pizza, drink, dessert
     item_type = db.Column(db.String(20), nullable=False, default='pizza')
@@ -192,6 +234,88 @@ class Dessert(db.Model):
     description = db.Column(db.String(255), nullable=True)
 Order.items = db.relationship("OrderItem", back_populates="order")
 
+
+class DimCustomer(db.Model):
+    """
+    Customer dimension for analytics reports.
+    Precomputed age band, postcode, segment and order dates so report
+    queries group by plain indexed columns. Kept in sync by dimensions.py.
+    """
+    __tablename__ = 'dim_customer'
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), primary_key=True)
+    gender = db.Column(db.String(10), nullable=False, index=True)  # mock, see get_earnings_by_gender
+    age_band = db.Column(db.String(10), nullable=False, index=True)
+    postcode = db.Column(db.String(10), nullable=False, index=True)
+    postcode_prefix = db.Column(db.String(10), nullable=False, index=True)
+    segment = db.Column(db.String(20), nullable=False, index=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    first_order_date = db.Column(db.DateTime, nullable=True)
+    last_order_date = db.Column(db.DateTime, nullable=True)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+
+class DimCustomerDirty(db.Model):
+    """Customers whose dim_customer row is stale, filled by triggers (see dimensions.py)."""
+    __tablename__ = 'dim_customer_dirty'
+    customer_id = db.Column(db.Integer, primary_key=True)
+
+
+class EtlWatermark(db.Model):
+    """High-water marks for incremental jobs (last processed id, date, ...)."""
+    __tablename__ = 'etl_watermarks'
+    name = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    @classmethod
+    def get(cls, name: str) -> int:
+        mark = db.session.get(cls, name)
+        return mark.value if mark else 0
+
+    @classmethod
+    def set(cls, name: str, value: int) -> None:
+        mark = db.session.get(cls, name)
+        if mark is None:
+            mark = cls(name=name)
+            db.session.add(mark)
+        mark.value = value
+        mark.updated_at = datetime.utcnow()
+
+
+class ConstraintViolation(db.Model):
+    """Persisted result of the incremental constraint scanner (database_constraints.py)."""
+    __tablename__ = 'constraint_violations'
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    check_name = db.Column(db.String(100), nullable=False)
+    message = db.Column(db.String(300), nullable=False)
+    detected_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('table_name', 'row_id', 'check_name'),
+    )
+
+
+class ConstraintDirtyRow(db.Model):
+    """Rows updated or deleted since the last constraint scan, filled by triggers."""
+    __tablename__ = 'constraint_dirty_rows'
+    table_name = db.Column(db.String(50), primary_key=True)
+    row_id = db.Column(db.Integer, primary_key=True)
+
+
+class EventLog(db.Model):
+    """Broker events shared between worker processes (events.EventRelay), pruned after a few minutes."""
+    __tablename__ = 'event_log'
+    id = db.Column(db.Integer, primary_key=True)
+    origin = db.Column(db.String(32), nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    # readers resume from the last id they saw: ids must never be reused once old rows are pruned
+    __table_args__ = {'sqlite_autoincrement': True}
+
 # Note: Ensure to create the tables in the database by running create_db.py after defining models.
 # Also, you can seed initial data using seed.py.
 # Relationships summary:
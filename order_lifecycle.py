@@ -0,0 +1,195 @@
+"""
+Order Lifecycle Module
+Order state machine with validated, bulk status transitions.
+
+    pending -> preparing -> out_for_delivery -> delivered
+        \\-----------\\--------------------\\---> cancelled
+
+- Statuses are stored as SMALLINT codes (models.OrderStatusType) with an
+  index on (status, order_date), so the undelivered queue only ever
+  touches active orders
+- transition_orders() moves any number of orders to one status with a
+  single UPDATE per chunk; orders whose current status does not allow the
+  move are reported back, not changed. Each state records when the order
+  entered it (preparing_at, out_for_delivery_at, delivered_at, cancelled_at)
+- migrate_order_status() converts databases created with the old
+  free-form string column (run at startup, a no-op once done)
+"""
+
+from extensions import db
+from models import ORDER_STATUSES, ORDER_STATUS_CODES, ACTIVE_ORDER_STATUSES, LEGACY_ORDER_STATUSES
+from events import broker
+from sqlalchemy import text, bindparam
+from datetime import datetime
+from typing import Dict, Any, List, Iterable, Collection, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRANSITIONS = {
+    'pending': ('preparing', 'cancelled'),
+    'preparing': ('out_for_delivery', 'cancelled'),
+    'out_for_delivery': ('delivered', 'cancelled'),
+    'delivered': (),
+    'cancelled': ()
+}
+TIMESTAMP_COLUMNS = {
+    'preparing': 'preparing_at',
+    'out_for_delivery': 'out_for_delivery_at',
+    'delivered': 'delivered_at',
+    'cancelled': 'cancelled_at'
+}
+MAX_BULK_ORDERS = 10_000
+CHUNK_SIZE = 1000
+
+
+class OrderStatusError(ValueError):
+    """Unknown status or malformed transition request."""
+
+
+def normalize_status(name: str) -> str:
+    name = LEGACY_ORDER_STATUSES.get(name, name)
+    if name not in ORDER_STATUS_CODES:
+        raise OrderStatusError(f"Unknown status: {name!r} (expected one of {', '.join(ORDER_STATUSES)})")
+    return name
+
+
+def can_transition(from_status: str, to_status: str) -> bool:
+    return to_status in TRANSITIONS.get(from_status, ())
+
+
+def status_name_sql(column: str) -> str:
+    """SQL expression turning a status code column back into its name."""
+    cases = ' '.join(f"WHEN {code} THEN '{name}'" for name, code in ORDER_STATUS_CODES.items())
+    return f"CASE {column} {cases} END"
+
+
+def active_status_sql(column: str) -> str:
+    """SQL condition for orders that are not yet delivered or cancelled."""
+    return f"{column} IN ({', '.join(str(ORDER_STATUS_CODES[s]) for s in ACTIVE_ORDER_STATUSES)})"
+
+
+SELECT_STATUS_SQL = text("SELECT id, status FROM orders WHERE id IN :ids") \
+    .bindparams(bindparam('ids', expanding=True))
+
+
+def _chunks(values: List[int], size: int = CHUNK_SIZE) -> Iterable[List[int]]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def transition_orders(order_ids: Collection[int], to_status: str,
+                      now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Move orders to `to_status` and commit.
+    Returns {'status', 'updated': [ids], 'rejected': [{'order_id', 'status', 'reason'}]}.
+    """
+    to_status = normalize_status(to_status)
+    # a string is iterable too: "123" must not become orders 1, 2 and 3
+    if not isinstance(order_ids, (list, tuple, set, frozenset)) or any(isinstance(i, bool) for i in order_ids):
+        raise OrderStatusError("order_ids must be a list of integers")
+    try:
+        ids = sorted({int(i) for i in order_ids})
+    except (TypeError, ValueError):
+        raise OrderStatusError("order_ids must be a list of integers")
+    if not ids:
+        raise OrderStatusError("No order ids given")
+    if len(ids) > MAX_BULK_ORDERS:
+        raise OrderStatusError(f"At most {MAX_BULK_ORDERS} orders per request")
+
+    now = now or datetime.utcnow()
+    allowed_from = [s for s, targets in TRANSITIONS.items() if to_status in targets]
+    update = text(f"""
+        UPDATE orders
+        SET status = :to_status, {TIMESTAMP_COLUMNS[to_status]} = :now
+        WHERE id IN :ids AND status IN :from_statuses
+        RETURNING id
+    """).bindparams(bindparam('ids', expanding=True), bindparam('from_statuses', expanding=True),
+                 bindparam('now', type_=db.DateTime))
+
+    current: Dict[int, str] = {}
+    for chunk in _chunks(ids):
+        current.update((row[0], ORDER_STATUSES[row[1]])
+                       for row in db.session.execute(SELECT_STATUS_SQL, {'ids': chunk}))
+    movable = [i for i in ids if current.get(i) in allowed_from]
+
+    updated: List[int] = []
+    try:
+        for chunk in _chunks(movable):
+            # the status guard in WHERE wins any race with a concurrent transition
+            updated.extend(row[0] for row in db.session.execute(update, {
+                'to_status': ORDER_STATUS_CODES[to_status],
+                'now': now,
+                'ids': chunk,
+                'from_statuses': [ORDER_STATUS_CODES[s] for s in allowed_from]
+            }))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    done = set(updated)
+    rejected = []
+    for order_id in ids:
+        if order_id in done:
+            continue
+        status = current.get(order_id)
+        if status is None:
+            reason = 'not_found'
+        elif status in allowed_from:
+            reason = 'concurrent_change'
+        else:
+            reason = f'cannot move from {status} to {to_status}'
+        rejected.append({'order_id': order_id, 'status': status, 'reason': reason})
+
+    for order_id in sorted(done):
+        broker.publish('order_status', {
+            'order_id': order_id,
+            'status': to_status,
+            'previous_status': current[order_id]
+        })
+    logger.info(f"{len(updated)} orders moved to {to_status}", extra={
+        'event': 'orders.transitioned', 'status': to_status,
+        'updated': len(updated), 'rejected': len(rejected)
+    })
+    return {'status': to_status, 'updated': sorted(done), 'rejected': rejected}
+
+
+def migrate_order_status() -> bool:
+    """
+    Convert a string `orders.status` column to SMALLINT codes and add the
+    transition timestamp columns and status index. Returns True if
+    anything changed.
+    """
+    columns = {row[1]: row[2] for row in db.session.execute(text("PRAGMA table_info(orders)"))}
+    if not columns:
+        return False
+    changed = False
+    if columns['status'].upper() not in ('SMALLINT', 'INTEGER'):
+        # unknown legacy values are treated as pending so they stay visible in the queue
+        cases = ' '.join(
+            f"WHEN '{name}' THEN {ORDER_STATUS_CODES[LEGACY_ORDER_STATUSES.get(name, name)]}"
+            for name in (*ORDER_STATUSES, *LEGACY_ORDER_STATUSES))
+        db.session.execute(text("ALTER TABLE orders ADD COLUMN status_code SMALLINT NOT NULL DEFAULT 0"))
+        db.session.execute(text(f"UPDATE orders SET status_code = CASE lower(status) {cases} ELSE 0 END"))
+        db.session.execute(text("ALTER TABLE orders DROP COLUMN status"))
+        db.session.execute(text("ALTER TABLE orders RENAME COLUMN status_code TO status"))
+        changed = True
+    for column in TIMESTAMP_COLUMNS.values():
+        if column not in columns:
+            db.session.execute(text(f"ALTER TABLE orders ADD COLUMN {column} DATETIME"))
+            changed = True
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_orders_status_order_date ON orders (status, order_date)"))
+    db.session.commit()
+    if changed:
+        logger.info("Migrated orders.status to SMALLINT codes with transition timestamps")
+    return changed
+
+
+def init_order_lifecycle(app) -> None:
+    """Bring an existing database up to the lifecycle schema."""
+    with app.app_context():
+        migrate_order_status()
+        db.session.remove()
+
@@ -0,0 +1,185 @@
+"""
+Report Cache Module
+Query specs for the parameterized staff report endpoints and a result
+cache keyed by the normalized spec.
+
+- from / to are whole days (YYYY-MM-DD, 'to' inclusive) turned into a
+  half-open [start, end) datetime range
+- Closed ranges (ending at or before today's midnight UTC) never change
+  once their orders are in, so they are cached until evicted (LRU)
+- Open ranges (including "no range", i.e. the report default relative
+  to now) get a short TTL and are dropped whenever an order is committed
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, NamedTuple, Callable, Tuple
+from report_schema import GRANULARITIES
+from events import broker
+from metrics import init_report_cache_metrics
+import threading
+import time
+
+DEFAULT_LIMIT = 3
+MAX_LIMIT = 100
+MAX_RANGE_DAYS = 3 * 366
+
+COMPARE_MODES = ('previous_year', 'previous_period')
+
+
+class ReportSpecError(ValueError):
+    """Raised for invalid report parameters."""
+    pass
+
+
+class ReportSpec(NamedTuple):
+    """Normalized report parameters; hashable, so it doubles as a cache key."""
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    granularity: str = 'day'
+    limit: int = DEFAULT_LIMIT
+
+    def is_closed(self, now: Optional[datetime] = None) -> bool:
+        """True when the range lies entirely before today (UTC)."""
+        today = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.end is not None and self.end <= today
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'from': self.start.date().isoformat() if self.start else None,
+            'to': (self.end - timedelta(days=1)).date().isoformat() if self.end else None,
+            'granularity': self.granularity,
+            'limit': self.limit
+        }
+
+
+def _parse_day(value: str, name: str) -> datetime:
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ReportSpecError(f"Invalid '{name}' date '{value}'. Use YYYY-MM-DD")
+
+
+def parse_report_spec(args: Dict[str, Any], default_limit: int = DEFAULT_LIMIT) -> ReportSpec:
+    """
+    Validate request args (from, to, granularity, limit) into a ReportSpec.
+    """
+    date_from, date_to = args.get('from'), args.get('to')
+    start = _parse_day(date_from, 'from') if date_from else None
+    end = _parse_day(date_to, 'to') + timedelta(days=1) if date_to else None
+    if start and end:
+        if start >= end:
+            raise ReportSpecError("'from' must not be after 'to'")
+        if (end - start).days > MAX_RANGE_DAYS:
+            raise ReportSpecError(f"Date range is limited to {MAX_RANGE_DAYS} days")
+
+    granularity = args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise ReportSpecError(f"Invalid granularity '{granularity}'. Use {', '.join(GRANULARITIES)}")
+
+    try:
+        limit = int(args.get('limit', default_limit))
+    except (TypeError, ValueError):
+        raise ReportSpecError("'limit' must be an integer")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ReportSpecError(f"'limit' must be between 1 and {MAX_LIMIT}")
+
+    return ReportSpec(start, end, granularity, limit)
+
+
+def _shift_year(moment: datetime, years: int) -> datetime:
+    try:
+        return moment.replace(year=moment.year + years)
+    except ValueError:
+        # 29 February
+        return moment.replace(year=moment.year + years, day=28)
+
+
+def comparison_spec(spec: ReportSpec, mode: str) -> ReportSpec:
+    """
+    The range to compare a spec against: the same dates a year earlier
+    ('previous_year') or the equally long range just before it ('previous_period').
+    """
+    if mode not in COMPARE_MODES:
+        raise ReportSpecError(f"Invalid compare '{mode}'. Use {', '.join(COMPARE_MODES)}")
+    if spec.start is None or spec.end is None:
+        raise ReportSpecError("'compare' needs both 'from' and 'to'")
+    if mode == 'previous_year':
+        return spec._replace(start=_shift_year(spec.start, -1), end=_shift_year(spec.end, -1))
+    length = spec.end - spec.start
+    return spec._replace(start=spec.start - length, end=spec.start)
+
+
+class ReportCache:
+    """
+    Thread-safe report result cache keyed by (report name, spec).
+    """
+
+    def __init__(self, max_entries: int = 256, open_ttl_seconds: float = 60):
+        self.max_entries = max_entries
+        self.open_ttl_seconds = open_ttl_seconds
+        # key -> (expires_at or None for closed ranges, result)
+        self._entries: 'OrderedDict[Tuple[str, ReportSpec], Tuple[Optional[float], Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, name: str, spec: ReportSpec, compute: Callable[[], Any]) -> Any:
+        key = (name, spec)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        result = compute()
+        expires_at = None if spec.is_closed() else now + self.open_ttl_seconds
+
+        with self._lock:
+            self._entries[key] = (expires_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def invalidate_open(self) -> None:
+        """Drop every entry whose range can still change."""
+        with self._lock:
+            for key in [k for k, (expires_at, _) in self._entries.items() if expires_at is not None]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def on_event(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Order broker listener: new orders only ever land in open ranges."""
+        if event_type == 'order_created':
+            self.invalidate_open()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            closed = sum(1 for expires_at, _ in self._entries.values() if expires_at is None)
+            return {
+                'entries': len(self._entries),
+                'closed_entries': closed,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+report_cache = ReportCache()
+
+
+def init_report_cache(broker) -> None:
+    """Drop cached open-range reports as orders are committed."""
+    broker.add_listener(report_cache.on_event)
+
+
+# nothing is cached before the first report imports this module, so invalidation can start here
+init_report_cache(broker)
+init_report_cache_metrics(report_cache)
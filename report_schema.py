@@ -0,0 +1,122 @@
+"""
+Report Schema Module
+What the reporting stack needs in place before its modules are first
+imported, kept apart from them so `import app` stays light:
+
+- REPORT_INDEXES: created on existing databases at startup
+- dim_customer tables and the dim_customer_dirty queue triggers (see
+  dimensions.py), on new databases through create_all and on existing
+  ones at startup
+- the session hook that re-syncs the dim_customer rows of customers an
+  ORM commit touched; dimensions.py is only imported on the first such
+  flush
+- GRANULARITIES for the timeseries report, shared with report_cache's
+  parameter checks
+
+staff_reports, dimensions and report_cache themselves are imported by
+the staff views (blueprints.py) on first use.
+"""
+
+from extensions import db
+from models import Customer, Order, DimCustomer, DimCustomerDirty, EtlWatermark
+from sqlalchemy import text, event, inspect, DDL
+from typing import List
+
+# strftime patterns for the timeseries report
+GRANULARITIES = {
+    'day': '%Y-%m-%d',
+    'week': '%Y-W%W',
+    'month': '%Y-%m'
+}
+
+# the model declares these too, but create_all never adds indexes to existing tables
+REPORT_INDEXES = {
+    'ix_orders_order_date': 'orders (order_date)',
+    'ix_orders_customer_id': 'orders (customer_id)',
+    'ix_order_items_order_id': 'order_items (order_id)'
+}
+
+
+def _queue(customer_id: str) -> str:
+    # not INSERT OR IGNORE: an outer UPSERT's conflict policy would override it
+    return (f"INSERT INTO dim_customer_dirty (customer_id) SELECT {customer_id} "
+            f"WHERE NOT EXISTS (SELECT 1 FROM dim_customer_dirty WHERE customer_id = {customer_id});")
+
+
+DIRTY_TRIGGERS = {
+    'dim_dirty_customer_insert': f"AFTER INSERT ON customers BEGIN {_queue('NEW.id')} END",
+    'dim_dirty_customer_update': f"AFTER UPDATE OF birthday, address ON customers BEGIN {_queue('NEW.id')} END",
+    'dim_dirty_customer_delete': f"AFTER DELETE ON customers BEGIN {_queue('OLD.id')} END",
+    'dim_dirty_order_insert': f"AFTER INSERT ON orders BEGIN {_queue('NEW.customer_id')} END",
+    'dim_dirty_order_update': (f"AFTER UPDATE OF customer_id, order_date ON orders "
+                               f"BEGIN {_queue('OLD.customer_id')} {_queue('NEW.customer_id')} END"),
+    'dim_dirty_order_delete': f"AFTER DELETE ON orders BEGIN {_queue('OLD.customer_id')} END",
+}
+
+# new databases get the triggers from create_all, existing ones from init_report_schema()
+for _name, _body in DIRTY_TRIGGERS.items():
+    event.listen(Order.__table__ if '_order_' in _name else Customer.__table__, 'after_create',
+                 DDL(f"CREATE TRIGGER IF NOT EXISTS {_name} {_body}"))
+
+
+def ensure_report_indexes() -> None:
+    """Create the report indexes on databases that predate them (a no-op once done)."""
+    tables = {row[0] for row in db.session.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+    for name, target in REPORT_INDEXES.items():
+        if target.split()[0] not in tables:
+            continue  # create_all builds new tables with their indexes
+        db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+    db.session.commit()
+
+
+def create_dimension_tables() -> None:
+    """Create the analytics tables and dirty-queue triggers on databases built before they existed."""
+    for table in (DimCustomer.__table__, DimCustomerDirty.__table__, EtlWatermark.__table__):
+        table.create(db.engine, checkfirst=True)
+    _install_triggers(db.session)
+    db.session.commit()
+
+
+def _install_triggers(session) -> None:
+    existing = {row[0] for row in session.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))}
+    missing = [name for name in DIRTY_TRIGGERS if name not in existing]
+    for name in missing:
+        session.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {DIRTY_TRIGGERS[name]}"))
+    if len(missing) == len(DIRTY_TRIGGERS):
+        # first install: changes made before the triggers existed were never tracked
+        session.execute(text("INSERT OR IGNORE INTO dim_customer_dirty (customer_id) SELECT id FROM customers"))
+
+
+def _customers_touched(session) -> List[int]:
+    ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Customer) and obj.id is not None:
+            ids.add(obj.id)
+        elif isinstance(obj, Order) and obj.customer_id is not None:
+            if obj in session.dirty:
+                state = inspect(obj)
+                if not (state.attrs.customer_id.history.has_changes()
+                        or state.attrs.order_date.history.has_changes()):
+                    continue
+                ids.update(old for old in state.attrs.customer_id.history.deleted if old is not None)
+            ids.add(obj.customer_id)
+    return sorted(ids)
+
+
+def _after_flush(session, flush_context):
+    """Re-sync the customers this flush changed, inside the same transaction."""
+    ids = _customers_touched(session)
+    if ids:
+        from dimensions import sync_dim_customers
+        sync_dim_customers(ids, session.connection())
+
+
+def init_report_schema(app) -> None:
+    """Bring an existing database up to the report schema and attach the dim_customer sync hook."""
+    with app.app_context():
+        ensure_report_indexes()
+        if db.session.execute(text("SELECT name FROM sqlite_master WHERE name = 'customers'")).first():
+            create_dimension_tables()
+        db.session.remove()
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
@@ -0,0 +1,365 @@
+"""
+Production Server
+Runs the app in supervised worker processes with debug mode off.
+
+- Uses gunicorn (gthread workers) when it is installed, otherwise a
+  built-in pre-fork server: the parent binds the socket and forks the
+  workers, each serving it with a pool of request threads
+- --threads bounds the requests a worker handles at once (default 8),
+  open /staff/events streams included; further connections wait in the
+  listen backlog
+- Database connections are opened after fork (the engine pool is
+  disposed in every worker), never shared across processes
+- Each worker warms up (first queries, templates, top sellers) before
+  it starts accepting connections, unless --no-warm-up
+- Workers are recycled after --max-requests (+ jitter) requests
+- SIGTERM/SIGINT: workers close the live event streams, stop accepting,
+  finish in-flight requests for up to --graceful-timeout seconds, then exit
+
+With more than one worker, the state that lives in each worker is kept
+in step across them:
+- order and catalog events go through the event_log table (an
+  EventRelay per worker, see events.py), so the live dashboards
+  (/staff/events), top sellers, report cache and catalog cache of every
+  worker see every commit, within a poll interval (0.25 s)
+- the admission in-flight limits are shared through lock files in a
+  temporary directory (admission.share_admission_limits); each worker
+  keeps its own wait queue
+
+Usage:
+    python serve.py --bind 0.0.0.0:8000 --workers 4 --threads 8
+    python serve.py --engine builtin --max-requests 5000
+"""
+
+import argparse
+import logging
+import os
+import random
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('serve')
+
+
+def share_worker_state(app) -> str:
+    """Before fork: prepare the event log and the shared admission slots. Returns the lock directory."""
+    from admission import share_admission_limits
+    from events import init_event_relay
+
+    init_event_relay(app)
+    lock_dir = tempfile.mkdtemp(prefix='kopernik-admission-')
+    share_admission_limits(lock_dir)
+    return lock_dir
+
+
+def init_worker(app, args) -> None:
+    """Run in every worker after fork, before it serves."""
+    from extensions import db
+    from events import start_event_relay
+
+    with app.app_context():
+        # connections are per-process: drop the pool inherited from the parent
+        # (create_app ran migrations through it) without closing its sockets
+        db.engine.dispose(close=False)
+    if args.workers > 1:
+        # before warm-up: top sellers' warm start must not miss orders committed meanwhile
+        start_event_relay(app)
+    if args.warm_up:
+        warm_up(app)
+
+
+def exit_worker() -> None:
+    """Run in every worker once it has stopped serving."""
+    from events import stop_event_relay
+
+    # the events of its last requests still reach the other workers
+    stop_event_relay()
+
+
+def warm_up(app) -> None:
+    """Prime per-process caches so the first real requests don't pay for them."""
+    from app import warm_up as warm_up_app
+
+    started = time.perf_counter()
+    try:
+        warm_up_app(app)
+    except Exception as e:
+        logger.warning(f"Worker {os.getpid()} warm-up skipped a step: {e}")
+    logger.info(f"Worker {os.getpid()} warmed up in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+def _parse_bind(bind: str):
+    host, _, port = bind.rpartition(':')
+    return host or '0.0.0.0', int(port)
+
+
+# -- gunicorn -------------------------------------------------------------
+
+def run_gunicorn(app, args) -> None:
+    from gunicorn.app.base import BaseApplication
+    from events import broker
+
+    def post_worker_init(worker):
+        init_worker(app, args)
+        handle_exit = signal.getsignal(signal.SIGTERM)
+
+        def close_streams_then_exit(signum, frame):
+            broker.close()
+            handle_exit(signum, frame)
+
+        signal.signal(signal.SIGTERM, close_streams_then_exit)
+
+    def worker_exit(server, worker):
+        exit_worker()
+
+    def post_request(worker, req, environ, resp):
+        # recycling: the worker is about to stop, so end the event streams it would wait for
+        if worker.max_requests and worker.nr >= worker.max_requests:
+            broker.close()
+
+    class Server(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': args.bind,
+                'workers': args.workers,
+                'threads': args.threads,
+                'worker_class': 'gthread',
+                'max_requests': args.max_requests,
+                'max_requests_jitter': args.max_requests_jitter,
+                'graceful_timeout': args.graceful_timeout,
+                'timeout': args.timeout,
+                'preload_app': True,
+                'post_worker_init': post_worker_init,
+                'worker_exit': worker_exit,
+                'post_request': post_request,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    Server().run()
+
+
+# -- built-in pre-fork server ---------------------------------------------
+
+class RecyclingMiddleware:
+    """Counts requests and asks the worker to stop after `limit` of them."""
+
+    def __init__(self, wsgi_app, limit: int, on_limit):
+        self.wsgi_app = wsgi_app
+        self.limit = limit
+        self.on_limit = on_limit
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.count += 1
+            reached = self.limit and self.count == self.limit
+        if reached:
+            self.on_limit()
+        return self.wsgi_app(environ, start_response)
+
+
+def pooled_wsgi_server(host: str, port: int, wsgi_app, threads: int, fd: int = None):
+    """A werkzeug WSGI server that runs requests on a pool of `threads` threads."""
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class RequestHandler(WSGIRequestHandler):
+        # one response per connection: an idle keep-alive connection would hold a pool thread
+        protocol_version = 'HTTP/1.0'
+
+    class PooledWSGIServer(BaseWSGIServer):
+        multithread = True
+
+        def __init__(self):
+            super().__init__(host, port, wsgi_app, handler=RequestHandler, fd=fd)
+            # every worker accepts on this socket: the ones that lose a connection to another
+            # must get EAGAIN from accept(), not block in it
+            self.socket.setblocking(False)
+            self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+            self.free_threads = threading.Semaphore(threads)
+
+        def get_request(self):
+            # take a thread before accepting: while all are busy, connections wait in the
+            # listen backlog, where another worker can pick them up
+            self.free_threads.acquire()
+            try:
+                request, client_address = super().get_request()
+            except BaseException:
+                self.free_threads.release()
+                raise
+            request.setblocking(True)
+            return request, client_address
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._process_request, request, client_address)
+
+        def _process_request(self, request, client_address):
+            # as socketserver.ThreadingMixIn.process_request_thread
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                self.free_threads.release()
+
+        def server_close(self):
+            # requests in flight finish first (BaseWSGIServer.__init__ also calls this, before the pool exists)
+            if hasattr(self, 'pool'):
+                self.pool.shutdown(wait=True)
+            super().server_close()
+
+    return PooledWSGIServer()
+
+
+def _worker(app, listener: socket.socket, args) -> None:
+    """Child process: serve on the inherited socket until told to stop."""
+    from events import broker
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, signal.SIG_DFL)
+    init_worker(app, args)
+
+    limit = args.max_requests + random.randint(0, args.max_requests_jitter) if args.max_requests else 0
+    server = None
+
+    def stop(*_):
+        # open SSE streams would never finish, and server_close() joins every request thread
+        broker.close()
+        # shutdown() waits for serve_forever to return, so never call it on the serving thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    wsgi = RecyclingMiddleware(app.wsgi_app, limit, stop)
+    host, port = listener.getsockname()[:2]
+    server = pooled_wsgi_server(host, port, wsgi, args.threads, fd=listener.fileno())
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    server.serve_forever()
+    server.server_close()
+    exit_worker()
+
+
+def run_builtin(app, args) -> None:
+    host, port = _parse_bind(args.bind)
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(1024)
+    listener.set_inheritable(True)
+
+    workers = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                _worker(app, listener, args)
+                code = 0
+            except Exception:
+                logger.exception(f"Worker {os.getpid()} crashed")
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        workers[pid] = time.time()
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print(f"🍕 Serving on http://{host}:{port} with {args.workers} worker(s) x {args.threads} threads (builtin)")
+    for _ in range(args.workers):
+        spawn()
+
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid:
+            workers.pop(pid, None)
+            if not stopping:
+                logger.info(f"Worker {pid} exited ({status}), starting a replacement")
+                spawn()
+        else:
+            time.sleep(0.2)
+
+    print("🛑 Shutting down workers...")
+    for pid in workers:
+        os.kill(pid, signal.SIGTERM)
+    deadline = time.time() + args.graceful_timeout
+    while workers and time.time() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            workers.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    for pid in workers:
+        os.kill(pid, signal.SIGKILL)
+    listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default=os.environ.get('KOPERNIK_BIND', '0.0.0.0:8000'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('KOPERNIK_WORKERS', 1)),
+                        help='worker processes')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('KOPERNIK_THREADS', 8)),
+                        help='request threads per worker')
+    parser.add_argument('--max-requests', type=int, default=5000, help='recycle a worker after this many requests')
+    parser.add_argument('--max-requests-jitter', type=int, default=500)
+    parser.add_argument('--graceful-timeout', type=int, default=30)
+    parser.add_argument('--timeout', type=int, default=60, help='gunicorn worker timeout')
+    parser.add_argument('--engine', choices=['auto', 'gunicorn', 'builtin'], default='auto')
+    parser.add_argument('--no-warm-up', dest='warm_up', action='store_false')
+    args = parser.parse_args()
+    if args.workers < 1 or args.threads < 1:
+        parser.error("--workers and --threads must be at least 1")
+
+    engine = args.engine
+    if engine == 'auto':
+        try:
+            import gunicorn  # noqa: F401
+            engine = 'gunicorn'
+        except ImportError:
+            engine = 'builtin'
+
+    from app import create_app
+    # warm-up runs per worker, after fork
+    app = create_app(warm=False)
+    app.debug = False
+    # one access log line per request is console I/O on every request thread
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    app.config['DEBUG'] = False
+
+    lock_dir = share_worker_state(app) if args.workers > 1 else None
+    parent = os.getpid()
+    try:
+        if engine == 'gunicorn':
+            run_gunicorn(app, args)
+        else:
+            run_builtin(app, args)
+    finally:
+        # gunicorn workers leave through sys.exit too: only the parent removes the directory
+        if lock_dir and os.getpid() == parent:
+            shutil.rmtree(lock_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
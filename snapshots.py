@@ -0,0 +1,136 @@
+"""
+Snapshot Reads Module
+Runs independent reports at the same time, each on its own read
+connection, all reading the same database snapshot.
+
+- The SQLite database runs in WAL mode, so open read transactions
+  neither block order commits nor see them
+- run_reports() briefly takes the write lock (BEGIN IMMEDIATE), starts a
+  read transaction on one connection per report, and releases the lock:
+  no commit can land in between, so every report sees the same data
+- Each report then runs on a thread pool with db.session bound to its
+  connection; page latency is roughly that of the slowest report
+
+In-memory databases (tests) and PARALLEL_REPORTS = False run the
+reports one after another on the request's session.
+"""
+
+from flask import current_app
+from extensions import db
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional
+import contextvars
+import os
+import threading
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _set_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+def _is_sqlite_file(engine) -> bool:
+    return engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:')
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report')
+        return _executor
+
+
+def _reset_executor_in_child() -> None:
+    # pool threads do not survive fork(); the next call starts a new pool
+    global _executor, _executor_lock
+    _executor, _executor_lock = None, threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_executor_in_child)
+
+
+def open_snapshot_connections(engine, count: int) -> list:
+    """
+    `count` connections with read transactions started on the same
+    snapshot. The caller must roll back and close them.
+    """
+    connections = []
+    with engine.connect() as guard:
+        # holds off writers (they wait on busy_timeout) while the snapshots are taken
+        guard.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            for _ in range(count):
+                conn = engine.connect()
+                connections.append(conn)
+                conn.exec_driver_sql("BEGIN")
+                # the first read fixes the snapshot for the rest of the transaction
+                conn.execute(text("SELECT COUNT(*) FROM sqlite_master")).scalar()
+        except Exception:
+            for conn in connections:
+                conn.close()
+            raise
+        finally:
+            guard.exec_driver_sql("ROLLBACK")
+    return connections
+
+
+def _run_on(app, conn, report: Callable[[], Any]) -> Any:
+    with app.app_context():
+        session = Session(bind=conn)
+        db.session.registry.set(session)
+        try:
+            return report()
+        finally:
+            session.close()
+            db.session.registry.clear()
+            conn.rollback()
+            conn.close()
+
+
+def run_reports(reports: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+    """
+    Run report callables (name -> fn) concurrently on one consistent
+    snapshot; returns name -> result. The first report error is raised
+    after all reports have finished.
+    """
+    app = current_app._get_current_object()
+    engine = db.engine
+    if not app.config['PARALLEL_REPORTS'] or len(reports) < 2 or not _is_sqlite_file(engine):
+        return {name: report() for name, report in reports.items()}
+
+    executor = _get_executor(app.config['REPORT_WORKERS'])
+    connections = open_snapshot_connections(engine, len(reports))
+    futures = {
+        # a copy of the caller's context per report keeps tracing spans nested under the request
+        name: executor.submit(contextvars.copy_context().run, _run_on, app, conn, report)
+        for (name, report), conn in zip(reports.items(), connections)
+    }
+    results, error = {}, None
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+    return results
+
+
+def init_snapshots(app) -> None:
+    """Put file SQLite databases in WAL mode and configure the report pool."""
+    app.config.setdefault('SQLITE_WAL', True)
+    app.config.setdefault('PARALLEL_REPORTS', True)
+    app.config.setdefault('REPORT_WORKERS', 4)
+    if not app.config['SQLITE_WAL']:
+        return
+    with app.app_context():
+        engine = db.engine
+        if _is_sqlite_file(engine) and not event.contains(engine, 'connect', _set_wal):
+            event.listen(engine, 'connect', _set_wal)
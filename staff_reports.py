@@ -7,18 +7,38 @@ Provides reporting functionality for restaurant staff including:
 """
 
 from extensions import db
-from models import Order, OrderItem, Pizza, Customer, DeliveryPerson
+from models import Order, OrderItem, Pizza, Customer, DeliveryPerson, ORDER_STATUSES
 from sqlalchemy import text, func
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from tracing import traced
+from order_lifecycle import active_status_sql
+from dimensions import dim_join_sql, queued_demographics
+from report_schema import GRANULARITIES
 
+# orders of customers with a current dim_customer row (alias d); _queued_orders() adds the rest
+DIM_JOIN = dim_join_sql('o.customer_id')
 
+def _date_range(start: Optional[datetime], end: Optional[datetime],
+                column: str = 'o.order_date') -> Tuple[str, Dict[str, Any]]:
+    """SQL conditions (to append after a WHERE) for an optional [start, end) range."""
+    sql, params = "", {}
+    if start is not None:
+        sql += f" AND {column} >= :start"
+        params['start'] = start
+    if end is not None:
+        sql += f" AND {column} < :end"
+        params['end'] = end
+    return sql, params
+
+
+@traced('report.undelivered_orders', 'report')
 def get_undelivered_orders() -> List[Dict[str, Any]]:
     """
-    Get all orders that haven't been delivered yet.
+    Get all orders that haven't been delivered or cancelled yet.
     Returns list of orders with customer and delivery person info.
     """
-    sql = text("""
+    sql = text(f"""
         SELECT 
             o.id as order_id,
             o.order_date,
@@ -32,7 +52,7 @@ def get_undelivered_orders() -> List[Dict[str, Any]]:
         FROM orders o
         JOIN customers c ON c.id = o.customer_id
         LEFT JOIN delivery_persons dp ON dp.id = o.delivery_person_id
-        WHERE o.status IN ('pending', 'confirmed', 'preparing')
+        WHERE {active_status_sql('o.status')}
         ORDER BY o.order_date ASC
     """)
     
@@ -44,7 +64,7 @@ def get_undelivered_orders() -> List[Dict[str, Any]]:
             'order_id': row[0],
             'order_date': row[1],
             'total': row[2],
-            'status': row[3],
+            'status': ORDER_STATUSES[row[3]],
             'customer_name': row[4],
             'customer_phone': row[5],
             'customer_address': row[6],
@@ -55,14 +75,18 @@ def get_undelivered_orders() -> List[Dict[str, Any]]:
     return orders
 
 
-def get_top_pizzas_past_month(limit: int = 3) -> List[Dict[str, Any]]:
+@traced('report.top_pizzas_past_month', 'report')
+def get_top_pizzas_past_month(limit: int = 3, start: Optional[datetime] = None,
+                              end: Optional[datetime] = None) -> List[Dict[str, Any]]:
     """
-    Get top N pizzas sold in the past month.
+    Get top N pizzas sold in the past month, or in [start, end) when given.
     Returns pizza names with total quantities sold.
     """
-    one_month_ago = datetime.utcnow() - timedelta(days=30)
+    if start is None and end is None:
+        start = datetime.utcnow() - timedelta(days=30)
+    date_sql, params = _date_range(start, end)
     
-    sql = text("""
+    sql = text(f"""
         SELECT 
             p.name as pizza_name,
             SUM(oi.quantity) as total_sold,
@@ -71,16 +95,13 @@ def get_top_pizzas_past_month(limit: int = 3) -> List[Dict[str, Any]]:
         FROM order_items oi
         JOIN orders o ON o.id = oi.order_id
         JOIN pizzas p ON p.id = oi.pizza_id
-        WHERE o.order_date >= :month_ago
+        WHERE 1 = 1{date_sql}
         GROUP BY p.id, p.name
         ORDER BY total_sold DESC
         LIMIT :limit
     """)
     
-    result = db.session.execute(sql, {
-        'month_ago': one_month_ago,
-        'limit': limit
-    }).fetchall()
+    result = db.session.execute(sql, {**params, 'limit': limit}).fetchall()
     
     pizzas = []
     for row in result:
@@ -94,145 +115,180 @@ def get_top_pizzas_past_month(limit: int = 3) -> List[Dict[str, Any]]:
     return pizzas
 
 
-def get_earnings_by_gender() -> List[Dict[str, Any]]:
-    """
-    Get earnings breakdown by customer gender.
-    Note: This is a mock implementation as we don't have gender field.
-    In real implementation, you'd add a gender field to Customer model.
-    """
-    # Mock data for demonstration - in real app, add gender field to Customer
-    sql = text("""
+def _queued_orders(start: Optional[datetime], end: Optional[datetime]) -> List[Tuple[int, Dict[str, str], float]]:
+    """(customer_id, demographics, total) for orders of customers still queued for dim_customer."""
+    date_sql, params = _date_range(start, end)
+    rows = db.session.execute(text(f"""
+        SELECT o.customer_id, o.total
+        FROM dim_customer_dirty q
+        JOIN orders o ON o.customer_id = q.customer_id
+        WHERE o.total IS NOT NULL{date_sql}
+    """), params).fetchall()
+    if not rows:
+        return []
+    dims = queued_demographics()
+    return [(customer_id, dims[customer_id], total) for customer_id, total in rows if customer_id in dims]
+
+
+def _add_order(groups: Dict[str, Dict[str, Any]], name: str, customer_id: int, total: float) -> None:
+    acc = groups.get(name)
+    if acc is None:
+        acc = groups[name] = {'orders': 0, 'earnings': 0.0, 'customers': set()}
+    acc['orders'] += 1
+    acc['earnings'] += total
+    acc['customers'].add(customer_id)
+
+
+def _earnings_by(column: str, key: str, start: Optional[datetime], end: Optional[datetime],
+                 limit: Optional[int] = None, with_customers: bool = True) -> List[Dict[str, Any]]:
+    """One breakdown grouped on a dim_customer column, plus the queued customers' orders."""
+    date_sql, params = _date_range(start, end)
+    queued = _queued_orders(start, end)
+    sql = text(f"""
         SELECT 
-            CASE 
-                WHEN c.id % 2 = 0 THEN 'Female'
-                ELSE 'Male' 
-            END as gender,
-            COUNT(DISTINCT o.id) as total_orders,
+            d.{column},
+            COUNT(o.id) as total_orders,
             SUM(o.total) as total_earnings,
-            AVG(o.total) as avg_order_value
+            COUNT(DISTINCT o.customer_id) as unique_customers
         FROM orders o
-        JOIN customers c ON c.id = o.customer_id
-        WHERE o.total IS NOT NULL
-        GROUP BY (c.id % 2)
+        {DIM_JOIN}
+        WHERE o.total IS NOT NULL{date_sql}
+        GROUP BY d.{column}
         ORDER BY total_earnings DESC
+        {f'LIMIT {int(limit)}' if limit and not queued else ''}
     """)
-    
-    result = db.session.execute(sql).fetchall()
-    
-    earnings = []
-    for row in result:
-        earnings.append({
-            'gender': row[0],
-            'total_orders': row[1],
-            'total_earnings': float(row[2]) if row[2] else 0,
-            'avg_order_value': float(row[3]) if row[3] else 0
-        })
-    
-    return earnings
+
+    # queued customers never have a current dim row, so their customer counts simply add up
+    groups: Dict[str, Dict[str, Any]] = {}
+    for name, orders, earnings, customers in db.session.execute(sql, params):
+        groups[name] = {'orders': orders, 'earnings': earnings or 0.0, 'customers': set(), 'synced_customers': customers}
+    for customer_id, dims, total in queued:
+        _add_order(groups, dims[column], customer_id, total)
+    rows = _finish_breakdown(groups, key, with_customers)
+    return rows[:limit] if limit else rows
 
 
-def get_earnings_by_age_group() -> List[Dict[str, Any]]:
+@traced('report.earnings_by_gender', 'report')
+def get_earnings_by_gender(start: Optional[datetime] = None,
+                           end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Get earnings breakdown by customer gender.
+    Note: This is a mock implementation as we don't have gender field.
+    In real implementation, you'd add a gender field to Customer model.
+    Reads dim_customer (see dimensions.py), which holds the mock gender.
+    """
+    return _earnings_by('gender', 'gender', start, end, with_customers=False)
+
+
+@traced('report.earnings_by_age_group', 'report')
+def get_earnings_by_age_group(start: Optional[datetime] = None,
+                              end: Optional[datetime] = None) -> List[Dict[str, Any]]:
     """
     Get earnings breakdown by customer age groups.
-    Uses birthday field to calculate age ranges.
+    Uses the precomputed age band in dim_customer.
     """
-    sql = text("""
-        SELECT 
-            CASE 
-                WHEN c.birthday IS NULL THEN 'Unknown'
-                WHEN DATE('now') - c.birthday < 25 THEN '18-25'
-                WHEN DATE('now') - c.birthday < 35 THEN '26-35'
-                WHEN DATE('now') - c.birthday < 45 THEN '36-45'
-                WHEN DATE('now') - c.birthday < 55 THEN '46-55'
-                ELSE '55+'
-            END as age_group,
-            COUNT(DISTINCT o.id) as total_orders,
-            SUM(o.total) as total_earnings,
-            AVG(o.total) as avg_order_value,
-            COUNT(DISTINCT c.id) as unique_customers
-        FROM orders o
-        JOIN customers c ON c.id = o.customer_id
-        WHERE o.total IS NOT NULL
-        GROUP BY age_group
-        ORDER BY total_earnings DESC
-    """)
-    
-    result = db.session.execute(sql).fetchall()
-    
-    earnings = []
-    for row in result:
-        earnings.append({
-            'age_group': row[0],
-            'total_orders': row[1],
-            'total_earnings': float(row[2]) if row[2] else 0,
-            'avg_order_value': float(row[3]) if row[3] else 0,
-            'unique_customers': row[4]
-        })
-    
-    return earnings
+    return _earnings_by('age_band', 'age_group', start, end)
 
 
-def get_earnings_by_postal_code() -> List[Dict[str, Any]]:
+@traced('report.earnings_by_postal_code', 'report')
+def get_earnings_by_postal_code(start: Optional[datetime] = None,
+                                end: Optional[datetime] = None) -> List[Dict[str, Any]]:
     """
-    Get earnings breakdown by customer postal codes.
-    Extracts postal code from customer address.
+    Get earnings breakdown by customer postal codes (top 10).
+    Uses the postcode extracted into dim_customer.
     """
-    sql = text("""
-        SELECT 
-            SUBSTR(c.address, -5) as postal_code,
-            COUNT(DISTINCT o.id) as total_orders,
-            SUM(o.total) as total_earnings,
-            AVG(o.total) as avg_order_value,
-            COUNT(DISTINCT c.id) as unique_customers
+    return _earnings_by('postcode', 'postal_code', start, end, limit=10)
+
+
+def _finish_breakdown(groups: Dict[str, Dict[str, Any]], key: str,
+                      with_customers: bool = True) -> List[Dict[str, Any]]:
+    rows = []
+    for name, acc in groups.items():
+        row = {
+            key: name,
+            'total_orders': acc['orders'],
+            'total_earnings': float(acc['earnings']),
+            'avg_order_value': float(acc['earnings'] / acc['orders']) if acc['orders'] else 0
+        }
+        if with_customers:
+            row['unique_customers'] = len(acc['customers']) + acc.get('synced_customers', 0)
+        rows.append(row)
+    rows.sort(key=lambda r: r['total_earnings'], reverse=True)
+    return rows
+
+
+@traced('report.earnings_breakdowns', 'report')
+def get_earnings_breakdowns(postal_code_limit: int = 10, start: Optional[datetime] = None,
+                            end: Optional[datetime] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Get the gender, age group and postal code earnings breakdowns together.
+    Streams the narrow orders x dim_customer join once (plus the orders of
+    customers still queued for dim_customer) and aggregates every breakdown
+    in the same pass; result shapes match the individual reports.
+    """
+    date_sql, params = _date_range(start, end)
+    sql = text(f"""
+        SELECT o.customer_id, d.gender, d.age_band, d.postcode, o.total
         FROM orders o
-        JOIN customers c ON c.id = o.customer_id
-        WHERE o.total IS NOT NULL
-        GROUP BY postal_code
-        HAVING total_orders >= 1
-        ORDER BY total_earnings DESC
-        LIMIT 10
+        {DIM_JOIN}
+        WHERE o.total IS NOT NULL{date_sql}
     """)
-    
-    result = db.session.execute(sql).fetchall()
-    
-    earnings = []
-    for row in result:
-        earnings.append({
-            'postal_code': row[0],
-            'total_orders': row[1],
-            'total_earnings': float(row[2]) if row[2] else 0,
-            'avg_order_value': float(row[3]) if row[3] else 0,
-            'unique_customers': row[4]
-        })
-    
-    return earnings
+
+    by_gender: Dict[str, Dict[str, Any]] = {}
+    by_age: Dict[str, Dict[str, Any]] = {}
+    by_postal: Dict[str, Dict[str, Any]] = {}
+
+    result = db.session.execute(sql, params).yield_per(1000)
+    for customer_id, gender, age_band, postcode, total in result:
+        _add_order(by_gender, gender, customer_id, total)
+        _add_order(by_age, age_band, customer_id, total)
+        _add_order(by_postal, postcode, customer_id, total)
+    for customer_id, dims, total in _queued_orders(start, end):
+        _add_order(by_gender, dims['gender'], customer_id, total)
+        _add_order(by_age, dims['age_band'], customer_id, total)
+        _add_order(by_postal, dims['postcode'], customer_id, total)
+
+    return {
+        'by_gender': _finish_breakdown(by_gender, 'gender', with_customers=False),
+        'by_age_group': _finish_breakdown(by_age, 'age_group'),
+        'by_postal_code': _finish_breakdown(by_postal, 'postal_code')[:postal_code_limit]
+    }
 
 
-def get_monthly_summary() -> Dict[str, Any]:
+@traced('report.monthly_summary', 'report')
+def get_monthly_summary(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, Any]:
     """
-    Get comprehensive monthly summary for management.
+    Get comprehensive monthly summary for management (past 30 days,
+    or [start, end) when given).
+    One pass over this period's orders: each order's pizza count comes from
+    its own lines (order_items.order_id index), so an order's total is
+    never counted once per line item.
     """
-    one_month_ago = datetime.utcnow() - timedelta(days=30)
+    if start is None and end is None:
+        start = datetime.utcnow() - timedelta(days=30)
+        period = 'Past 30 days'
+    else:
+        period = _period_label(start, end)
+    orders_sql, params = _date_range(start, end)
     
-    # Total orders and revenue this month
-    sql = text("""
+    # Total orders and revenue this month, pizzas sold from pizza lines only
+    sql = text(f"""
         SELECT 
-            COUNT(DISTINCT o.id) as total_orders,
+            COUNT(*) as total_orders,
             SUM(o.total) as total_revenue,
             AVG(o.total) as avg_order_value,
             COUNT(DISTINCT o.customer_id) as unique_customers,
-            SUM(oi.quantity) as total_pizzas_sold
+            SUM((SELECT SUM(oi.quantity) FROM order_items oi
+                 WHERE oi.order_id = o.id AND oi.item_type = 'pizza')) as total_pizzas_sold
         FROM orders o
-        JOIN order_items oi ON oi.order_id = o.id
-        WHERE o.order_date >= :month_ago
-          AND o.total IS NOT NULL
+        WHERE o.total IS NOT NULL{orders_sql}
     """)
     
-    result = db.session.execute(sql, {'month_ago': one_month_ago}).fetchone()
+    result = db.session.execute(sql, params).fetchone()
     
     if result:
         return {
-            'period': 'Past 30 days',
+            'period': period,
             'total_orders': result[0] or 0,
             'total_revenue': float(result[1]) if result[1] else 0,
             'avg_order_value': float(result[2]) if result[2] else 0,
@@ -241,7 +297,7 @@ def get_monthly_summary() -> Dict[str, Any]:
         }
     
     return {
-        'period': 'Past 30 days',
+        'period': period,
         'total_orders': 0,
         'total_revenue': 0,
         'avg_order_value': 0,
@@ -250,6 +306,52 @@ def get_monthly_summary() -> Dict[str, Any]:
     }
 
 
+def _period_label(start: Optional[datetime], end: Optional[datetime]) -> str:
+    if start and end:
+        return f"{start:%Y-%m-%d} to {(end - timedelta(seconds=1)):%Y-%m-%d}"
+    if start:
+        return f"Since {start:%Y-%m-%d}"
+    return f"Until {(end - timedelta(seconds=1)):%Y-%m-%d}"
+
+
+@traced('report.earnings_timeseries', 'report')
+def get_earnings_timeseries(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            granularity: str = 'day') -> List[Dict[str, Any]]:
+    """
+    Get orders and revenue per day, week or month in [start, end).
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Invalid granularity: {granularity}")
+    date_sql, params = _date_range(start, end)
+
+    sql = text(f"""
+        SELECT 
+            strftime('{GRANULARITIES[granularity]}', o.order_date) as period,
+            COUNT(*) as total_orders,
+            SUM(o.total) as total_revenue,
+            AVG(o.total) as avg_order_value,
+            COUNT(DISTINCT o.customer_id) as unique_customers
+        FROM orders o
+        WHERE o.total IS NOT NULL{date_sql}
+        GROUP BY period
+        ORDER BY period
+    """)
+
+    result = db.session.execute(sql, params).fetchall()
+
+    series = []
+    for row in result:
+        series.append({
+            'period': row[0],
+            'total_orders': row[1],
+            'total_revenue': float(row[2]) if row[2] else 0,
+            'avg_order_value': float(row[3]) if row[3] else 0,
+            'unique_customers': row[4]
+        })
+
+    return series
+
+
 if __name__ == "__main__":
     from app import app
     
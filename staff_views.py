@@ -0,0 +1,240 @@
+"""
+Staff Views
+Dashboard, report APIs, live events, exports and constraint status.
+
+Plain view functions: the URL rules live in blueprints.py, which imports
+this module (and the reporting stack behind it) on the first staff request.
+"""
+
+from flask import render_template, request, jsonify, Response, stream_with_context
+from staff_reports import (
+    get_undelivered_orders, get_top_pizzas_past_month,
+    get_monthly_summary, get_earnings_breakdowns, get_earnings_timeseries
+)
+from database_constraints import get_constraint_status
+from events import broker, stream_events
+from top_sellers import top_sellers, WINDOWS, ITEM_TYPES
+from exports import export_dataset, ExportError, FORMATS
+from metrics import REPORT_SECONDS
+from report_cache import report_cache, parse_report_spec, comparison_spec, ReportSpecError
+from snapshots import run_reports
+from admission import report_admission, Overloaded, overloaded_response
+from order_lifecycle import transition_orders, OrderStatusError
+
+
+def staff_dashboard():
+    """
+    Staff dashboard with reports and analytics.
+    """
+    try:
+        # Get all required reports (read-only: dim_customer is kept in sync by the write path)
+        with report_admission.admit(), REPORT_SECONDS.time(report='dashboard'):
+            reports = run_reports({
+                'undelivered': get_undelivered_orders,
+                'top_pizzas': lambda: get_top_pizzas_past_month(3),
+                'monthly_summary': get_monthly_summary,
+                'earnings': get_earnings_breakdowns
+            })
+            earnings = reports['earnings']
+        
+        return render_template('staff_dashboard.html', 
+                             undelivered_orders=reports['undelivered'],
+                             top_pizzas=reports['top_pizzas'],
+                             monthly_summary=reports['monthly_summary'],
+                             gender_earnings=earnings['by_gender'],
+                             age_earnings=earnings['by_age_group'],
+                             postal_earnings=earnings['by_postal_code'])
+    except Overloaded as e:
+        return (f"<h1>Staff Dashboard Busy</h1><p>Please retry in {e.retry_after}s.</p>",
+                503, {'Retry-After': str(e.retry_after)})
+    except Exception as e:
+        return f"<h1>Staff Dashboard Error</h1><p>{str(e)}</p><a href='/'>← Back to Home</a>"
+
+
+def staff_events():
+    """
+    Server-Sent Events stream for the staff dashboard.
+    Pushes order_created, order_status, courier_assigned and kpis events
+    as orders are committed.
+    """
+    q = broker.subscribe()
+    return Response(
+        stream_events(q),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+def undelivered_orders_report():
+    """API endpoint for undelivered orders report."""
+    try:
+        orders = get_undelivered_orders()
+        return jsonify({"undelivered_orders": orders})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _ranged_report(name, build):
+    """
+    Run a report for the request's from/to/granularity/limit spec through
+    the report cache, plus a comparison range when ?compare= is given.
+    """
+    try:
+        spec = parse_report_spec(request.args)
+        compare = request.args.get('compare')
+        compare_spec = comparison_spec(spec, compare) if compare else None
+    except ReportSpecError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def timed_build(s):
+        with REPORT_SECONDS.time(report=name):
+            return build(s)
+
+    def admitted_build(s):
+        # cache hits never queue; only reports that hit the database take a slot
+        with report_admission.admit():
+            return timed_build(s)
+
+    try:
+        result = report_cache.get_or_compute(name, spec, lambda: admitted_build(spec))
+        response = {"spec": spec.as_dict(), **result}
+        if compare_spec:
+            previous = report_cache.get_or_compute(name, compare_spec, lambda: admitted_build(compare_spec))
+            response["compare"] = {"mode": compare, "spec": compare_spec.as_dict(), **previous}
+        return jsonify(response)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _earnings(spec):
+    reports = run_reports({
+        'earnings': lambda: get_earnings_breakdowns(start=spec.start, end=spec.end),
+        'monthly_summary': lambda: get_monthly_summary(spec.start, spec.end)
+    })
+    earnings = reports['earnings']
+    return {
+        "monthly_summary": reports['monthly_summary'],
+        "by_gender": earnings['by_gender'],
+        "by_age_group": earnings['by_age_group'],
+        "by_postal_code": earnings['by_postal_code']
+    }
+
+
+def top_pizzas_report():
+    """
+    API endpoint for top pizzas report.
+    Query params: from, to (YYYY-MM-DD, default past 30 days), limit, compare
+    """
+    return _ranged_report('top-pizzas', lambda spec: {
+        "top_pizzas": get_top_pizzas_past_month(spec.limit, spec.start, spec.end)
+    })
+
+
+def top_sellers_report():
+    """
+    API endpoint for live top sellers over a sliding window.
+    Query params: type (pizza|drink|dessert|all), window (hour|day|week|today|<minutes>), limit
+    """
+    try:
+        item_type = request.args.get('type', 'pizza')
+        window = request.args.get('window', 'hour')
+        limit = int(request.args.get('limit', 3))
+        if window not in WINDOWS and window != 'today' and not window.isdigit():
+            raise ValueError(f"Invalid window: {window}")
+
+        top_sellers.ensure_warm()
+        types = ITEM_TYPES if item_type == 'all' else (item_type,)
+        return jsonify({
+            "window": window,
+            "top_sellers": {t: top_sellers.top(t, window, limit) for t in types}
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def earnings_report():
+    """
+    API endpoint for earnings breakdown reports.
+    Query params: from, to (YYYY-MM-DD, default all time / past 30 days for the summary), compare
+    """
+    return _ranged_report('earnings', _earnings)
+
+
+def earnings_timeseries_report():
+    """
+    API endpoint for orders and revenue per period.
+    Query params: from, to (YYYY-MM-DD), granularity (day|week|month), compare
+    """
+    return _ranged_report('timeseries', lambda spec: {
+        "granularity": spec.granularity,
+        "series": get_earnings_timeseries(spec.start, spec.end, spec.granularity)
+    })
+
+
+def export_data(dataset, fmt):
+    """
+    Streaming export of orders, order items or a staff report.
+    Formats: csv, ndjson. Optional query params: from, to (YYYY-MM-DD).
+    """
+    try:
+        stream = export_dataset(dataset, fmt, request.args.get('from'), request.args.get('to'))
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return Response(
+        stream_with_context(stream),
+        mimetype=FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={dataset}.{fmt}'}
+    )
+
+
+def constraint_status():
+    """
+    API endpoint for constraint violations, read-only and cheap enough to
+    poll: the last scan's violations plus the rows it has not covered yet.
+    "status" is healthy only for a clean, up-to-date scan, otherwise
+    violations_found, stale (rows changed since) or not_scanned.
+    Query params: full=1 to rescan every row first (takes the write lock).
+    """
+    status = get_constraint_status(full=request.args.get('full') == '1')
+    if 'error' in status:
+        return jsonify(status), 500
+    return jsonify(status)
+
+
+def transition_orders_bulk():
+    """
+    Move many orders to one status in a single statement (kitchen, couriers).
+    JSON: {"order_ids": [1, 2, 3], "status": "preparing"}
+    Orders whose current status does not allow the move come back under "rejected".
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        result = transition_orders(data.get('order_ids') or [], data.get('status', ''))
+    except OrderStatusError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+
+def transition_order(order_id):
+    """
+    Move one order to a new status. JSON: {"status": "out_for_delivery"}
+    404 for an unknown order, 409 when the transition is not allowed.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        result = transition_orders([order_id], data.get('status', ''))
+    except OrderStatusError as e:
+        return jsonify({"error": str(e)}), 400
+    if result['rejected']:
+        rejected = result['rejected'][0]
+        return jsonify({"error": rejected['reason'], "status": rejected['status']}), \
+            404 if rejected['reason'] == 'not_found' else 409
+    return jsonify({"order_id": order_id, "status": result['status']})
@@ -0,0 +1,110 @@
+"""
+Structured Logging Module
+JSON log events written by a background thread.
+
+Request threads only put records on a queue (QueueHandler); a
+QueueListener formats them as one JSON object per line and writes them
+to stderr, so console I/O stays off the checkout path. Fields passed via
+`extra=` (event, order_id, step, ms, ...) become top-level JSON keys.
+
+The per-step order lines are sampled: sample_order_logs() decides once
+per order whether its step events are emitted (ORDER_LOG_SAMPLE_RATE).
+Warnings, errors and the one-line order summary are always logged.
+"""
+
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, Optional
+from datetime import datetime, timezone
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+_order_log_sample_rate = 1.0
+_config: Dict[str, Any] = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and any extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def sample_order_logs() -> bool:
+    """Whether the current order should log its individual steps."""
+    return _order_log_sample_rate >= 1 or random.random() < _order_log_sample_rate
+
+
+def init_logging(config: Dict[str, Any]) -> None:
+    """
+    Route the root logger through a queue to a background JSON writer.
+
+    Config keys: LOG_LEVEL (root level), LOG_LEVELS ({logger: level}),
+    LOG_FORMAT ('json' or 'text'), ORDER_LOG_SAMPLE_RATE (0..1).
+    Calling it again only updates levels and the sample rate.
+    """
+    global _listener, _queue_handler, _order_log_sample_rate, _config
+
+    _config = dict(config)
+    _order_log_sample_rate = float(config.get('ORDER_LOG_SAMPLE_RATE', 1.0))
+    root = logging.getLogger()
+    root.setLevel(config.get('LOG_LEVEL', 'INFO'))
+    for name, level in config.get('LOG_LEVELS', {}).items():
+        logging.getLogger(name).setLevel(level)
+
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    if config.get('LOG_FORMAT', 'json') == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    records = queue.SimpleQueue()
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    _queue_handler = QueueHandler(records)
+    root.addHandler(_queue_handler)
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the background writer."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        _listener = _queue_handler = None
+
+
+def _restart_in_child() -> None:
+    """The writer thread does not survive fork(): give forked workers their own."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener = _queue_handler = None
+        init_logging(_config)
+
+
+os.register_at_fork(after_in_child=_restart_in_child)
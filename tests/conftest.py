@@ -0,0 +1,69 @@
+"""
+Test database setup.
+
+Tests run against a private in-memory SQLite database (config.TestConfig),
+never the working kopernikpizza.db, so parallel test processes cannot
+interfere. The schema is built once per session into template databases;
+before each test the template is copied over the test database with
+SQLite's backup API, which is much cheaper than drop_all/create_all.
+
+Mark a module with `pytestmark = pytest.mark.constraints` to start from
+a template that also has the database_constraints triggers installed.
+"""
+
+import os
+import sqlite3
+
+# must be set before the app (and its config) is imported
+os.environ.setdefault("KOPERNIK_CONFIG", "config.TestConfig")
+
+import pytest
+
+from app import app
+from extensions import db
+from database_constraints import add_database_constraints
+from catalog import catalog_cache
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "constraints: start from a schema with the constraint triggers installed")
+
+
+def _snapshot() -> sqlite3.Connection:
+    """Copy the current test database into a new in-memory connection."""
+    template = sqlite3.connect(":memory:", check_same_thread=False)
+    raw = db.engine.raw_connection()
+    try:
+        raw.driver_connection.backup(template)
+    finally:
+        raw.close()
+    return template
+
+
+@pytest.fixture(scope="session")
+def templates():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        built = {"schema": _snapshot()}
+        add_database_constraints()
+        built["constraints"] = _snapshot()
+        db.session.remove()
+    yield built
+    for template in built.values():
+        template.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_db(request, templates):
+    name = "constraints" if request.node.get_closest_marker("constraints") else "schema"
+    # no app context is kept open during the test, so requests get their own like in production
+    with app.app_context():
+        raw = db.engine.raw_connection()
+        try:
+            templates[name].backup(raw.driver_connection)
+        finally:
+            raw.close()
+    # the catalog cache is process-wide; the restored database may hold a different menu
+    catalog_cache.invalidate()
+    yield
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from app import app
+from admission import AdmissionPool, SharedSlots, Overloaded, order_admission, ADMISSION_SHED_TOTAL
+
+
+def test_pool_queues_then_sheds():
+    pool = AdmissionPool('test', max_in_flight=1, max_queue=1, queue_timeout=5.0)
+    pool.acquire()
+
+    admitted = threading.Event()
+
+    def waiter():
+        pool.acquire()
+        admitted.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    while pool.stats()['queued'] == 0:
+        pass
+
+    with pytest.raises(Overloaded) as shed:
+        pool.acquire()
+    assert shed.value.reason == 'queue_full' and shed.value.retry_after >= 1
+
+    pool.release(0.01)
+    thread.join(timeout=5)
+    assert admitted.is_set()
+    assert pool.stats() == {'in_flight': 1, 'queued': 0, 'admitted': 2, 'shed': 1,
+                            'max_in_flight': 1, 'max_queue': 1}
+    pool.release()
+    assert pool.stats()['in_flight'] == 0
+
+
+def test_waiter_times_out():
+    pool = AdmissionPool('test', max_in_flight=1, max_queue=4, queue_timeout=0.05)
+    with pool.admit():
+        with pytest.raises(Overloaded) as shed:
+            pool.acquire()
+    assert shed.value.reason == 'timeout'
+    assert pool.stats()['queued'] == 0 and pool.stats()['in_flight'] == 0
+
+
+def test_shared_slots_limit_in_flight_across_processes(tmp_path):
+    first = AdmissionPool('test', max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    second = AdmissionPool('test', max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    # each opens its own lock files, as every worker process does
+    first.shared = SharedSlots(str(tmp_path), 'test', 1)
+    second.shared = SharedSlots(str(tmp_path), 'test', 1)
+
+    with first.admit():
+        with pytest.raises(Overloaded) as shed:
+            second.acquire()
+    assert shed.value.reason == 'timeout'
+    assert second.stats()['in_flight'] == 0 and second.stats()['admitted'] == 0
+
+    with second.admit():
+        assert second.stats()['in_flight'] == 1
+        assert first.shared.try_acquire() is None
+
+
+def test_orders_shed_with_503_and_retry_after():
+    saved = (order_admission.max_in_flight, order_admission.max_queue, order_admission.queue_timeout)
+    order_admission.configure(0, 0, 0)
+    before = ADMISSION_SHED_TOTAL.value(pool='orders', reason='queue_full')
+    try:
+        resp = app.test_client().post('/orders', json={'customer_id': 1, 'items': []})
+    finally:
+        order_admission.configure(*saved)
+
+    assert resp.status_code == 503
+    assert int(resp.headers['Retry-After']) >= 1
+    assert resp.get_json()['error_type'] == 'overloaded'
+    assert ADMISSION_SHED_TOTAL.value(pool='orders', reason='queue_full') == before + 1
+    assert 'kopernik_admission_queue_depth{pool="orders"} 0' in app.test_client().get('/metrics').text
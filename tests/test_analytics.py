@@ -0,0 +1,64 @@
+import pytest
+from datetime import datetime
+
+np = pytest.importorskip('numpy')
+
+from app import app
+from extensions import db
+from models import Customer, Pizza, Drink, Order, OrderItem
+from dimensions import refresh_dim_customer
+from analytics import ColumnStore, cross_check
+import analytics
+
+
+def seed_orders(first_day=1):
+    pizzas = Pizza.query.all() or [Pizza(name='Margherita', description=''), Pizza(name='Funghi', description='')]
+    drink = Drink.query.first() or Drink(name='Cola', price=2.0)
+    db.session.add_all(pizzas + [drink])
+    customers = []
+    for i, (birthday, postcode) in enumerate([(datetime(1990, 5, 1), '00100'), (datetime(1960, 1, 1), '00200'),
+                                              (datetime(2001, 7, 9), '00100')]):
+        email = f'col{first_day}-{i}@example.com'
+        c = Customer(name=f'C{i}', email=email, phone=f'{first_day}{i}', address=f'Street {i}, {postcode}',
+                     birthday=birthday.date())
+        customers.append(c)
+    db.session.add_all(customers)
+    db.session.flush()
+    for n in range(12):
+        o = Order(customer_id=customers[n % 3].id, order_date=datetime(2025, 4, first_day + n % 5, 12),
+                  status='delivered', total=10.0 + n * 2.5)
+        db.session.add(o)
+        db.session.flush()
+        pizza = pizzas[n % 2]
+        db.session.add(OrderItem(order_id=o.id, item_type='pizza', item_id=pizza.id, pizza_id=pizza.id, quantity=1 + n % 3))
+        db.session.add(OrderItem(order_id=o.id, item_type='drink', item_id=drink.id, quantity=1))
+    db.session.commit()
+    refresh_dim_customer()
+
+
+def test_columnar_reports_match_sql():
+    with app.app_context():
+        seed_orders()
+        store = ColumnStore()
+        assert store.refresh() == {'orders': 12, 'lines': 24}
+
+        assert cross_check(store) == []
+        assert cross_check(store, datetime(2025, 4, 2), datetime(2025, 4, 4)) == []
+        assert store.top_items('drink', start=datetime(2025, 4, 1))[0]['total_sold'] == 12
+
+
+def test_incremental_refresh_snapshot_and_parallel_scan(tmp_path, monkeypatch):
+    snapshot = str(tmp_path / 'analytics.npz')
+    with app.app_context():
+        seed_orders()
+        store = ColumnStore()
+        store.refresh()
+        store.save(snapshot)
+
+        seed_orders(first_day=10)
+        restored = ColumnStore.load(snapshot)
+        assert restored.refresh() == {'orders': 12, 'lines': 24}
+        assert cross_check(restored) == []
+
+        monkeypatch.setattr(analytics, 'PARALLEL_MIN_ROWS', 1)
+        assert restored.earnings_breakdowns(workers=2) == restored.earnings_breakdowns(workers=1)
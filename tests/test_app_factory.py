@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+from app import app, create_app, warm_up
+from catalog import catalog_cache
+from extensions import db
+from models import Pizza, Ingredient, PizzaIngredient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_staff_views_imported_on_first_staff_request():
+    script = (
+        "import sys\n"
+        "from app import create_app\n"
+        "from extensions import db\n"
+        "app = create_app()\n"
+        "with app.app_context():\n"
+        "    db.create_all()\n"
+        "client = app.test_client()\n"
+        "assert client.get('/menu').status_code == 200\n"
+        "assert 'staff_views' not in sys.modules and 'admin_views' not in sys.modules\n"
+        "assert client.get('/staff/reports/undelivered').status_code == 200\n"
+        "assert 'staff_views' in sys.modules and 'admin_views' not in sys.modules\n"
+    )
+    env = dict(os.environ, KOPERNIK_CONFIG='config.TestConfig')
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_import_app_leaves_the_reporting_stack_unloaded():
+    script = (
+        "import sys\n"
+        "import app\n"
+        "app.create_app()\n"
+        "loaded = {'staff_reports', 'customer_import', 'dimensions', 'report_cache'} & set(sys.modules)\n"
+        "assert not loaded, loaded\n"
+    )
+    env = dict(os.environ, KOPERNIK_CONFIG='config.TestConfig')
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_catalog_rebuilt_after_catalog_commit():
+    with app.app_context():
+        assert catalog_cache.menu()['pizzas'] == []
+        cheese = Ingredient(name='Mozzarella', cost_per_unit=2.0)
+        pizza = Pizza(name='Cached', description='')
+        db.session.add_all([cheese, pizza])
+        db.session.flush()
+        db.session.add(PizzaIngredient(pizza_id=pizza.id, ingredient_id=cheese.id, quantity=1.0))
+        db.session.commit()
+
+        pizzas = catalog_cache.menu()['pizzas']
+        assert [p['name'] for p in pizzas] == ['Cached']
+        assert catalog_cache.price('pizza', pizza.id) == pizzas[0]['price'] > 0
+
+
+def test_warm_up_reports_phase_timings():
+    fresh = create_app('config.TestConfig')
+    with fresh.app_context():
+        db.create_all()
+    timings = warm_up(fresh)
+    assert set(timings) == {'catalog', 'sql', 'templates'}
+    assert all(ms >= 0 for ms in timings.values())
@@ -0,0 +1,81 @@
+import gzip
+import os
+import shutil
+
+from flask import Flask
+
+from app import app
+from compression import (compression_cache, precompress_static, init_compression,
+                         COMPRESSED_RESPONSES)
+from extensions import db
+from models import Pizza
+
+
+def seed_menu(n=20):
+    db.session.add_all([Pizza(name=f'Pizza {i}', description='Tomato, basil and a long description ' * 3)
+                        for i in range(n)])
+    db.session.commit()
+
+
+def test_menu_gzipped_once_and_served_from_cache():
+    with app.app_context():
+        seed_menu()
+    compression_cache.clear()
+    client = app.test_client()
+
+    plain = client.get('/menu')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    misses = COMPRESSED_RESPONSES.value(encoding='gzip', cache='miss')
+    hits = COMPRESSED_RESPONSES.value(encoding='gzip', cache='hit')
+    first = client.get('/menu', headers={'Accept-Encoding': 'gzip, deflate'})
+    second = client.get('/menu', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert int(first.headers['Content-Length']) == len(first.data) < len(plain.data)
+    assert gzip.decompress(first.data) == plain.data
+    assert second.data == first.data
+    assert COMPRESSED_RESPONSES.value(encoding='gzip', cache='miss') == misses + 1
+    assert COMPRESSED_RESPONSES.value(encoding='gzip', cache='hit') == hits + 1
+
+
+def test_small_and_refused_bodies_left_alone():
+    small_app = Flask(__name__)
+    init_compression(small_app)
+
+    @small_app.route('/small')
+    def small():
+        return {'ok': True}
+
+    @small_app.route('/large')
+    def large():
+        return {'rows': ['x' * 50] * 50}
+
+    client = small_app.test_client()
+    assert 'Content-Encoding' not in client.get('/small', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get('/large', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+    assert client.get('/large', headers={'Accept-Encoding': '*'}).headers['Content-Encoding'] == 'gzip'
+
+
+def test_static_files_precompressed_and_served(tmp_path):
+    static = tmp_path / 'static'
+    shutil.copytree(os.path.join(app.root_path, 'static'), static, ignore=shutil.ignore_patterns('*.gz', '*.br'))
+    stats = precompress_static(str(static))
+    assert stats['written'] >= 2 and stats['compressed_bytes'] < stats['original_bytes']
+    assert (static / 'js' / 'order.js.gz').exists()
+    assert precompress_static(str(static))['written'] == 0
+
+    static_app = Flask(__name__, static_folder=str(static))
+    static_app.config['COMPRESS_STATIC_AT_STARTUP'] = False
+    init_compression(static_app)
+    client = static_app.test_client()
+
+    resp = client.get('/static/js/order.js', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert resp.mimetype == 'text/javascript'
+    assert gzip.decompress(resp.data) == (static / 'js' / 'order.js').read_bytes()
+    resp.close()
+
+    plain = client.get('/static/js/order.js')
+    assert 'Content-Encoding' not in plain.headers and plain.headers['Vary'] == 'Accept-Encoding'
+    plain.close()
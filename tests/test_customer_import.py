@@ -0,0 +1,94 @@
+import io
+import json
+
+from sqlalchemy import text
+
+from app import app
+from extensions import db
+from models import Customer
+from customer_import import import_customers, iter_records
+from customers import normalize_email, normalize_phone, ensure_customer_indexes
+
+CSV = """name,email,phone,address,birthday
+Ada,ADA@Example.com ,+48 600-100-200,Street 1 00100,1990-05-01
+Bob,bob@example.com,(0048) 600 100 201,Street 2 00100,
+Bad,not-an-email,600100202,Street 3 00100,
+Old,old@example.com,600100203,Street 4 00100,1850-01-01
+Dup,ada@example.com,600100204,Street 5 00100,
+"""
+
+
+def records(text, fmt='csv'):
+    return iter_records(io.StringIO(text), fmt)
+
+
+def test_normalization():
+    assert normalize_email('  Mario@Email.COM ') == 'mario@email.com'
+    assert normalize_email('mario') is None
+    assert normalize_phone('+48 (600) 100-200') == '+48600100200'
+    assert normalize_phone('0048 600.100.200') == '+48600100200'
+    assert normalize_phone('12-ab') is None
+
+
+def test_import_inserts_then_upserts_and_reports_bad_rows():
+    with app.app_context():
+        before = Customer.query.count()
+        result = import_customers(records(CSV), batch_size=2)
+        assert (result['rows'], result['inserted'], result['updated'], result['skipped']) == (5, 2, 0, 3)
+        assert [(p['line'], p['reason']) for p in result['problems']] == [
+            (4, 'invalid email'), (5, 'birthday out of range'), (6, 'duplicate email or phone in file')]
+        assert Customer.query.count() == before + 2
+        ada = Customer.query.filter_by(email='ada@example.com').one()
+        assert ada.phone == '+48600100200' and str(ada.birthday) == '1990-05-01'
+
+        update = '{"name": "Ada L", "email": "ada@example.com", "phone": "+48600100200", "address": "New 9 00200"}\n'
+        result = import_customers(records(update, 'ndjson'))
+        assert (result['inserted'], result['updated']) == (0, 1)
+        db.session.refresh(ada)
+        assert (ada.name, ada.address, str(ada.birthday)) == ('Ada L', 'New 9 00200', '1990-05-01')
+
+
+def test_row_matching_two_customers_is_a_conflict():
+    with app.app_context():
+        import_customers(records(CSV))
+        clash = json.dumps({'name': 'X', 'email': 'ada@example.com', 'phone': '+48600100201',
+                            'address': 'Street 7 00100'})
+        result = import_customers(records(clash, 'ndjson'))
+        assert result['skipped'] == 1 and result['problems'][0]['reason'] == \
+            'email and phone belong to different customers'
+        assert Customer.query.filter_by(email='ada@example.com').one().name == 'Ada'
+
+
+def test_import_endpoint_and_orders_find_imported_customers():
+    client = app.test_client()
+    resp = client.post('/staff/customers/import', data=CSV, content_type='text/csv')
+    assert resp.status_code == 200 and resp.get_json()['inserted'] == 2
+    assert client.post('/staff/customers/import', data='a,b\n1,2\n',
+                       content_type='text/csv').status_code == 400
+
+    with app.app_context():
+        from transactions import _resolve_customer
+        customer = _resolve_customer({'customer': {'email': 'Ada@example.com', 'phone': '+48 600 100 200'}})
+        assert customer.name == 'Ada'
+
+
+def test_orders_find_customers_stored_before_normalization():
+    with app.app_context():
+        from transactions import _resolve_customer
+        legacy = Customer(name='Legacy', email='Mixed@Example.com', phone='+48 600 100 300', address='Street 9 00100')
+        db.session.add(legacy)
+        db.session.commit()
+
+        by_email = _resolve_customer({'customer': {'email': 'mixed@example.com', 'phone': '600100399'}})
+        by_phone = _resolve_customer({'customer': {'email': 'other@example.com', 'phone': '+48 600 100 300'}})
+        assert by_email.id == by_phone.id == legacy.id
+        assert Customer.query.count() == 1
+
+
+def test_customer_lookup_index_added_to_existing_database():
+    with app.app_context():
+        db.session.execute(text("DROP INDEX ix_customers_email_lower"))
+        ensure_customer_indexes()
+        plan = db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM customers WHERE lower(email) = 'a@example.com'")).fetchall()
+        assert 'ix_customers_email_lower' in str(plan)
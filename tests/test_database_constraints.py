@@ -0,0 +1,116 @@
+import pytest
+from sqlalchemy import text
+
+from app import app
+from extensions import db
+from models import Ingredient, Customer
+from database_constraints import (
+    add_database_constraints, bulk_load, BulkLoadError, get_constraint_status, scan_constraints,
+    CONSTRAINT_TRIGGERS
+)
+
+
+pytestmark = pytest.mark.constraints
+
+
+def installed_triggers():
+    # the dim_customer queue triggers (dimensions.py) are not constraint triggers
+    rows = db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name NOT LIKE 'dim_dirty_%'"))
+    return {row[0] for row in rows}
+
+
+def test_bulk_load_commits_valid_rows_and_restores_triggers():
+    with app.app_context():
+        db.session.add(Ingredient(name='Flour', cost_per_unit=0.5))
+        db.session.commit()
+
+        with bulk_load(['ingredients']) as load:
+            assert load['suspended_triggers'] == ['check_ingredient_cost']
+            assert 'check_ingredient_cost' not in installed_triggers()
+            db.session.execute(text("INSERT INTO ingredients (name, cost_per_unit) VALUES (:name, :cost)"),
+                               [{'name': f'Spice {i}', 'cost': 1.0 + i} for i in range(100)])
+
+        assert Ingredient.query.count() == 101
+        assert installed_triggers() == set(CONSTRAINT_TRIGGERS)
+        with pytest.raises(Exception):
+            db.session.execute(text("INSERT INTO ingredients (name, cost_per_unit) VALUES ('Bad', -1)"))
+        db.session.rollback()
+
+
+def test_bulk_load_rolls_back_on_violations():
+    with app.app_context():
+        with pytest.raises(BulkLoadError) as excinfo:
+            with bulk_load() as load:
+                db.session.add(Ingredient(name='Free Basil', cost_per_unit=0))
+                db.session.add(Customer(name='Ok', email='ok@example.com', phone='1', address='Street 1, 00100'))
+                db.session.execute(text(
+                    "INSERT INTO customers (name, email, phone, address, birthday) "
+                    "VALUES ('Future', 'f@example.com', '3', 'Street 3', '2999-01-01')"
+                ))
+
+        assert sorted(excinfo.value.violations) == [
+            "Customer 'Future' has invalid birthday: 2999-01-01",
+            "Ingredient 'Free Basil' has invalid cost: 0.0"
+        ]
+        assert Ingredient.query.count() == 0 and Customer.query.count() == 0
+        assert installed_triggers() == set(CONSTRAINT_TRIGGERS)
+        assert get_constraint_status()['status'] == 'not_scanned'
+        scan_constraints()
+        assert get_constraint_status()['status'] == 'healthy'
+
+
+def test_incremental_scan_tracks_new_and_changed_rows():
+    with app.app_context():
+        db.session.add_all([Ingredient(name='Salt', cost_per_unit=0.1), Ingredient(name='Oil', cost_per_unit=1.0)])
+        db.session.commit()
+        first = scan_constraints()
+        assert first['tables']['ingredients']['full'] and first['tables']['ingredients']['new_rows'] == 2
+
+        # changed rows are picked up through the tracking triggers, untouched rows are not rescanned
+        db.session.execute(text("DROP TRIGGER check_ingredient_cost_update"))
+        db.session.execute(text("UPDATE ingredients SET cost_per_unit = -2 WHERE name = 'Oil'"))
+        db.session.commit()
+        second = scan_constraints()
+        assert second['tables']['ingredients'] == {
+            'full': False, 'new_rows': 0, 'changed_rows': 1, 'violations_found': 1
+        }
+        status = get_constraint_status()
+        assert status['current_violations'] == 1
+        assert status['violations'] == ["Ingredient 'Oil' has invalid cost: -2.0"]
+        assert status['pending_rows']['ingredients'] == 0 and status['last_scan_at'] is not None
+
+        # status is read-only: the change waits for the next scan
+        db.session.execute(text("DELETE FROM ingredients WHERE name = 'Oil'"))
+        db.session.commit()
+        status = get_constraint_status()
+        assert status['current_violations'] == 1 and status['pending_rows']['ingredients'] == 1
+        # fixing or deleting the row clears its persisted violation
+        scan_constraints()
+        assert get_constraint_status()['current_violations'] == 0
+
+        # a clean but outdated scan is not reported as healthy
+        db.session.add(Ingredient(name='Pepper', cost_per_unit=0.3))
+        db.session.commit()
+        assert get_constraint_status()['status'] == 'stale'
+        scan_constraints()
+        assert get_constraint_status()['status'] == 'healthy'
+
+        db.session.execute(text("INSERT INTO constraint_violations (table_name, row_id, check_name, message, detected_at) "
+                                "VALUES ('ingredients', 99, 'stale', 'stale', '2025-01-01')"))
+        db.session.commit()
+        assert get_constraint_status(full=True)['current_violations'] == 0
+
+
+def test_tracking_triggers_do_not_abort_upserts_of_queued_rows():
+    with app.app_context():
+        scan_constraints()
+        upsert = text("""
+            INSERT INTO customers (name, email, phone, address, birthday)
+            VALUES ('U', 'u@example.com', '21', 'Street 1, 00100', '1990-01-01')
+            ON CONFLICT(email) DO UPDATE SET birthday = excluded.birthday
+        """)
+        for _ in range(3):
+            db.session.execute(upsert)
+        db.session.commit()
+        assert scan_constraints()['tables']['customers']['changed_rows'] == 1
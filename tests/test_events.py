@@ -0,0 +1,128 @@
+from datetime import datetime
+
+from app import app
+from extensions import db
+from events import broker, EventBroker, EventRelay
+from catalog import catalog_cache
+from models import Customer, Pizza, Order, OrderItem
+
+
+def drain(q):
+    events = []
+    while not q.empty():
+        _, event_type, data = q.get_nowait()
+        events.append((event_type, data))
+    return events
+
+
+def test_order_commit_publishes_events():
+    with app.app_context():
+        c = Customer(name='E', email='e@example.com', phone='5', address='50005 City')
+        p = Pizza(name='Event Pizza', description='test')
+        db.session.add_all([c, p])
+        # a menu change, published as catalog_changed: committed before listening
+        db.session.commit()
+        q = broker.subscribe()
+        try:
+            o = Order(customer=c, order_date=datetime.utcnow(), status='pending', total=12.5)
+            db.session.add(o)
+            db.session.flush()
+            db.session.add(OrderItem(order_id=o.id, item_type='pizza', item_id=p.id, pizza_id=p.id, quantity=2))
+            db.session.commit()
+
+            events = drain(q)
+            types = [event_type for event_type, _ in events]
+            assert types == ['order_created', 'kpis']
+            created = events[0][1]
+            assert created['total'] == 12.5
+            assert created['customer_name'] == 'E'
+            assert events[1][1]['pizzas'] == 2
+            assert events[1][1]['customers'] == 1
+
+            assert o.status == 'pending'
+            o.status = 'preparing'
+            db.session.commit()
+            events = drain(q)
+            assert events == [('order_status', {'order_id': o.id, 'status': 'preparing', 'previous_status': 'pending'})]
+        finally:
+            broker.unsubscribe(q)
+
+
+def test_unique_customer_delta_counts_first_order_in_window():
+    with app.app_context():
+        c = Customer(name='R', email='r@example.com', phone='7', address='70007 City')
+        db.session.add(c)
+        db.session.flush()
+        # a returning customer: known for months, no order in the last 30 days
+        db.session.add(Order(customer_id=c.id, order_date=datetime(2020, 1, 1), status='delivered', total=9.0))
+        db.session.commit()
+        q = broker.subscribe()
+        try:
+            deltas = []
+            for _ in range(2):
+                db.session.add(Order(customer_id=c.id, order_date=datetime.utcnow(), status='pending', total=10.0))
+                db.session.commit()
+                deltas += [data['customers'] for event_type, data in drain(q) if event_type == 'kpis']
+            assert deltas == [1, 0]
+        finally:
+            broker.unsubscribe(q)
+
+
+def test_rollback_publishes_nothing():
+    with app.app_context():
+        q = broker.subscribe()
+        try:
+            c = Customer(name='F', email='f@example.com', phone='6', address='60006 City')
+            db.session.add(c)
+            db.session.flush()
+            db.session.add(Order(customer_id=c.id, order_date=datetime.utcnow(), status='pending'))
+            db.session.flush()
+            db.session.rollback()
+            assert drain(q) == []
+        finally:
+            broker.unsubscribe(q)
+
+
+def test_closing_broker_ends_open_streams():
+    from events import stream_events
+    q = broker.subscribe()
+    stream = stream_events(q, keepalive_seconds=0.01)
+    try:
+        assert next(stream).startswith('retry:')
+        broker.close()
+        assert list(stream) == []
+        assert broker.subscriber_count == 0
+    finally:
+        broker._closed.clear()
+
+
+def test_relay_shares_events_between_processes():
+    with app.app_context():
+        engine = db.engine
+    # two brokers with their own relays stand in for two workers; the threads stay idle
+    first, second = EventBroker(), EventBroker()
+    relays = [EventRelay(first, engine, poll_interval=60), EventRelay(second, engine, poll_interval=60)]
+    for relay in relays:
+        relay.start()
+    try:
+        received = []
+        second.add_listener(lambda event_type, data: received.append((event_type, data)))
+        when = datetime(2026, 10, 19, 19, 30)
+        first.publish('order_created', {'order_id': 7, 'order_date': when, 'items': []})
+
+        assert relays[0].flush() == 1
+        assert relays[0].poll() == 0  # never its own events
+        assert relays[1].poll() == 1
+        assert received == [('order_created', {'order_id': 7, 'order_date': when, 'items': []})]
+        assert relays[1].flush() == 0  # delivered, not published again
+    finally:
+        for relay in relays:
+            relay.stop()
+    assert first.forward is None and second.forward is None
+
+
+def test_catalog_change_from_another_worker_invalidates_the_menu():
+    with app.app_context():
+        catalog_cache.menu()
+        broker.deliver('catalog_changed', {})
+        assert catalog_cache.stats()['cached'] is False
@@ -0,0 +1,46 @@
+import json
+from datetime import datetime
+
+from app import app
+from extensions import db
+from models import Customer, Pizza, Order, OrderItem
+
+
+def seed_orders():
+    p = Pizza(name='Export Pizza', description='test')
+    c = Customer(name='L', email='l@example.com', phone='16', address='Street 6, 00100')
+    db.session.add_all([p, c])
+    db.session.flush()
+    for day, total in [(1, 10.0), (2, 20.0), (3, 30.0)]:
+        o = Order(customer_id=c.id, order_date=datetime(2025, 3, day, 18, 30), status='pending', total=total)
+        db.session.add(o)
+        db.session.flush()
+        db.session.add(OrderItem(order_id=o.id, item_type='pizza', item_id=p.id, pizza_id=p.id, quantity=day))
+    db.session.commit()
+
+
+def test_export_orders_csv_with_date_range():
+    with app.app_context():
+        seed_orders()
+
+    resp = app.test_client().get('/staff/export/orders.csv?from=2025-03-02&to=2025-03-03')
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    lines = resp.get_data(as_text=True).strip().splitlines()
+    assert lines[0].startswith('order_id,order_date,status,total')
+    assert [line.split(',')[3] for line in lines[1:]] == ['20.0', '30.0']
+
+
+def test_export_order_items_ndjson():
+    with app.app_context():
+        seed_orders()
+
+    resp = app.test_client().get('/staff/export/order-items.ndjson')
+    rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [(row['item_name'], row['quantity']) for row in rows] == [('Export Pizza', 1), ('Export Pizza', 2), ('Export Pizza', 3)]
+
+
+def test_export_rejects_unknown_dataset_and_bad_dates():
+    client = app.test_client()
+    assert client.get('/staff/export/secrets.csv').status_code == 400
+    assert client.get('/staff/export/orders.csv?from=yesterday').status_code == 400
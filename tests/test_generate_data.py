@@ -0,0 +1,56 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import text
+
+from app import app
+from extensions import db
+from models import Pizza, Ingredient, PizzaIngredient, Drink, DeliveryPerson, DeliveryZone
+from database_constraints import add_database_constraints, get_constraint_status
+from generate_data import generate
+
+
+pytestmark = pytest.mark.constraints
+
+
+def seed_catalog():
+    cheese = Ingredient(name='Mozzarella', cost_per_unit=2.5)
+    pizzas = [Pizza(name='Margherita', description=''), Pizza(name='Funghi', description='')]
+    courier = DeliveryPerson(name='Rider', postal_codes='00100')
+    db.session.add_all([cheese, courier, Drink(name='Water', price=1.5)] + pizzas)
+    db.session.flush()
+    db.session.add_all([PizzaIngredient(pizza_id=p.id, ingredient_id=cheese.id, quantity=1.0) for p in pizzas])
+    db.session.add(DeliveryZone(delivery_person_id=courier.id, postcode_prefix='001'))
+    db.session.commit()
+
+
+def snapshot():
+    return db.session.execute(text("""
+        SELECT COUNT(*), SUM(total), MIN(order_date), MAX(order_date),
+               (SELECT SUM(quantity) FROM order_items), (SELECT GROUP_CONCAT(birthday) FROM customers)
+        FROM orders
+    """)).fetchone()
+
+
+def test_generate_is_deterministic_and_valid():
+    end = datetime(2025, 6, 1)
+    with app.app_context():
+        seed_catalog()
+        result = generate(customers=200, lines=3000, days=30, seed=7, end=end,
+                          batch_size=500, transaction_lines=1000)
+        assert result['customers'] == 200 and 2800 <= result['order_lines'] <= 3000
+        first = snapshot()
+        assert first[2] >= '2025-05-02' and first[3] < '2025-06-01'
+
+        missing_pizza = db.session.execute(text("""
+            SELECT COUNT(*) FROM orders o
+            WHERE NOT EXISTS (SELECT 1 FROM order_items oi WHERE oi.order_id = o.id AND oi.item_type = 'pizza')
+        """)).scalar()
+        assert missing_pizza == 0
+        assert get_constraint_status(full=True)['current_violations'] == 0
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed_catalog()
+        generate(customers=200, lines=3000, days=30, seed=7, end=end, batch_size=500, transaction_lines=1000)
+        assert snapshot() == first
@@ -0,0 +1,105 @@
+import contextvars
+import json
+import logging
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, create_app
+from extensions import db
+from models import Pizza, Ingredient, PizzaIngredient
+from instrumentation import normalize_statement
+
+
+@pytest.fixture
+def debug_headers():
+    app.config['SQL_DEBUG_HEADERS'] = True
+    yield
+    app.config['SQL_DEBUG_HEADERS'] = False
+
+
+def seed_pizzas(n=6):
+    cheese = Ingredient(name='Mozzarella', cost_per_unit=2.0)
+    db.session.add(cheese)
+    db.session.flush()
+    for i in range(n):
+        p = Pizza(name=f'Pizza {i}', description='')
+        db.session.add(p)
+        db.session.flush()
+        db.session.add(PizzaIngredient(pizza_id=p.id, ingredient_id=cheese.id, quantity=1.0))
+    db.session.commit()
+
+
+def test_normalize_statement_collapses_literals():
+    assert normalize_statement("SELECT * FROM t\n WHERE id = 12 AND name = 'x''y'") == \
+        "SELECT * FROM t WHERE id = ? AND name = ?"
+    assert normalize_statement("SELECT anon_1 FROM t1") == "SELECT anon_1 FROM t1"
+
+
+def test_lazy_loads_reported_as_n_plus_one():
+    n_plus_one_app = create_app('config.TestConfig')
+    n_plus_one_app.config['SQL_DEBUG_HEADERS'] = True
+
+    @n_plus_one_app.route('/prices')
+    def prices():
+        # calculate_price() lazy-loads pizza_ingredients once per pizza
+        return {str(p.id): p.calculate_price() for p in Pizza.query.all()}
+
+    with n_plus_one_app.app_context():
+        db.create_all()
+        seed_pizzas()
+
+    resp = n_plus_one_app.test_client().get('/prices')
+    assert resp.status_code == 200
+    assert int(resp.headers['X-DB-Queries']) > 6
+    assert float(resp.headers['X-DB-Time-Ms']) >= 0
+    assert int(resp.headers['X-DB-N-Plus-One']) >= 1
+    assert 'pizza_ingredients' in resp.headers['X-DB-N-Plus-One-Statement']
+
+
+def test_cached_menu_has_no_n_plus_one(debug_headers):
+    with app.app_context():
+        seed_pizzas()
+
+    resp = app.test_client().get('/menu')
+    assert resp.status_code == 200
+    assert int(resp.headers['X-DB-Queries']) <= 5
+    assert resp.headers['X-DB-N-Plus-One'] == '0'
+
+
+def test_headers_off_outside_debug_and_slow_requests_logged(caplog):
+    app.config['SLOW_REQUEST_MS'] = 0
+    try:
+        with caplog.at_level(logging.WARNING, logger='instrumentation.slow_requests'):
+            resp = app.test_client().get('/menu?page=1')
+    finally:
+        app.config['SLOW_REQUEST_MS'] = 500
+
+    assert 'X-DB-Queries' not in resp.headers
+    entry = json.loads(caplog.records[-1].getMessage())
+    assert entry['path'] == '/menu?page=1' and entry['status'] == 200
+    assert entry['queries'] == 3 and len(entry['slowest']) == 3
+
+
+def test_queries_on_pool_threads_count_toward_their_request():
+    pool_app = create_app('config.TestConfig')
+    pool_app.config['SQL_DEBUG_HEADERS'] = True
+
+    def count_pizzas():
+        with pool_app.app_context():
+            return Pizza.query.count()
+
+    @pool_app.route('/pooled')
+    def pooled():
+        # the way snapshots.run_reports hands reports to its pool
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, count_pizzas) for _ in range(4)]
+            return {'pizzas': sum(f.result() for f in futures)}
+
+    with pool_app.app_context():
+        db.create_all()
+    client = pool_app.test_client()
+    assert client.get('/pooled').headers['X-DB-Queries'] == '4'
+    # pooled work started outside a request is not attributed to the next one
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(count_pizzas).result()
+    assert client.get('/pooled').headers['X-DB-Queries'] == '4'
@@ -0,0 +1,62 @@
+from app import app
+from extensions import db
+from models import Customer, Pizza, Ingredient, PizzaIngredient
+from metrics import MetricsRegistry, ORDER_STEP_SECONDS, ORDERS_TOTAL, ORDER_ROLLBACKS_TOTAL, COURIER_NOT_FOUND_TOTAL
+
+ORDER_STEPS = ['customer', 'validation', 'order_insert', 'items', 'discount_code',
+               'pricing', 'redemption', 'dispatch', 'commit']
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    orders = registry.counter('orders_total', 'Orders', ['type'])
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    registry.gauge('queue_depth', 'Depth').set_function(lambda: 3)
+
+    orders.inc(type='pizza')
+    orders.inc(2, type='pizza')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(7)
+
+    text = registry.render()
+    assert '# TYPE orders_total counter\norders_total{type="pizza"} 3' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1\n' in text
+    assert 'latency_seconds_bucket{le="1"} 2\n' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3\n' in text
+    assert 'latency_seconds_count 3' in text and 'latency_seconds_sum 7.55' in text
+    assert 'queue_depth 3' in text
+    assert registry.counter('orders_total', 'Orders', ['type']) is orders
+
+
+def test_order_placement_times_every_step():
+    with app.app_context():
+        cheese = Ingredient(name='Mozzarella', cost_per_unit=2.0)
+        pizza = Pizza(name='Metric Pizza', description='')
+        customer = Customer(name='M', email='m@example.com', phone='41', address='Street 1, 00100')
+        db.session.add_all([cheese, pizza, customer])
+        db.session.flush()
+        db.session.add(PizzaIngredient(pizza_id=pizza.id, ingredient_id=cheese.id, quantity=1.0))
+        db.session.commit()
+        pizza_id, customer_id = pizza.id, customer.id
+
+    before = {step: ORDER_STEP_SECONDS.snapshot(step=step)['count'] for step in ORDER_STEPS}
+    orders, no_courier = ORDERS_TOTAL.value(), COURIER_NOT_FOUND_TOTAL.value()
+    rollbacks = ORDER_ROLLBACKS_TOTAL.value(error_type='OrderTransactionError')
+
+    client = app.test_client()
+    item = {'item_type': 'pizza', 'item_id': pizza_id, 'quantity': 1}
+    assert client.post('/orders', json={'customer_id': customer_id, 'items': [item]}).status_code == 201
+    assert client.post('/orders', json={'customer_id': 999, 'items': [item]}).status_code == 400
+
+    for step in ORDER_STEPS:
+        assert ORDER_STEP_SECONDS.snapshot(step=step)['count'] == before[step] + 1, step
+    assert ORDERS_TOTAL.value() == orders + 1
+    assert COURIER_NOT_FOUND_TOTAL.value() == no_courier + 1
+    assert ORDER_ROLLBACKS_TOTAL.value(error_type='OrderTransactionError') == rollbacks + 1
+
+    resp = client.get('/metrics')
+    assert resp.status_code == 200 and resp.content_type.startswith('text/plain')
+    body = resp.get_data(as_text=True)
+    assert 'kopernik_order_step_seconds_bucket{step="commit",le="+Inf"}' in body
+    assert 'kopernik_report_cache_requests_total{result="hit"}' in body
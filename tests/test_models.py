@@ -1,4 +1,3 @@
-import pytest
 from datetime import datetime
 
 from app import app
@@ -6,17 +5,6 @@ from extensions import db
 from models import Customer, Pizza, Order, OrderItem
 
 
-@pytest.fixture(autouse=True)
-def setup_db():
-    # ensure a clean database for each test
-    with app.app_context():
-        db.drop_all()
-        db.create_all()
-        yield
-        db.session.remove()
-        db.drop_all()
-
-
 def test_pizza_orderitem_bidirectional():
     with app.app_context():
         # create a customer
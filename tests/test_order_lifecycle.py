@@ -0,0 +1,103 @@
+import shutil
+import sqlite3
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from app import app, create_app
+from config import TestConfig
+from events import broker
+from extensions import db
+from models import Customer, Order
+from order_lifecycle import transition_orders, OrderStatusError
+
+
+def seed_orders(statuses):
+    c = Customer(name='L', email='life@example.com', phone='71', address='Street 1, 00100')
+    db.session.add(c)
+    db.session.flush()
+    orders = [Order(customer_id=c.id, order_date=datetime(2026, 1, 1, 18, i), status=s, total=10.0)
+              for i, s in enumerate(statuses)]
+    db.session.add_all(orders)
+    db.session.commit()
+    return [o.id for o in orders]
+
+
+def test_bulk_transition_updates_valid_orders_and_reports_the_rest():
+    with app.app_context():
+        ids = seed_orders(['pending', 'pending', 'delivered'])
+    events = []
+    listener = lambda event_type, data: events.append((event_type, data))
+    broker.add_listener(listener)
+    try:
+        resp = app.test_client().post('/staff/orders/status',
+                                      json={'order_ids': ids + [9999], 'status': 'preparing'})
+    finally:
+        broker.remove_listener(listener)
+
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body['updated'] == ids[:2]
+    assert body['rejected'] == [
+        {'order_id': ids[2], 'status': 'delivered', 'reason': 'cannot move from delivered to preparing'},
+        {'order_id': 9999, 'status': None, 'reason': 'not_found'}
+    ]
+    assert [e for e in events if e[0] == 'order_status'] == [
+        ('order_status', {'order_id': i, 'status': 'preparing', 'previous_status': 'pending'}) for i in ids[:2]]
+    with app.app_context():
+        order = db.session.get(Order, ids[0])
+        assert order.status == 'preparing' and order.preparing_at is not None and order.delivered_at is None
+        assert db.session.execute(text("SELECT status FROM orders WHERE id = :id"), {'id': ids[0]}).scalar() == 1
+
+
+def test_undelivered_queue_only_holds_active_orders():
+    with app.app_context():
+        ids = seed_orders(['pending', 'preparing', 'delivered', 'cancelled'])
+        transition_orders([ids[1]], 'out_for_delivery')
+    orders = app.test_client().get('/staff/reports/undelivered').get_json()['undelivered_orders']
+    assert [(o['order_id'], o['status']) for o in orders] == [(ids[0], 'pending'), (ids[1], 'out_for_delivery')]
+
+
+def test_single_transition_errors():
+    with app.app_context():
+        order_id, = seed_orders(['pending'])
+    client = app.test_client()
+    assert client.post(f'/staff/orders/{order_id}/status', json={'status': 'delivered'}).status_code == 409
+    assert client.post(f'/staff/orders/{order_id}/status', json={'status': 'eaten'}).status_code == 400
+    assert client.post('/staff/orders/9999/status', json={'status': 'cancelled'}).status_code == 404
+    resp = client.post(f'/staff/orders/{order_id}/status', json={'status': 'cancelled'})
+    assert resp.get_json() == {'order_id': order_id, 'status': 'cancelled'}
+
+
+def test_order_ids_must_be_a_list():
+    with app.app_context():
+        ids = seed_orders(['pending'])
+        for bad in (str(ids[0]), str(ids[0]).encode(), ids[0], {'id': ids[0]}, [True]):
+            with pytest.raises(OrderStatusError):
+                transition_orders(bad, 'preparing')
+        assert db.session.get(Order, ids[0]).status == 'pending'
+    resp = app.test_client().post('/staff/orders/status', json={'order_ids': '123', 'status': 'cancelled'})
+    assert resp.status_code == 400
+
+
+def test_string_status_column_migrated_on_startup(tmp_path):
+    path = tmp_path / 'legacy.db'
+    shutil.copy(app.root_path + '/kopernikpizza.db', path)
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE orders SET status = 'confirmed' WHERE id = (SELECT MIN(id) FROM orders)")
+    conn.commit()
+    legacy = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    conn.close()
+
+    class LegacyConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+
+    legacy_app = create_app(LegacyConfig)
+    with legacy_app.app_context():
+        columns = {row[1]: row[2] for row in db.session.execute(text("PRAGMA table_info(orders)"))}
+        assert columns['status'] == 'SMALLINT' and 'delivered_at' in columns
+        statuses = [o.status for o in Order.query.all()]
+        assert len(statuses) == legacy and set(statuses) <= {'pending', 'preparing', 'delivered'}
+        db.session.remove()
+        db.engine.dispose()
@@ -1,4 +1,3 @@
-import pytest
 from datetime import datetime, timedelta, date
 
 from app import app
@@ -6,16 +5,6 @@ from extensions import db
 from models import Customer, Pizza, Ingredient, PizzaIngredient, Order, OrderItem, DiscountCode, DeliveryPerson, DeliveryZone
 
 
-@pytest.fixture(autouse=True)
-def setup_db():
-    with app.app_context():
-        db.drop_all()
-        db.create_all()
-        yield
-        db.session.remove()
-        db.drop_all()
-
-
 def seed_one_pizza():
     p = Pizza(name='Seed Pizza', description='seed')
     db.session.add(p)
@@ -0,0 +1,77 @@
+import pytest
+from datetime import datetime
+
+from app import app
+from extensions import db
+from models import Customer, Pizza, Order, OrderItem
+from report_cache import ReportCache, ReportSpec, parse_report_spec, report_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    report_cache.clear()
+
+
+def seed_orders():
+    p = Pizza(name='Range Pizza', description='test')
+    c = Customer(name='M', email='m@example.com', phone='17', address='Street 7, 00100')
+    db.session.add_all([p, c])
+    db.session.flush()
+    for when, total in [(datetime(2024, 3, 4, 12), 10.0), (datetime(2025, 3, 3, 12), 20.0),
+                        (datetime(2025, 3, 5, 12), 30.0), (datetime(2025, 3, 12, 12), 40.0)]:
+        o = Order(customer_id=c.id, order_date=when, status='delivered', total=total)
+        db.session.add(o)
+        db.session.flush()
+        db.session.add(OrderItem(order_id=o.id, item_type='pizza', item_id=p.id, pizza_id=p.id, quantity=1))
+    db.session.commit()
+
+
+def test_parse_report_spec_validates_and_normalizes():
+    spec = parse_report_spec({'from': '2025-03-01', 'to': '2025-03-07', 'granularity': 'week', 'limit': '5'})
+    assert spec == ReportSpec(datetime(2025, 3, 1), datetime(2025, 3, 8), 'week', 5)
+    assert spec.is_closed()
+    assert not ReportSpec().is_closed()
+
+    for bad in [{'from': '03/01/2025'}, {'from': '2025-03-08', 'to': '2025-03-01'},
+                {'granularity': 'hour'}, {'limit': '0'}, {'limit': 'many'}]:
+        with pytest.raises(ValueError):
+            parse_report_spec(bad)
+
+
+def test_closed_ranges_cached_and_open_ranges_invalidated():
+    cache = ReportCache(open_ttl_seconds=60)
+    calls = []
+    closed = ReportSpec(datetime(2025, 3, 1), datetime(2025, 3, 8))
+    open_spec = ReportSpec()
+
+    for _ in range(2):
+        cache.get_or_compute('r', closed, lambda: calls.append('closed'))
+        cache.get_or_compute('r', open_spec, lambda: calls.append('open'))
+    assert calls == ['closed', 'open']
+
+    cache.on_event('order_created', {'order_id': 1})
+    cache.get_or_compute('r', closed, lambda: calls.append('closed'))
+    cache.get_or_compute('r', open_spec, lambda: calls.append('open'))
+    assert calls == ['closed', 'open', 'open']
+    assert cache.stats()['closed_entries'] == 1
+
+
+def test_timeseries_endpoint_with_previous_year_comparison():
+    with app.app_context():
+        seed_orders()
+
+    client = app.test_client()
+    resp = client.get('/staff/reports/timeseries?from=2025-03-01&to=2025-03-07&compare=previous_year')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert [(row['period'], row['total_revenue']) for row in data['series']] == [('2025-03-03', 20.0), ('2025-03-05', 30.0)]
+    assert data['compare']['spec'] == {'from': '2024-03-01', 'to': '2024-03-07', 'granularity': 'day', 'limit': 3}
+    assert [row['total_revenue'] for row in data['compare']['series']] == [10.0]
+
+    weekly = client.get('/staff/reports/timeseries?from=2025-03-01&to=2025-03-31&granularity=week').get_json()
+    assert [row['total_orders'] for row in weekly['series']] == [2, 1]
+
+    summary = client.get('/staff/reports/earnings?from=2025-03-01&to=2025-03-31').get_json()['monthly_summary']
+    assert summary['total_orders'] == 3 and summary['period'] == '2025-03-01 to 2025-03-31'
+
+    assert client.get('/staff/reports/top-pizzas?limit=500').status_code == 400
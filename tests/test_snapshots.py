@@ -0,0 +1,53 @@
+import threading
+
+from sqlalchemy import text
+
+from app import app, create_app
+from config import TestConfig
+from extensions import db
+from models import Customer
+from snapshots import run_reports
+
+
+def count_customers():
+    return db.session.execute(text("SELECT COUNT(*) FROM customers")).scalar()
+
+
+def test_reports_run_in_parallel_on_one_snapshot(tmp_path):
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'snapshot.db'}"
+
+    file_app = create_app(FileConfig)
+    with file_app.app_context():
+        db.create_all()
+        db.session.add(Customer(name='A', email='a@example.com', phone='1', address='Street 1, 00100'))
+        db.session.commit()
+        assert db.session.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+
+        threads = set()
+
+        def commit_then_count():
+            threads.add(threading.get_ident())
+            # committed on another connection after the snapshot was taken
+            with db.engine.begin() as conn:
+                conn.execute(text("INSERT INTO customers (name, email, phone, address) "
+                                  "VALUES ('B', 'b@example.com', '2', 'Street 2, 00100')"))
+            return count_customers()
+
+        def count():
+            threads.add(threading.get_ident())
+            return count_customers()
+
+        results = run_reports({'writer': commit_then_count, 'reader': count})
+        assert results == {'writer': 1, 'reader': 1}
+        assert threading.get_ident() not in threads
+        assert count_customers() == 2
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_in_memory_database_runs_reports_in_order():
+    calls = []
+    with app.app_context():
+        results = run_reports({'a': lambda: calls.append('a') or 1, 'b': lambda: calls.append('b') or 2})
+    assert results == {'a': 1, 'b': 2} and calls == ['a', 'b']
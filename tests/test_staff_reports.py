@@ -0,0 +1,138 @@
+from datetime import datetime, date
+
+from sqlalchemy import text
+
+from app import app
+from extensions import db
+from models import Customer, Pizza, Order, OrderItem, DimCustomer
+from dimensions import refresh_dim_customer
+from staff_reports import (
+    get_earnings_by_gender, get_earnings_by_age_group,
+    get_earnings_by_postal_code, get_earnings_breakdowns, get_monthly_summary
+)
+from report_schema import ensure_report_indexes, REPORT_INDEXES
+
+
+def seed_orders():
+    p = Pizza(name='Report Pizza', description='test')
+    db.session.add(p)
+    customers = [
+        Customer(name='G', email='g@example.com', phone='11', address='Street 1, 00100', birthday=date(1990, 5, 12)),
+        Customer(name='H', email='h@example.com', phone='12', address='Street 2, 20100', birthday=date(1960, 1, 1)),
+        Customer(name='I', email='i@example.com', phone='13', address='Street 3, 80100'),
+    ]
+    db.session.add_all(customers)
+    db.session.flush()
+    for i, total in enumerate([10.0, 12.5, 30.0, 7.25, 18.0]):
+        c = customers[i % len(customers)]
+        o = Order(customer_id=c.id, order_date=datetime.utcnow(), status='pending', total=total)
+        db.session.add(o)
+        db.session.flush()
+        db.session.add(OrderItem(order_id=o.id, item_type='pizza', item_id=p.id, pizza_id=p.id, quantity=1))
+    db.session.commit()
+
+
+def by_key(rows, key):
+    return {row[key]: row for row in rows}
+
+
+def test_breakdowns_match_individual_reports():
+    with app.app_context():
+        seed_orders()
+        refresh_dim_customer()
+        combined = get_earnings_breakdowns()
+        assert {row['postal_code'] for row in combined['by_postal_code']} == {'00100', '20100', '80100'}
+
+        assert by_key(combined['by_gender'], 'gender') == by_key(get_earnings_by_gender(), 'gender')
+        assert by_key(combined['by_age_group'], 'age_group') == by_key(get_earnings_by_age_group(), 'age_group')
+        assert by_key(combined['by_postal_code'], 'postal_code') == by_key(get_earnings_by_postal_code(), 'postal_code')
+
+
+def test_monthly_summary_counts_each_order_once():
+    with app.app_context():
+        p = Pizza(name='Summary Pizza', description='test')
+        c = Customer(name='J', email='j@example.com', phone='14', address='Street 4, 30100')
+        db.session.add_all([p, c])
+        db.session.flush()
+        o = Order(customer_id=c.id, order_date=datetime.utcnow(), status='pending', total=20.0)
+        db.session.add(o)
+        db.session.flush()
+        db.session.add_all([
+            OrderItem(order_id=o.id, item_type='pizza', item_id=p.id, pizza_id=p.id, quantity=2),
+            OrderItem(order_id=o.id, item_type='drink', item_id=1, quantity=3),
+        ])
+        db.session.commit()
+
+        summary = get_monthly_summary()
+        assert summary['total_orders'] == 1
+        assert summary['total_revenue'] == 20.0
+        assert summary['avg_order_value'] == 20.0
+        assert summary['total_pizzas_sold'] == 2
+
+
+def test_report_indexes_added_to_existing_tables():
+    with app.app_context():
+        for name in REPORT_INDEXES:
+            db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        ensure_report_indexes()
+        indexes = {row[0] for row in db.session.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+        assert set(REPORT_INDEXES) <= indexes
+
+
+def test_dim_customer_synced_on_write_and_queued_for_raw_sql():
+    with app.app_context():
+        seed_orders()
+        # ORM commits sync their customers in the same transaction
+        assert db.session.query(DimCustomer).count() == 3
+        assert refresh_dim_customer()['upserted'] == 0
+
+        c = Customer(name='M', email='m@example.com', phone='17', address='Street 7, 40100', birthday=date(2001, 2, 3))
+        db.session.add(c)
+        db.session.flush()
+        db.session.add(Order(customer_id=c.id, order_date=datetime.utcnow(), status='pending', total=9.0))
+        db.session.commit()
+        dim = db.session.get(DimCustomer, c.id)
+        assert (dim.postcode, dim.postcode_prefix, dim.segment, dim.order_count) == ('40100', '401', 'new', 1)
+
+        # an edit outside the ORM is queued by the triggers and picked up by the refresh
+        db.session.execute(text("UPDATE customers SET address = 'Street 7, 50100' WHERE id = :id"), {'id': c.id})
+        db.session.commit()
+        assert refresh_dim_customer()['upserted'] == 1
+        db.session.refresh(dim)
+        assert dim.postcode == '50100'
+
+
+def test_reports_fall_back_to_customers_not_yet_synced():
+    with app.app_context():
+        seed_orders()
+        db.session.execute(text(
+            "INSERT INTO customers (name, email, phone, address, birthday) "
+            "VALUES ('Raw', 'raw@example.com', '18', 'Street 8, 60100', '1990-05-12')"))
+        db.session.execute(text(
+            "INSERT INTO orders (customer_id, order_date, status, total) "
+            "SELECT id, :now, 0, 40.0 FROM customers WHERE email = 'raw@example.com'"), {'now': datetime.utcnow()})
+        db.session.commit()
+
+        before = get_earnings_breakdowns()
+        assert sum(row['total_earnings'] for row in before['by_gender']) == 77.75 + 40.0
+        assert by_key(before['by_postal_code'], 'postal_code')['60100']['total_earnings'] == 40.0
+        refresh_dim_customer()
+        assert get_earnings_breakdowns() == before
+
+
+def test_queued_customers_grouped_by_the_dim_customer_rules():
+    with app.app_context():
+        seed_orders()
+        db.session.execute(text(
+            "INSERT INTO customers (name, email, phone, address) "
+            "VALUES ('Mid', 'mid@example.com', '19', 'Via Roma 12345 Milano')"))
+        db.session.execute(text(
+            "INSERT INTO orders (customer_id, order_date, status, total) "
+            "SELECT id, :now, 0, 25.0 FROM customers WHERE email = 'mid@example.com'"), {'now': datetime.utcnow()})
+        db.session.commit()
+
+        queued = by_key(get_earnings_by_postal_code(), 'postal_code')
+        assert queued['12345']['total_earnings'] == 25.0 and queued['12345']['unique_customers'] == 1
+        assert by_key(get_earnings_breakdowns()['by_postal_code'], 'postal_code') == queued
+        refresh_dim_customer()
+        assert by_key(get_earnings_by_postal_code(), 'postal_code') == queued
@@ -0,0 +1,59 @@
+import json
+import logging
+
+from app import app
+from extensions import db
+from models import Customer, Pizza, Ingredient, PizzaIngredient
+from structured_logging import JsonFormatter, init_logging
+
+
+def seed():
+    with app.app_context():
+        cheese = Ingredient(name='Mozzarella', cost_per_unit=2.0)
+        pizza = Pizza(name='Log Pizza', description='')
+        customer = Customer(name='L', email='log@example.com', phone='51', address='Street 1, 00100')
+        db.session.add_all([cheese, pizza, customer])
+        db.session.flush()
+        db.session.add(PizzaIngredient(pizza_id=pizza.id, ingredient_id=cheese.id, quantity=1.0))
+        db.session.commit()
+        return {'customer_id': customer.id, 'items': [{'item_type': 'pizza', 'item_id': pizza.id, 'quantity': 1}]}
+
+
+def order_events(records):
+    return [r for r in records if r.name == 'transactions']
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.LogRecord('transactions', logging.INFO, __file__, 1, 'order %s committed', (7,), None)
+    record.event = 'order.committed'
+    record.order_id = 7
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry['message'] == 'order 7 committed'
+    assert entry['level'] == 'INFO' and entry['logger'] == 'transactions'
+    assert entry['event'] == 'order.committed' and entry['order_id'] == 7
+    assert 'args' not in entry and 'msg' not in entry
+
+
+def test_order_step_lines_are_sampled(caplog):
+    payload = seed()
+    client = app.test_client()
+    try:
+        with caplog.at_level(logging.INFO, logger='transactions'):
+            init_logging({'ORDER_LOG_SAMPLE_RATE': 0.0})
+            assert client.post('/orders', json=payload).status_code == 201
+            unsampled = order_events(caplog.records)
+            caplog.clear()
+
+            init_logging({'ORDER_LOG_SAMPLE_RATE': 1.0})
+            assert client.post('/orders', json=payload).status_code == 201
+            sampled = order_events(caplog.records)
+    finally:
+        init_logging(app.config)
+
+    assert [r.event for r in unsampled] == ['order.no_courier', 'order.committed']
+    steps = [r.step for r in sampled if r.event == 'order.step']
+    assert steps == ['customer', 'validation', 'order_insert', 'items', 'discount_code',
+                     'pricing', 'redemption', 'dispatch', 'commit']
+    committed = sampled[-1]
+    assert committed.event == 'order.committed' and committed.order_id and committed.total > 0
+    assert set(committed.steps_ms) == set(steps) and committed.ms >= 0
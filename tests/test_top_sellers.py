@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from app import app
+from extensions import db
+from models import Customer, Pizza, Drink, Order, OrderItem
+from top_sellers import SlidingWindowCounter, TopSellers
+
+
+def test_sliding_window_evicts_expired_buckets():
+    counter = SlidingWindowCounter()
+    now = 10_000_000
+    counter.add(now - 90, item_id=1, quantity=5)   # outside the hour, inside the day
+    counter.add(now - 30, item_id=2, quantity=3)
+    counter.add(now, item_id=1, quantity=1)
+
+    assert counter.window('hour')[0] == {2: 3, 1: 1}
+    assert counter.window('day')[0] == {1: 6, 2: 3}
+    assert counter.range_totals(now - 119, now)[0] == {1: 6, 2: 3}
+
+    counter.advance(now + 40)
+    assert counter.window('hour')[0] == {1: 1}
+    assert counter.range_totals(now - 20, now + 40)[0] == {1: 1}
+
+
+def test_warm_start_and_live_events():
+    with app.app_context():
+        p1 = Pizza(name='Margherita', description='')
+        p2 = Pizza(name='Pepperoni', description='')
+        d = Drink(name='Water', price=1.5)
+        c = Customer(name='K', email='k@example.com', phone='15', address='Street 5, 00100')
+        db.session.add_all([p1, p2, d, c])
+        db.session.flush()
+        now = datetime.utcnow()
+        for when, pizza, qty in [(now - timedelta(minutes=5), p1, 2),
+                                 (now - timedelta(hours=3), p2, 5)]:
+            o = Order(customer_id=c.id, order_date=when, status='pending', total=10)
+            db.session.add(o)
+            db.session.flush()
+            db.session.add(OrderItem(order_id=o.id, item_type='pizza', item_id=pizza.id, pizza_id=pizza.id, quantity=qty))
+            db.session.add(OrderItem(order_id=o.id, item_type='drink', item_id=d.id, quantity=1))
+        db.session.commit()
+
+        engine = TopSellers()
+        engine.warm_start()
+
+        hour = engine.top('pizza', 'hour')
+        assert [(row['name'], row['total_sold']) for row in hour] == [('Margherita', 2)]
+        day = engine.top('pizza', 'day')
+        assert [(row['name'], row['total_sold']) for row in day] == [('Pepperoni', 5), ('Margherita', 2)]
+        assert engine.top('drink', 'week')[0]['total_sold'] == 2
+
+        engine.on_event('order_created', {
+            'order_id': 999,
+            'order_date': now,
+            'items': [{'item_type': 'pizza', 'item_id': p2.id, 'quantity': 4}]
+        })
+        hour = engine.top('pizza', 'hour')
+        assert [(row['name'], row['total_sold']) for row in hour] == [('Pepperoni', 4), ('Margherita', 2)]
+        assert engine.top('pizza', '30')[0]['total_sold'] == 4
@@ -0,0 +1,92 @@
+import json
+import os
+import time
+import pytest
+
+from app import app
+from catalog import catalog_cache
+from extensions import db
+from models import Customer, Pizza, Ingredient, PizzaIngredient
+from tracing import start_trace, span, trace_filename, _writes
+from transactions import create_order_transaction
+from staff_reports import get_monthly_summary
+
+
+@pytest.fixture
+def tracing_config(tmp_path):
+    saved = {k: app.config[k] for k in ('TRACE_ENABLED', 'TRACE_SAMPLE_RATE', 'TRACE_SLOW_MS', 'TRACE_DIR')}
+    app.config.update(TRACE_ENABLED=True, TRACE_SAMPLE_RATE=0.0, TRACE_SLOW_MS=10_000, TRACE_DIR=str(tmp_path))
+    yield tmp_path
+    app.config.update(saved)
+
+
+def seed():
+    cheese = Ingredient(name='Mozzarella', cost_per_unit=2.0)
+    pizza = Pizza(name='Trace Pizza', description='')
+    customer = Customer(name='T', email='trace@example.com', phone='61', address='Street 1, 00100')
+    db.session.add_all([cheese, pizza, customer])
+    db.session.flush()
+    db.session.add(PizzaIngredient(pizza_id=pizza.id, ingredient_id=cheese.id, quantity=1.0))
+    db.session.commit()
+    return {'customer_id': customer.id, 'items': [{'item_type': 'pizza', 'item_id': pizza.id, 'quantity': 1}]}
+
+
+def wait_for_files(directory, count=1, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        files = sorted(os.listdir(directory))
+        if len(files) >= count and _writes.empty():
+            return files
+        time.sleep(0.02)
+    return sorted(os.listdir(directory))
+
+
+def test_order_pipeline_spans_nest_under_the_order():
+    with app.app_context():
+        payload = seed()
+    with app.app_context():
+        with start_trace('script') as trace:
+            with span('outer', note='x') as attrs:
+                attrs['extra'] = 1
+                assert create_order_transaction(payload)['success']
+            get_monthly_summary()
+
+    spans = {s['name']: s for s in trace.spans}
+    root, outer, order = spans['script'], spans['outer'], spans['order.create']
+    assert outer['parent'] == root['id'] and outer['attributes'] == {'note': 'x', 'extra': 1}
+    assert order['parent'] == outer['id']
+    for child in ('order.step.customer', 'order.step.commit', 'order.apply_discounts',
+                  'order.assign_delivery_person'):
+        assert spans[child]['parent'] == order['id'], child
+    assert spans['report.monthly_summary']['parent'] == root['id']
+    sql = [s for s in trace.spans if s['category'] == 'sql']
+    assert sql and all(s['attributes']['statement'] for s in sql)
+
+    events = trace.to_chrome()['traceEvents']
+    complete = [e for e in events if e['ph'] == 'X']
+    assert len(complete) == len(trace.spans)
+    assert all(e['dur'] >= 0 and e['ts'] >= 0 for e in complete)
+
+
+def test_requests_written_only_when_slow_or_sampled(tracing_config):
+    client = app.test_client()
+    assert client.get('/menu').status_code == 200
+    assert wait_for_files(tracing_config, timeout=0.3) == []
+
+    app.config['TRACE_SLOW_MS'] = 0
+    catalog_cache.invalidate()
+    assert client.get('/menu').status_code == 200
+    files = wait_for_files(tracing_config)
+    assert len(files) == 1 and '_slow_GET-menu' in files[0]
+    with open(tracing_config / files[0]) as f:
+        data = json.load(f)
+    names = [e['name'] for e in data['traceEvents'] if e['ph'] == 'X']
+    assert names[0] == 'GET /menu' and 'sql' in names
+    assert data['otherData']['path'] == '/menu'
+
+
+def test_trace_filename_is_safe():
+    with start_trace('GET /staff/export/orders.csv') as trace:
+        pass
+    name = trace_filename(trace, 'sampled')
+    assert name.endswith('_sampled_GET-staff-export-orders-csv.json') and '/' not in name
@@ -0,0 +1,276 @@
+"""
+Top Sellers Module
+In-memory sliding-window counters for "top sellers in the last hour,
+today, this week" across pizzas, drinks and desserts.
+
+- Per-minute buckets with hourly roll-ups per item type
+- Running totals for the named windows (hour/day/week), kept current
+  as buckets slide out, so those queries never touch SQL
+- Fed from committed orders through the order event broker
+- Warm-started from the database on first use
+"""
+
+from extensions import db
+from models import Pizza, Drink, Dessert
+from sqlalchemy import text
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+import heapq
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+ITEM_TYPES = ('pizza', 'drink', 'dessert')
+ITEM_MODELS = {'pizza': Pizza, 'drink': Drink, 'dessert': Dessert}
+
+# Named sliding windows, in minutes
+WINDOWS = {
+    'hour': 60,
+    'day': 24 * 60,
+    'week': 7 * 24 * 60
+}
+RETENTION_MINUTES = WINDOWS['week']
+
+
+def _minute_of(moment: datetime) -> int:
+    return int((moment - datetime(1970, 1, 1)).total_seconds() // 60)
+
+
+class SlidingWindowCounter:
+    """
+    Sliding-window item counter for a single item type.
+
+    Each bucket holds Counter[item_id] of quantities and of order lines.
+    Named windows keep running totals that are adjusted as buckets enter
+    and leave the window; arbitrary windows add up whole hours plus the
+    partial minutes at both edges.
+    """
+
+    def __init__(self, retention_minutes: int = RETENTION_MINUTES):
+        self.retention_minutes = retention_minutes
+        self.minutes: Dict[int, Tuple[Counter, Counter]] = {}
+        self.hours: Dict[int, Tuple[Counter, Counter]] = {}
+        self.window_totals = {name: (Counter(), Counter()) for name in WINDOWS}
+        self.now_minute: Optional[int] = None
+
+    def add(self, minute: int, item_id: int, quantity: int, line_count: int = 1) -> None:
+        if self.now_minute is not None and minute <= self.now_minute - self.retention_minutes:
+            return
+
+        for buckets, key in ((self.minutes, minute), (self.hours, minute // 60)):
+            qty, lines = buckets.setdefault(key, (Counter(), Counter()))
+            qty[item_id] += quantity
+            lines[item_id] += line_count
+
+        if self.now_minute is None or minute > self.now_minute:
+            self.advance(minute)
+        for name, size in WINDOWS.items():
+            if minute > self.now_minute - size:
+                qty, lines = self.window_totals[name]
+                qty[item_id] += quantity
+                lines[item_id] += line_count
+
+    def advance(self, now_minute: int) -> None:
+        """Slide every window forward to now_minute, evicting expired buckets."""
+        previous = self.now_minute
+        if previous is not None and now_minute <= previous:
+            return
+        self.now_minute = now_minute
+
+        if previous is not None:
+            for name, size in WINDOWS.items():
+                qty, lines = self.window_totals[name]
+                for minute in self._minutes_between(previous - size + 1, now_minute - size + 1):
+                    bucket = self.minutes.get(minute)
+                    if bucket:
+                        qty.subtract(bucket[0])
+                        lines.subtract(bucket[1])
+                # drop zeroed entries so top-K only sees live items
+                for counter in (qty, lines):
+                    for item_id in [k for k, v in counter.items() if v <= 0]:
+                        del counter[item_id]
+
+        cutoff = now_minute - self.retention_minutes
+        for minute in [m for m in self.minutes if m <= cutoff]:
+            del self.minutes[minute]
+        for hour in [h for h in self.hours if (h + 1) * 60 - 1 <= cutoff]:
+            del self.hours[hour]
+
+    def _minutes_between(self, start: int, end: int):
+        """Bucket minutes in [start, end), without walking long idle gaps."""
+        if end - start > len(self.minutes):
+            return sorted(m for m in self.minutes if start <= m < end)
+        return range(start, end)
+
+    def window(self, name: str) -> Tuple[Counter, Counter]:
+        return self.window_totals[name]
+
+    def range_totals(self, start_minute: int, end_minute: int) -> Tuple[Counter, Counter]:
+        """Totals for minutes in [start_minute, end_minute]."""
+        qty, lines = Counter(), Counter()
+        first_full_hour = -(-start_minute // 60)
+        last_full_hour = (end_minute + 1) // 60 - 1
+
+        if first_full_hour > last_full_hour:
+            edges = [(start_minute, end_minute)]
+        else:
+            edges = [(start_minute, first_full_hour * 60 - 1), ((last_full_hour + 1) * 60, end_minute)]
+            for hour in range(first_full_hour, last_full_hour + 1):
+                bucket = self.hours.get(hour)
+                if bucket:
+                    qty.update(bucket[0])
+                    lines.update(bucket[1])
+
+        for start, end in edges:
+            for minute in self._minutes_between(start, end + 1):
+                bucket = self.minutes.get(minute)
+                if bucket:
+                    qty.update(bucket[0])
+                    lines.update(bucket[1])
+        return qty, lines
+
+
+class TopSellers:
+    """Sliding-window top-K sellers for every item type."""
+
+    def __init__(self, retention_minutes: int = RETENTION_MINUTES):
+        self.retention_minutes = retention_minutes
+        self.counters = {t: SlidingWindowCounter(retention_minutes) for t in ITEM_TYPES}
+        self.names: Dict[Tuple[str, int], str] = {}
+        self.warm = False
+        self.warming = False
+        self.warm_order_id = 0
+        self._pending_events: List[Dict[str, Any]] = []
+        self._lock = threading.RLock()
+
+    def record(self, item_type: str, item_id: int, quantity: int, when: Optional[datetime] = None) -> None:
+        counter = self.counters.get(item_type)
+        if counter is None:
+            return
+        with self._lock:
+            counter.add(_minute_of(when or datetime.utcnow()), item_id, quantity)
+
+    def on_event(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Order broker listener: count items of newly committed orders."""
+        if event_type != 'order_created':
+            return
+        with self._lock:
+            if self.warming:
+                # The warm-start query may or may not see this order yet
+                self._pending_events.append(data)
+            elif self.warm:
+                self._record_order(data)
+            # Before warm-up the order is already committed and will be loaded
+
+    def _record_order(self, data: Dict[str, Any]) -> None:
+        if (data.get('order_id') or 0) <= self.warm_order_id:
+            return
+        when = data.get('order_date') or datetime.utcnow()
+        for item in data.get('items', []):
+            self.record(item['item_type'], item['item_id'], item['quantity'] or 0, when)
+
+    def warm_start(self) -> None:
+        """Load the retention window of order lines from the database."""
+        with self._lock:
+            self.warming = True
+        since = datetime.utcnow() - timedelta(minutes=self.retention_minutes)
+        max_order_id = db.session.execute(text("SELECT COALESCE(MAX(id), 0) FROM orders")).scalar()
+
+        sql = text("""
+            SELECT
+                CAST(strftime('%s', o.order_date) AS INTEGER) / 60 as minute,
+                oi.item_type,
+                oi.item_id,
+                SUM(oi.quantity) as quantity,
+                COUNT(*) as line_count
+            FROM orders o
+            JOIN order_items oi ON oi.order_id = o.id
+            WHERE o.order_date >= :since
+              AND o.id <= :max_order_id
+            GROUP BY minute, oi.item_type, oi.item_id
+            ORDER BY minute
+        """)
+        rows = db.session.execute(sql, {'since': since, 'max_order_id': max_order_id}).fetchall()
+        names = {
+            (item_type, item_id): name
+            for item_type, model in ITEM_MODELS.items()
+            for item_id, name in db.session.query(model.id, model.name)
+        }
+
+        with self._lock:
+            self.counters = {t: SlidingWindowCounter(self.retention_minutes) for t in ITEM_TYPES}
+            self.names = names
+            now_minute = _minute_of(datetime.utcnow())
+            for counter in self.counters.values():
+                counter.advance(now_minute)
+            for minute, item_type, item_id, quantity, line_count in rows:
+                counter = self.counters.get(item_type)
+                if counter is None or minute is None:
+                    continue
+                counter.add(minute, item_id, quantity, line_count)
+
+            self.warm_order_id = max_order_id
+            self.warm = True
+            self.warming = False
+            pending, self._pending_events = self._pending_events, []
+            for data in pending:
+                self._record_order(data)
+        logger.info(f"Top sellers warm-started with {len(rows)} buckets up to order {max_order_id}")
+
+    def ensure_warm(self) -> None:
+        if not self.warm:
+            self.warm_start()
+
+    def top(self, item_type: str = 'pizza', window: Any = 'hour', limit: int = 3) -> List[Dict[str, Any]]:
+        """
+        Top `limit` items of a type for a window: 'hour', 'day', 'week',
+        'today' (since midnight UTC) or a number of minutes.
+        """
+        if item_type not in self.counters:
+            raise ValueError(f"Invalid item type: {item_type}")
+
+        with self._lock:
+            counter = self.counters[item_type]
+            now_minute = _minute_of(datetime.utcnow())
+            counter.advance(now_minute)
+
+            if window in WINDOWS:
+                qty, lines = counter.window(window)
+            else:
+                if window == 'today':
+                    start = _minute_of(datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0))
+                else:
+                    minutes = int(window)
+                    if minutes <= 0 or minutes > self.retention_minutes:
+                        raise ValueError(f"Window must be between 1 and {self.retention_minutes} minutes")
+                    start = now_minute - minutes + 1
+                qty, lines = counter.range_totals(start, now_minute)
+
+            best = heapq.nlargest(limit, qty.items(), key=lambda kv: (kv[1], -kv[0]))
+            lines = {item_id: lines[item_id] for item_id, _ in best}
+
+        return [{
+            'item_type': item_type,
+            'item_id': item_id,
+            'name': self.item_name(item_type, item_id),
+            'total_sold': total,
+            'orders_count': lines[item_id],
+            'avg_per_order': total / lines[item_id] if lines[item_id] else 0
+        } for item_id, total in best]
+
+    def item_name(self, item_type: str, item_id: int) -> str:
+        key = (item_type, item_id)
+        if key not in self.names:
+            item = db.session.get(ITEM_MODELS[item_type], item_id)
+            self.names[key] = item.name if item else f"Unknown {item_type}"
+        return self.names[key]
+
+
+top_sellers = TopSellers()
+
+
+def init_top_sellers(broker) -> None:
+    """Feed the top sellers engine from committed orders."""
+    broker.add_listener(top_sellers.on_event)
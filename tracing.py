@@ -0,0 +1,249 @@
+"""
+Tracing Module
+Lightweight spans for the order pipeline, SQL statements and staff reports,
+written as Chrome Trace Event files (open in chrome://tracing or Perfetto,
+or convert to a flamegraph).
+
+Every request is recorded while TRACE_ENABLED; the trace is written to
+TRACE_DIR when the request was sampled (TRACE_SAMPLE_RATE) or took longer
+than TRACE_SLOW_MS, so slow outliers are always captured. Outside a
+request, start_trace() records a trace explicitly (scripts, tests).
+"""
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+import functools
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_trace: ContextVar[Optional['Trace']] = ContextVar('trace', default=None)
+_span: ContextVar[Optional[int]] = ContextVar('span', default=None)
+_span_ids = itertools.count(1)
+
+
+class Trace:
+    """Spans recorded for one request or script run."""
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.started_at = datetime.now(timezone.utc)
+        self.origin = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, duration: float, parent: Optional[int],
+            span_id: Optional[int] = None, category: str = 'app', **attributes) -> int:
+        """Record a finished span; start is a time.perf_counter() value."""
+        span_id = span_id or next(_span_ids)
+        with self._lock:
+            self.spans.append({
+                'id': span_id, 'parent': parent, 'name': name, 'category': category,
+                'start': start, 'duration': duration, 'thread': threading.get_ident(),
+                'attributes': attributes
+            })
+        return span_id
+
+    def duration(self) -> float:
+        return time.perf_counter() - self.origin
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Chrome Trace Event format: one complete ('X') event per span, times in microseconds."""
+        pid = os.getpid()
+        events = [{
+            'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread,
+            'args': {'name': f'thread {thread}'}
+        } for thread in sorted({s['thread'] for s in self.spans})]
+        for s in sorted(self.spans, key=lambda s: s['start']):
+            events.append({
+                'name': s['name'], 'cat': s['category'], 'ph': 'X', 'pid': pid, 'tid': s['thread'],
+                'ts': round((s['start'] - self.origin) * 1e6, 3),
+                'dur': round(s['duration'] * 1e6, 3),
+                'args': {'span_id': s['id'], 'parent_id': s['parent'], **s['attributes']}
+            })
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'trace': self.name, 'started_at': self.started_at.isoformat(), **self.attributes}
+        }
+
+    def write(self, path: str) -> str:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome(), f, default=str)
+        return path
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """Record spans in the current context into a new Trace (yielded) until exit."""
+    trace = Trace(name, **attributes)
+    trace_token = _trace.set(trace)
+    span_token = _span.set(None)
+    try:
+        with span(name, category='root', **attributes):
+            yield trace
+    finally:
+        _span.reset(span_token)
+        _trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, category: str = 'app', **attributes):
+    """
+    Time the enclosed block as a child of the current span. Yields the
+    attribute dict so callers can add results; a no-op when not tracing.
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield attributes
+        return
+    span_id = next(_span_ids)
+    parent = _span.get()
+    token = _span.set(span_id)
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except Exception as e:
+        attributes['error'] = type(e).__name__
+        raise
+    finally:
+        _span.reset(token)
+        trace.add(name, start, time.perf_counter() - start, parent, span_id, category, **attributes)
+
+
+def add_span(name: str, start: float, duration: float, category: str = 'app', **attributes) -> None:
+    """Record an already finished block (start from time.perf_counter()) under the current span."""
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(name, start, duration, _span.get(), category=category, **attributes)
+
+
+def traced(name: str, category: str = 'app'):
+    """Decorator: run the function inside a span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# -- SQL statements ------------------------------------------------------
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _trace.get() is not None:
+        conn.info.setdefault('trace_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('trace_started')
+    if started:
+        start = started.pop()
+        add_span('sql', start, time.perf_counter() - start, category='sql',
+                 statement=' '.join(statement.split())[:500], executemany=executemany)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('trace_started'):
+        conn.info['trace_started'].pop()
+
+
+# -- requests -------------------------------------------------------------
+
+_writes: 'queue.SimpleQueue' = queue.SimpleQueue()
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+
+def _write_loop():
+    while True:
+        trace, path = _writes.get()
+        try:
+            trace.write(path)
+        except OSError as e:
+            logger.warning(f"Could not write trace {path}: {e}")
+
+
+def _write_async(trace: Trace, path: str) -> None:
+    """Hand the file write to a background thread, off the request path."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name='trace-writer', daemon=True)
+            _writer.start()
+    _writes.put((trace, path))
+
+
+def _reset_writer_in_child() -> None:
+    # the writer thread does not survive fork(); the next write starts a new one
+    global _writes, _writer, _writer_lock
+    _writes, _writer, _writer_lock = queue.SimpleQueue(), None, threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_writer_in_child)
+
+
+def trace_filename(trace: Trace, reason: str) -> str:
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', trace.name).strip('-')[:60]
+    return f"{trace.started_at:%Y%m%dT%H%M%S_%f}_{reason}_{slug}.json"
+
+
+def _before_request():
+    if not current_app.config['TRACE_ENABLED']:
+        return
+    context = start_trace(f'{request.method} {request.path}', method=request.method, path=request.full_path.rstrip('?'))
+    trace = context.__enter__()
+    request.environ['kopernik.trace'] = (context, trace)
+
+
+def _teardown_request(exc):
+    active = request.environ.pop('kopernik.trace', None)
+    if active is None:
+        return
+    context, trace = active
+    context.__exit__(None, None, None)
+
+    config = current_app.config
+    if trace.duration() * 1000 >= config['TRACE_SLOW_MS']:
+        reason = 'slow'
+    elif random.random() < config['TRACE_SAMPLE_RATE']:
+        reason = 'sampled'
+    else:
+        return
+    _write_async(trace, os.path.join(config['TRACE_DIR'], trace_filename(trace, reason)))
+
+
+def init_tracing(app) -> None:
+    """Trace every request; keep sampled and slow ones as Chrome trace files."""
+    app.config.setdefault('TRACE_ENABLED', False)
+    app.config.setdefault('TRACE_SAMPLE_RATE', 0.0)
+    app.config.setdefault('TRACE_SLOW_MS', 1000)
+    app.config.setdefault('TRACE_DIR', 'traces')
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
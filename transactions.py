@@ -7,12 +7,15 @@ for order placement and other critical operations.
 from extensions import db
 from models import Order, OrderItem, Customer, Pizza, DiscountCode, Drink, Dessert
 from utils import apply_discounts, assign_delivery_person_sql
+from metrics import StepTimer, ORDER_SECONDS, ORDERS_TOTAL, ORDER_ROLLBACKS_TOTAL, COURIER_NOT_FOUND_TOTAL
+from structured_logging import sample_order_logs
+from tracing import traced, add_span
+from customers import normalize_email, normalize_phone, find_customer
 from datetime import datetime
 from typing import Dict, Any, Optional
 import logging
+import time
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -21,6 +24,7 @@ class OrderTransactionError(Exception):
     pass
 
 
+@traced('order.create')
 def create_order_transaction(order_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Create an order using proper database transactions with rollback capability.
@@ -34,14 +38,27 @@ def create_order_transaction(order_data: Dict[str, Any]) -> Dict[str, Any]:
     Raises:
         OrderTransactionError: When order creation fails
     """
+    steps = StepTimer()
+    log_steps = sample_order_logs()
+    fields: Dict[str, Any] = {}
+
+    def step(name: str, **details) -> None:
+        # time the step; log it (with everything known so far) if this order is sampled
+        elapsed = steps.lap(name)
+        fields.update(details)
+        add_span(f'order.step.{name}', time.perf_counter() - elapsed, elapsed, **details)
+        if log_steps:
+            logger.info(f"order step {name}", extra={
+                'event': 'order.step', 'step': name, 'ms': round(elapsed * 1000, 3), **fields
+            })
+
     try:
         # Start transaction
         db.session.begin()
-        logger.info("🔄 Starting order transaction")
         
         # Step 1: Resolve or create customer
         customer = _resolve_customer(order_data)
-        logger.info(f"✅ Customer resolved: {customer.name} (ID: {customer.id})")
+        step('customer', customer_id=customer.id)
         
         # Step 2: Validate items
         items = order_data.get('items', [])
@@ -49,7 +66,7 @@ def create_order_transaction(order_data: Dict[str, Any]) -> Dict[str, Any]:
             raise OrderTransactionError("No items in order")
             
         _validate_order_items(items)
-        logger.info(f"✅ Validated {len(items)} order items")
+        step('validation', items_count=len(items))
         
         # Step 3: Create order
         order = Order(
@@ -59,7 +76,7 @@ def create_order_transaction(order_data: Dict[str, Any]) -> Dict[str, Any]:
         )
         db.session.add(order)
         db.session.flush()  # Get order.id
-        logger.info(f"✅ Order created with ID: {order.id}")
+        step('order_insert', order_id=order.id)
         
         # Step 4: Create order items
         for item_data in items:
@@ -101,31 +118,30 @@ def create_order_transaction(order_data: Dict[str, Any]) -> Dict[str, Any]:
             )
             db.session.add(order_item)
         
-        logger.info(f"✅ Created {len(items)} order items")
+        step('items')
         
         # Step 5: Handle discount code
         discount_code = None
         if order_data.get('discount_code'):
             discount_code = _validate_discount_code(order_data['discount_code'])
-            logger.info(f"✅ Discount code validated: {discount_code.code}")
+        step('discount_code', discount_code=discount_code.code if discount_code else None)
         
         # Step 6: Calculate total with discounts
         total = apply_discounts(order, discount_code)
         order.total = total
-        logger.info(f"✅ Order total calculated: €{total:.2f}")
+        step('pricing', total=total)
         
         # Step 7: Mark discount code as used (if applicable)
         if discount_code and not discount_code.is_used:
             discount_code.is_used = True
             db.session.add(discount_code)
-            logger.info("✅ Discount code marked as used")
+        step('redemption')
         
         # Step 8: Assign delivery person
         delivery_person = assign_delivery_person_sql(order)
-        if delivery_person:
-            logger.info(f"✅ Delivery person assigned: {delivery_person.name}")
-        else:
-            logger.warning("⚠️  No delivery person available")
+        if not delivery_person:
+            logger.warning("No delivery person available", extra={'event': 'order.no_courier', **fields})
+        step('dispatch', delivery_person_id=delivery_person.id if delivery_person else None)
         
         # Step 9: Final validation before commit
         if total < 0:
@@ -136,7 +152,15 @@ def create_order_transaction(order_data: Dict[str, Any]) -> Dict[str, Any]:
         
         # Commit transaction
         db.session.commit()
-        logger.info("✅ Transaction committed successfully")
+        step('commit')
+        ORDERS_TOTAL.inc()
+        if not delivery_person:
+            COURIER_NOT_FOUND_TOTAL.inc()
+        ORDER_SECONDS.observe(steps.total(), outcome='committed')
+        logger.info(f"order {order.id} committed", extra={
+            'event': 'order.committed', 'ms': round(steps.total() * 1000, 3),
+            'steps_ms': {name: round(t * 1000, 3) for name, t in steps.laps.items()}, **fields
+        })
         
         return {
             'success': True,
@@ -152,7 +176,12 @@ def create_order_transaction(order_data: Dict[str, Any]) -> Dict[str, Any]:
     except Exception as e:
         # Rollback transaction on any error
         db.session.rollback()
-        logger.error(f"❌ Transaction rolled back: {str(e)}")
+        ORDER_ROLLBACKS_TOTAL.inc(error_type=type(e).__name__)
+        ORDER_SECONDS.observe(steps.total(), outcome='rolled_back')
+        logger.error(f"order transaction rolled back: {e}", extra={
+            'event': 'order.rolled_back', 'error_type': type(e).__name__,
+            'ms': round(steps.total() * 1000, 3), **fields
+        })
         
         return {
             'success': False,
@@ -174,11 +203,14 @@ def _resolve_customer(order_data: Dict[str, Any]) -> Customer:
     if not customer_data:
         raise OrderTransactionError("Customer information required")
     
-    # Check if customer already exists
-    existing = Customer.query.filter(
-        (Customer.email == customer_data.get('email')) | 
-        (Customer.phone == customer_data.get('phone'))
-    ).first()
+    # Same normalization as customer_import, so imported customers are found
+    raw_email = customer_data.get('email')
+    raw_phone = customer_data.get('phone')
+    email = normalize_email(raw_email) or raw_email
+    phone = normalize_phone(raw_phone) or raw_phone
+
+    # Check if customer already exists (including rows stored before normalization)
+    existing = find_customer(raw_email, raw_phone)
     
     if existing:
         return existing
@@ -193,8 +225,8 @@ def _resolve_customer(order_data: Dict[str, Any]) -> Customer:
     
     customer = Customer(
         name=customer_data.get('name'),
-        email=customer_data.get('email'),
-        phone=customer_data.get('phone'),
+        email=email,
+        phone=phone,
         address=customer_data.get('address'),
         birthday=birthday
     )
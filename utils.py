@@ -4,6 +4,7 @@ from typing import Optional
 from datetime import datetime, timedelta
 import re
 from sqlalchemy import text
+from tracing import traced
 
 
 def calculate_order_total(order: Order, discount_code: Optional[DiscountCode] = None) -> float:
@@ -44,6 +45,7 @@ def calculate_order_total(order: Order, discount_code: Optional[DiscountCode] =
     return round(total, 2)
 
 
+@traced('order.apply_discounts')
 def apply_discounts(order: Order, discount_code: Optional[DiscountCode] = None) -> float:
     base_total = calculate_order_total(order, None)
 
@@ -124,21 +126,25 @@ from models import DeliveryPerson, DeliveryZone, Order
 from typing import Optional
 from datetime import datetime, timedelta
 from sqlalchemy import text
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
+@traced('order.assign_delivery_person')
 def assign_delivery_person_sql(order: Order) -> Optional[DeliveryPerson]:
     cust = order.customer
     if not cust or not cust.address:
-        print("❌ No customer or address")
+        logger.warning("No customer or address for courier assignment", extra={'order_id': order.id})
         return None
 
     m = re.search(r"(\d{5})", cust.address)
     if not m:
-        print(f"❌ No postcode match in address: {cust.address}")
+        logger.warning("No postcode in customer address", extra={'order_id': order.id, 'customer_id': cust.id})
         return None
 
     prefix = m.group(1)[:3]
-    print(f"✅ Extracted prefix: {prefix} from address: {cust.address}")
+    logger.debug("Courier lookup", extra={'order_id': order.id, 'postcode_prefix': prefix})
 
     cutoff_dt = datetime.utcnow() - timedelta(minutes=30)
     sql = text(
@@ -153,14 +159,12 @@ def assign_delivery_person_sql(order: Order) -> Optional[DeliveryPerson]:
         """
     )
     row = db.session.execute(sql, {"prefix": prefix, "cutoff": cutoff_dt}).fetchone()
-    print("🔎 SQL row:", row)
 
     if not row:
         return None
 
     dp_id = row[0]
     dp = DeliveryPerson.query.get(dp_id)
-    print("✅ Assigned delivery person:", dp)
 
     if not dp:
         return None